@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Time and peak memory of Physio construction, copying or wrapping the data.
+
+Recordings have 8 channels at 5 kHz, of increasing duration. Each
+measurement runs in a fresh interpreter, where the data is created first:
+the increase of the peak resident memory (RSS) is then due to construction
+only. Wrapping (``Physio.wrap``) should stay flat as recordings get longer.
+"""
+import argparse
+import subprocess
+import sys
+
+FS = 5000
+NCH = 8
+
+CODE = """
+import resource, time
+import numpy as np
+from peakdet.physio import Physio
+data = np.ones(({nsamples}, {nch}))
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+physio = {construct}
+elapsed = time.perf_counter() - t0
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, (after - before) * 1024)
+"""
+
+MODES = {
+    "copy": "Physio(data, fs={fs})",
+    "wrap": "Physio.wrap(data, fs={fs})",
+}
+
+
+def measure(construct, nsamples):
+    """Return time (s) and peak RSS increase (bytes) of one construction."""
+    code = CODE.format(nsamples=nsamples, nch=NCH, construct=construct)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout.split()
+    return float(out[0]), float(out[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--minutes",
+        type=float,
+        nargs="+",
+        default=[1, 5, 15, 30],
+        help="durations of the recordings (a 2-hour recording needs 4.6 GB)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'minutes':>7} {'data (MB)':>10} {'mode':<5} {'time (ms)':>10} {'RSS (MB)':>9}"
+    )
+    for minutes in args.minutes:
+        nsamples = int(minutes * 60 * FS)
+        for mode, construct in MODES.items():
+            elapsed, rss = measure(construct.format(fs=FS), nsamples)
+            print(
+                f"{minutes:>7g} {nsamples * NCH * 8 / 1e6:>10.0f} {mode:<5} "
+                f"{elapsed * 1e3:>10.2f} {rss / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Speed of vectorized peak detection against a naive loop, on one core.
+
+The signal is a noisy 1 Hz oscillation sampled at 1 kHz, so that noise
+creates many candidate extrema. The naive loop, in plain Python, also checks
+the results of the vectorized detection; it runs on a shorter signal, as it is
+several orders of magnitude slower. The vectorized detection is checked
+against a target throughput for each minimum distance.
+"""
+import time
+
+import numpy as np
+
+from peakdet.detect import find_points
+
+FS = 1000
+NSAMPLES = 10**7
+NAIVE_NSAMPLES = 10**5
+PARAMS = [(0.5, 0), (0.5, 30), (0.5, 300), (0.5, 1000), (0.5, 3000)]
+# Target throughput of the vectorized detection, in Msamples/s
+TARGET = 50
+
+
+def signal(rng, nsamples):
+    """Return a noisy 1 Hz oscillation sampled at FS."""
+    time = np.arange(nsamples) / FS
+    return np.sin(2 * np.pi * time) + rng.normal(scale=0.1, size=nsamples)
+
+
+def naive_points(signal, thresh, dist, kind):
+    """Find points of `signal` with plain loops, as find_points does."""
+    signal = [float(v) for v in signal]
+    if kind == "troughs":
+        signal = [-v for v in signal]
+    lo, hi = min(signal), max(signal)
+    limit = lo + thresh * (hi - lo)
+    points = []
+    for i in range(1, len(signal) - 1):
+        if signal[i] <= signal[i - 1] or signal[i] < limit:
+            continue
+        # Plateaus are reported at their first sample
+        j = i
+        while j + 1 < len(signal) and signal[j + 1] == signal[j]:
+            j += 1
+        if j + 1 < len(signal) and signal[j + 1] < signal[j]:
+            points.append(i)
+    if dist <= 1:
+        return np.array(points, dtype=int)
+    kept = []
+    for n, i in enumerate(points):
+        lo, hi = n, n
+        while lo > 0 and i - points[lo - 1] < dist:
+            lo -= 1
+        while hi + 1 < len(points) and points[hi + 1] - i < dist:
+            hi += 1
+        # Highest point within dist, the first one among equal points
+        if all(
+            signal[j] < signal[i] or (signal[j] == signal[i] and j > i)
+            for j in points[lo : hi + 1]
+            if j != i
+        ):
+            kept.append(i)
+    return np.array(kept, dtype=int)
+
+
+def best_time(func, *args, repeat=3):
+    """Return the output and best time of `func(*args)`."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    long, short = signal(rng, NSAMPLES), signal(rng, NAIVE_NSAMPLES)
+    print(
+        f"{'thresh':>6} {'dist':>5} {'method':<11} {'samples':>9} "
+        f"{'Msamples/s':>11} {'target':>7}"
+    )
+    for thresh, dist in PARAMS:
+        _, elapsed = best_time(find_points, long, thresh, dist)
+        naive, naive_elapsed = best_time(
+            naive_points, short, thresh, dist, "peaks", repeat=1
+        )
+        assert np.array_equal(find_points(short, thresh, dist), naive)
+        speed = NSAMPLES / elapsed / 1e6
+        status = "ok" if speed >= TARGET else "MISSED"
+        for method, nsamples, mspeed, check in [
+            ("vectorized", NSAMPLES, speed, status),
+            ("naive loop", NAIVE_NSAMPLES, NAIVE_NSAMPLES / naive_elapsed / 1e6, ""),
+        ]:
+            print(
+                f"{thresh:>6} {dist:>5} {method:<11} {nsamples:>9.0e} "
+                f"{mspeed:>11.2f} {check:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of one point edit in the editor canvas, on a 1-hour recording.
+
+Each edit adds or removes a peak and redraws the markers of its channel with
+blitting (:class:`peakdet.gui.PointOverlay`). It should take well under a
+frame (16 ms); a full redraw of the figure is timed for comparison. The
+figure is drawn by the Agg canvas that Tk embeds, without a window: copying
+the updated pixels to the screen is not included.
+"""
+import time
+
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+
+from peakdet.gui import PointOverlay  # noqa: E402
+from peakdet.physio import Physio  # noqa: E402
+from peakdet.viz import plot_physiodata  # noqa: E402
+
+FS = 1000
+DURATION = 3600
+NCH = 4
+NEDITS = 200
+
+
+def recording(rng):
+    """Return a Physio object of NCH channels with one peak per second."""
+    time = np.arange(DURATION * FS) / FS
+    data = np.sin(2 * np.pi * time)[:, np.newaxis] + rng.normal(
+        scale=0.1, size=(time.size, NCH)
+    )
+    physio = Physio(data, fs=FS, copy=False)
+    for ch in range(NCH):
+        physio.set_points("peaks", ch, np.arange(FS // 4, data.shape[0], FS))
+    return physio
+
+
+def percentiles(times):
+    """Return median and 95th percentile of `times`, in milliseconds."""
+    return tuple(np.percentile(times, [50, 95]) * 1e3)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    physio = recording(rng)
+    fig, axes = plot_physiodata(
+        physio, width=19.2, height=10.8, show=False, markers=False, interactive=False
+    )
+    canvas = FigureCanvasAgg(fig)
+    overlay = PointOverlay(canvas, axes, physio, physio.fs)
+    canvas.draw()
+
+    full = []
+    for _ in range(10):
+        t0 = time.perf_counter()
+        canvas.draw()
+        full.append(time.perf_counter() - t0)
+
+    edits = []
+    for n in range(NEDITS):
+        ch, sample = int(rng.integers(NCH)), int(rng.integers(DURATION * FS))
+        t0 = time.perf_counter()
+        if n % 2:
+            physio.remove_points("peaks", ch, physio._metadata["peaks"][ch][0])
+        else:
+            physio.add_points("peaks", ch, sample)
+        overlay.update(ch)
+        edits.append(time.perf_counter() - t0)
+
+    print(f"{NCH} channels, {DURATION} s at {FS} Hz, {DURATION} peaks per channel")
+    print(f"{'operation':<12} {'median (ms)':>12} {'p95 (ms)':>10}")
+    for name, times in [("edit", edits), ("full draw", full)]:
+        print(
+            f"{name:<12} {percentiles(times)[0]:>12.2f} {percentiles(times)[1]:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
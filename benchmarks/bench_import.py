@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Import time of peakdet modules, in fresh interpreters.
+
+Importing peakdet (e.g. on headless cluster nodes) should stay in the low
+tens of milliseconds, and must not import tkinter or matplotlib. numpy is
+imported before timing peakdet modules, as by any analysis script, and its
+own import time is reported separately.
+"""
+import subprocess
+import sys
+
+MODULES = ["numpy", "peakdet", "peakdet.physio", "peakdet.viz"]
+HEAVY = ["tkinter", "matplotlib"]
+
+CODE = """
+import sys, time
+{setup}
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+print(t1 - t0, *[m in sys.modules for m in {heavy!r}])
+"""
+
+
+def import_time(module, setup="", repeat=10):
+    """Return the best import time of `module` and the heavy modules it loads."""
+    code = CODE.format(setup=setup, module=module, heavy=HEAVY)
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, check=True, text=True
+        ).stdout.split()
+        best = min(best, float(out[0]))
+        heavy = [m for m, loaded in zip(HEAVY, out[1:]) if loaded == "True"]
+    return best, heavy
+
+
+def main():
+    print(f"{'module':<16} {'time (ms)':>10}  heavy imports")
+    for module in MODULES:
+        setup = "" if module == "numpy" else "import numpy"
+        best, heavy = import_time(module, setup)
+        print(f"{module:<16} {best * 1e3:>10.1f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
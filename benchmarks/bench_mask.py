@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Masking rejected peaks: sorted interval index against ``np.arange`` + ``np.isin``.
+
+A 2-hour recording at 5 kHz has 10^5 peaks and 10^3 rejected segments of up
+to 10 seconds. The interval index (``Physio._masked``, rebuilt from
+scratch each time) is compared with expanding every segment into sample
+indices, as peakdet did before. Memory is the peak of allocations.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from peakdet.physio import Physio
+
+FS = 5000
+NSAMPLES = 2 * 3600 * FS
+NPEAKS = 10**5
+NREJECT = 10**3
+
+
+def expand_and_isin(peaks, reject):
+    """Mask peaks in rejected segments by expanding them into sample indices."""
+    rejected = np.concatenate([np.arange(s, e) for s, e in reject])
+    return np.ma.masked_array(peaks, mask=np.isin(peaks, rejected))
+
+
+def interval_index(physio):
+    """Mask peaks with the merged, sorted segments of a Physio object."""
+    physio._invalidate(0, reject=True)
+    return physio._masked("peaks")[0]
+
+
+def measure(func, *args, repeat=5):
+    """Return the output, best time and peak memory (MB) of `func(*args)`."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return out, best, peak
+
+
+def main():
+    rng = np.random.default_rng(0)
+    peaks = np.sort(rng.choice(NSAMPLES, NPEAKS, replace=False))
+    starts = rng.integers(0, NSAMPLES - 10 * FS, NREJECT)
+    reject = [(int(s), int(s + rng.integers(1, 10 * FS))) for s in starts]
+
+    # Samples are not read: a broadcast array of the right length is enough
+    physio = Physio(np.broadcast_to(np.float64(0), (NSAMPLES, 1)), copy=False)
+    physio.set_points("peaks", 0, peaks)
+    for s, e in reject:
+        physio.add_reject(0, s, e)
+
+    expected, naive_time, naive_peak = measure(expand_and_isin, peaks, reject)
+    masked, index_time, index_peak = measure(interval_index, physio)
+    assert np.array_equal(masked.mask, expected.mask)
+
+    print(f"{NPEAKS} peaks, {NREJECT} rejected segments, {NSAMPLES} samples")
+    print(f"{'method':<16} {'time (ms)':>10} {'peak (MB)':>10}")
+    for name, elapsed, peak in [
+        ("arange + isin", naive_time, naive_peak),
+        ("interval index", index_time, index_peak),
+    ]:
+        print(f"{name:<16} {elapsed * 1e3:>10.2f} {peak:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked compressed store against ``.npy`` and ``.tsv.gz`` files.
+
+The recording has 8 channels at 5 kHz, stored as float64 ADC counts (a slow
+oscillation plus noise, quantized to 16 bits), as produced by most loaders.
+For each format, the script reports the compression ratio (in-memory size
+over file size), the throughput of reading the whole recording, and the
+latency of reading a random 10-second window.
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from peakdet.bids import read_physio_text
+from peakdet.store import ChunkedArray, write_chunked
+
+FS = 5000
+NCH = 8
+WINDOW = 10 * FS
+NWINDOWS = 50
+
+
+def recording(rng, nsamples):
+    """Return float64 ADC counts of NCH channels."""
+    time = np.arange(nsamples)[:, np.newaxis] / FS
+    freq = rng.uniform(0.2, 2, NCH)
+    signal = 8000 * np.sin(2 * np.pi * freq * time) + rng.normal(0, 30, (nsamples, NCH))
+    return np.round(signal)
+
+
+def write_tsv(data, path):
+    """Write `data` to a gzipped tsv file."""
+    with gzip.open(path, "wt") as f:
+        for start in range(0, data.shape[0], 100000):
+            np.savetxt(f, data[start : start + 100000], fmt="%d", delimiter="\t")
+
+
+def median_time(func, starts):
+    """Return the median time of `func(start)` over `starts`."""
+    times = []
+    for start in starts:
+        t0 = time.perf_counter()
+        func(start)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5, help="duration")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = recording(rng, int(args.minutes * 60 * FS))
+    starts = rng.integers(0, data.shape[0] - WINDOW, NWINDOWS)
+    print(f"{args.minutes:g} minutes, {NCH} channels, {data.nbytes / 1e6:.0f} MB")
+    print(f"{'format':<14} {'ratio':>6} {'scan (MB/s)':>12} {'window (ms)':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npy = os.path.join(tmp, "data.npy")
+        np.save(npy, data)
+        mmap = np.load(npy, mmap_mode="r")
+        tsv = os.path.join(tmp, "data.tsv.gz")
+        write_tsv(data, tsv)
+        formats = [
+            (
+                ".npy",
+                npy,
+                lambda: np.load(npy),
+                lambda start: np.array(mmap[start : start + WINDOW]),
+                starts,
+            ),
+            # Text files are read from the start to reach a window: time a few
+            (
+                ".tsv.gz",
+                tsv,
+                lambda: read_physio_text(tsv)[0],
+                lambda start: read_physio_text(tsv)[0][start : start + WINDOW],
+                starts[:3],
+            ),
+        ]
+        stores = []
+        for codec in ["zlib", "lzma", "bz2"]:
+            path = os.path.join(tmp, f"data.{codec}.pdc")
+            write_chunked(data, path, codec=codec)
+            # No cache, so that every window decompresses its blocks
+            store = ChunkedArray(path, cache_blocks=0)
+            stores.append(store)
+            formats.append(
+                (
+                    f"chunked {codec}",
+                    path,
+                    lambda store=store: store.read(0, store.shape[0]),
+                    lambda start, store=store: store.read(start, start + WINDOW),
+                    starts,
+                )
+            )
+
+        for name, path, scan, window, window_starts in formats:
+            ratio = data.nbytes / os.path.getsize(path)
+            t0 = time.perf_counter()
+            assert np.array_equal(scan(), data)
+            scan_time = time.perf_counter() - t0
+            latency = median_time(window, window_starts)
+            print(
+                f"{name:<14} {ratio:>6.2f} {data.nbytes / 1e6 / scan_time:>12.0f} "
+                f"{latency * 1e3:>12.2f}"
+            )
+        for store in stores:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
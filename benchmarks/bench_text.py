@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Reading a BIDS physio ``.tsv.gz`` file: peakdet reader vs ``np.loadtxt`` and
+``np.genfromtxt``.
+
+The file holds random 8-channel data written with 6 decimals, about 20 MB
+once decompressed (see ``--mb``). Throughput is given in uncompressed MB per
+second, and memory is the peak of allocations during the read (in a second,
+traced run).
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from peakdet.bids import read_physio_text
+
+NCH = 8
+ROW_BYTES = NCH * 10
+
+
+def write_file(path, mb, rng):
+    """Write a gzipped tsv file of about `mb` uncompressed megabytes."""
+    nrows = int(mb * 1e6 / ROW_BYTES)
+    with gzip.open(path, "wt", compresslevel=1) as f:
+        for start in range(0, nrows, 100000):
+            block = rng.normal(size=(min(100000, nrows - start), NCH))
+            np.savetxt(f, block, fmt="%.6f", delimiter="\t")
+
+
+def measure(func, path):
+    """Return the output, time and peak memory (MB) of `func(path)`."""
+    t0 = time.perf_counter()
+    out = func(path)
+    elapsed = time.perf_counter() - t0
+    # Tracing allocations slows down Python code: memory is measured apart
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=20, help="uncompressed size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sub-01_physio.tsv.gz")
+        write_file(path, args.mb, np.random.default_rng(0))
+        with gzip.open(path, "rb") as f:
+            size = sum(len(chunk) for chunk in iter(lambda: f.read(2**24), b"")) / 1e6
+
+        readers = [
+            ("peakdet", lambda p: read_physio_text(p)[0]),
+            ("loadtxt", lambda p: np.loadtxt(p, delimiter="\t")),
+            ("genfromtxt", lambda p: np.genfromtxt(p, delimiter="\t")),
+        ]
+        results = {name: measure(func, path) for name, func in readers}
+
+    expected = results["genfromtxt"][0]
+    assert np.array_equal(results["peakdet"][0], expected)
+    print(f"{size:.0f} MB uncompressed, {expected.shape[0]} rows x {NCH} columns")
+    print(f"{'reader':<12} {'time (s)':>9} {'MB/s':>8} {'peak (MB)':>10}")
+    for name, (_, elapsed, peak) in results.items():
+        print(f"{name:<12} {elapsed:>9.2f} {size / elapsed:>8.1f} {peak:>10.0f}")
+    for name in ["loadtxt", "genfromtxt"]:
+        print(f"speedup vs {name}: {results[name][1] / results['peakdet'][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Scaling of multi-channel detection with the number of threads.
+
+Peaks and troughs are detected in 16 channels of 10 minutes at 1 kHz (a
+noisy 1 Hz oscillation) with :func:`peakdet.detect.detect`, using 1 to 16
+threads. Speedups above the number of CPUs cannot be expected.
+
+Scaling on several CPUs has not been measured yet: the only run so far was on
+a single CPU, where 2 to 16 threads were within noise of 1 thread (speedups of
+1.05-1.19). Run it on a multi-core machine before relying on ``n_jobs``.
+"""
+import os
+import time
+
+import numpy as np
+
+from peakdet.detect import detect
+from peakdet.physio import Physio
+
+FS = 1000
+NSAMPLES = 10 * 60 * FS
+NCH = 16
+THREADS = [1, 2, 4, 8, 16]
+
+
+def best_time(physio, n_jobs, repeat=3):
+    """Return the best time of detecting points in all channels."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        detect(physio, thresh=0.5, dist=300, opposite=True, n_jobs=n_jobs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    seconds = np.arange(NSAMPLES)[:, np.newaxis] / FS
+    data = np.sin(2 * np.pi * seconds * rng.uniform(0.8, 1.2, NCH))
+    data += rng.normal(scale=0.1, size=data.shape)
+    physio = Physio(data, fs=FS, copy=False)
+
+    print(f"{NCH} channels, {NSAMPLES} samples, {os.cpu_count()} CPUs")
+    print(f"{'threads':>7} {'time (s)':>9} {'speedup':>8}")
+    reference = None
+    for n_jobs in THREADS:
+        elapsed = best_time(physio, n_jobs)
+        reference = reference or elapsed
+        print(f"{n_jobs:>7} {elapsed:>9.3f} {reference / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
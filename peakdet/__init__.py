@@ -1,4 +1,8 @@
-from ._version import get_versions
+def __getattr__(name):
+    # The version is computed on first use, as it can run git
+    if name == "__version__":
+        from ._version import get_versions
 
-__version__ = get_versions()["version"]
-del get_versions
+        version = globals()["__version__"] = get_versions()["version"]
+        return version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
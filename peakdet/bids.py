@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to read BIDS physiological recordings (``_physio.tsv.gz``) and other
+delimited text files of physiological data.
+"""
+import io
+import itertools
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+_BLOCK_BYTES = 2**20
+_DELIMITERS = {".tsv": "\t", ".csv": ","}
+
+
+def _split_ext(path):
+    """Return the stem and extension of `path`, considering `.gz` as part of it."""
+    stem, ext = os.path.splitext(path)
+    if ext == ".gz":
+        stem, inner = os.path.splitext(stem)
+        ext = inner + ext
+    return stem, ext
+
+
+def _uncompressed_size(path):
+    """Return the (estimated) uncompressed size of `path` in bytes."""
+    size = os.path.getsize(path)
+    if path.endswith(".gz") and size >= 4:
+        # The gzip footer stores the uncompressed size modulo 2**32, and only
+        # of the last member of concatenated files: it can be too low, but text
+        # compresses well, so the uncompressed size is at least `size`
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            isize = struct.unpack("<I", f.read(4))[0]
+        size = max(size, isize)
+    return size
+
+
+def _iter_bytes(path, block_bytes):
+    """Yield the content of `path` in blocks, decompressing gzip files on the fly."""
+    with open(path, "rb") as f:
+        if not path.endswith(".gz"):
+            yield from iter(lambda: f.read(block_bytes), b"")
+            return
+        # zlib on large reads is considerably faster than the gzip module
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        for chunk in iter(lambda: f.read(block_bytes), b""):
+            while chunk:
+                # Text compresses well: bound the size of decompressed blocks
+                yield decompressor.decompress(chunk, block_bytes)
+                chunk = decompressor.unconsumed_tail
+                if decompressor.eof:
+                    # Concatenated gzip members are valid gzip files
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        yield decompressor.flush()
+
+
+def _has_lines(data, n):
+    """Whether `data` (bytes) holds at least `n` complete non-empty lines."""
+    start = 0
+    while n:
+        end = data.find(b"\n", start)
+        if end < 0:
+            return False
+        n -= bool(data[start:end].strip())
+        start = end + 1
+    return True
+
+
+def _is_numeric(line):
+    """Whether `line` (bytes) only contains numbers."""
+    try:
+        [float(v) for v in line.replace(b",", b" ").replace(b"n/a", b"nan").split()]
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_block(block, ncols, delimiter):
+    """Parse complete lines in `block` (bytes) into a (n_rows, ncols) array."""
+    if b"n/a" in block:
+        block = block.replace(b"n/a", b"nan")
+    try:
+        values = np.loadtxt(io.BytesIO(block), delimiter=delimiter, ndmin=2)
+    except ValueError:
+        values = None
+    if values is None or values.shape[1] != ncols:
+        raise ValueError(
+            f"Could not parse rows with {ncols} numeric columns: "
+            "found missing or non-numeric values."
+        )
+    return values
+
+
+def find_sidecar(path):
+    """
+    Return the path of the JSON sidecar of a BIDS physiological file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to a ``.tsv`` or ``.tsv.gz`` file.
+
+    Returns
+    -------
+    str or None
+        Path to the sidecar, or None if it does not exist
+    """
+    sidecar = _split_ext(os.fspath(path))[0] + ".json"
+    return sidecar if os.path.exists(sidecar) else None
+
+
+def read_sidecar(path):
+    """
+    Read the JSON sidecar of a BIDS physiological file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to a ``.tsv`` or ``.tsv.gz`` file, or to its ``.json`` sidecar.
+
+    Returns
+    -------
+    dict
+        Content of the sidecar
+
+    Raises
+    ------
+    IOError
+        If the sidecar cannot be found
+    """
+    path = os.fspath(path)
+    sidecar = path if path.endswith(".json") else find_sidecar(path)
+    if sidecar is None or not os.path.exists(sidecar):
+        raise IOError(f"Cannot find JSON sidecar of {path}")
+    with open(sidecar) as f:
+        return json.load(f)
+
+
+def iter_text_blocks(path, delimiter=None, block_bytes=_BLOCK_BYTES):
+    """
+    Stream a (gzipped) delimited text file of numbers in blocks of rows.
+
+    The file is decompressed and parsed incrementally, so that memory usage
+    only depends on `block_bytes`. Missing values must be written as ``n/a``
+    or ``nan``, as empty fields are not supported.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the file. Files ending in ``.gz`` are decompressed on the fly.
+    delimiter : str or None, optional
+        Column delimiter. If None, it is inferred from the extension (tab for
+        ``.tsv``, comma for ``.csv``, any whitespace otherwise). Default: None
+    block_bytes : int, optional
+        Number of (uncompressed) bytes to read at once. Default: 1 MiB
+
+    Yields
+    ------
+    header : list of str or None
+        First, the column names if the file has a header line, else None.
+    block : :obj:`numpy.ndarray`
+        Then, 2D arrays of consecutive rows with shape (n_rows, n_columns).
+
+    Raises
+    ------
+    ValueError
+        If a row cannot be parsed or the number of columns changes
+    """
+    path = os.fspath(path)
+    if delimiter is None:
+        delimiter = _DELIMITERS.get(_split_ext(path)[1].replace(".gz", ""))
+    chunks = _iter_bytes(path, block_bytes)
+    leftover = b""
+    for chunk in chunks:
+        leftover += chunk
+        # Both the header (if any) and the first row are needed
+        if _has_lines(leftover, 2):
+            break
+    leftover = leftover.lstrip(b"\r\n")
+    first_line = leftover.split(b"\n", 1)[0].rstrip(b"\r")
+    header = None
+    if first_line and not _is_numeric(first_line):
+        sep = delimiter.encode() if delimiter is not None else None
+        header = [name.strip().decode() for name in first_line.split(sep)]
+        leftover = leftover[len(first_line) :].lstrip(b"\r\n")
+        first_line = leftover.split(b"\n", 1)[0]
+    sep = b"," if delimiter is None else delimiter.encode()
+    ncols = len(first_line.replace(sep, b" ").split())
+    yield header
+
+    # Rows already read come first, so that blocks hold about `block_bytes`
+    for chunk in itertools.chain([b""], chunks):
+        leftover += chunk
+        cut = leftover.rfind(b"\n") + 1
+        if cut == 0:
+            continue
+        block, leftover = leftover[:cut], leftover[cut:]
+        if block and not block.isspace():
+            yield _parse_block(block, ncols, delimiter)
+    if leftover and not leftover.isspace():
+        yield _parse_block(leftover, ncols, delimiter)
+
+
+def read_physio_text(path, delimiter=None, block_bytes=_BLOCK_BYTES):
+    """
+    Read a (gzipped) delimited text file of numbers into a 2D array.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the file. Files ending in ``.gz`` are decompressed on the fly.
+    delimiter : str or None, optional
+        Column delimiter. If None, it is inferred from the extension (tab for
+        ``.tsv``, comma for ``.csv``, any whitespace otherwise). Default: None
+    block_bytes : int, optional
+        Number of (uncompressed) bytes to read at once. Default: 1 MiB
+
+    Returns
+    -------
+    data : :obj:`numpy.ndarray`
+        Array with shape (n_rows, n_columns)
+    header : list of str or None
+        Column names if the file has a header line, else None
+    """
+    blocks = iter_text_blocks(path, delimiter, block_bytes)
+    header = next(blocks)
+    size = _uncompressed_size(os.fspath(path))
+
+    data, nrows = None, 0
+    for block in blocks:
+        if data is None:
+            # Preallocate from the average bytes per row of the first block
+            row_bytes = max(min(block_bytes, size) / max(len(block), 1), 1)
+            data = np.empty((int(size / row_bytes * 1.05) + 1, block.shape[1]))
+        if nrows + len(block) > len(data):
+            data.resize((max(2 * len(data), nrows + len(block)), data.shape[1]))
+        data[nrows : nrows + len(block)] = block
+        nrows += len(block)
+
+    if data is None:
+        return np.empty((0, 0)), header
+    data.resize((nrows, data.shape[1]), refcheck=False)
+    return data, header
+
+
+def load_bids_physio(path, sidecar=None, block_bytes=_BLOCK_BYTES):
+    """
+    Load a BIDS physiological recording into a Physio object.
+
+    Sampling frequency and channel names are read from the JSON sidecar
+    (``SamplingFrequency`` and ``Columns``), and ``StartTime`` is stored in the
+    metadata as ``start_time``.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to a ``_physio.tsv.gz`` (or ``.tsv``) file.
+    sidecar : str, os.PathLike, dict, or None, optional
+        JSON sidecar or its path. If None, it is searched next to `path`.
+        Default: None
+    block_bytes : int, optional
+        Number of (uncompressed) bytes to read at once. Default: 1 MiB
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        Loaded Physio object
+
+    Raises
+    ------
+    IOError
+        If the sidecar cannot be found
+    ValueError
+        If the sidecar does not match the data
+    """
+    from .physio import Physio
+
+    if not isinstance(sidecar, dict):
+        sidecar = read_sidecar(path if sidecar is None else sidecar)
+    data, header = read_physio_text(path, "\t", block_bytes)
+
+    ch_names = sidecar.get("Columns", header)
+    if ch_names is not None and len(ch_names) != data.shape[1]:
+        raise ValueError(
+            f"Sidecar lists {len(ch_names)} columns, but {path} has {data.shape[1]}."
+        )
+    metadata = {}
+    if "StartTime" in sidecar:
+        metadata["start_time"] = sidecar["StartTime"]
+
+    return Physio(
+        data,
+        fs=sidecar.get("SamplingFrequency"),
+        ch_names=None if ch_names is None else list(ch_names),
+        metadata=metadata,
+        copy=False,
+    )
+
+
+def iter_bids_chunks(
+    path, chunk_seconds, overlap_seconds=0, sidecar=None, block_bytes=_BLOCK_BYTES
+):
+    """
+    Iterate over overlapping time windows of a BIDS physiological recording.
+
+    The file is streamed, so that only about one window and one block of
+    text are in memory at any time. Windows are the same as the ones yielded
+    by :meth:`peakdet.physio.Physio.iter_chunks` on the whole recording: each
+    has the absolute index of its first sample in `offset`, and results
+    computed on them can be merged with :meth:`peakdet.physio.Physio.stitch`.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to a ``_physio.tsv.gz`` (or ``.tsv``) file.
+    chunk_seconds : float
+        Duration of each window in seconds.
+    overlap_seconds : float, optional
+        Overlap between consecutive windows in seconds. Default: 0
+    sidecar : str, os.PathLike, dict, or None, optional
+        JSON sidecar or its path. If None, it is searched next to `path`.
+        Default: None
+    block_bytes : int, optional
+        Number of (uncompressed) bytes to read at once. Default: 1 MiB
+
+    Yields
+    ------
+    :obj:`peakdet.physio.Physio`
+        Window of the recording
+
+    Raises
+    ------
+    ValueError
+        If the overlap is not shorter than the windows
+    """
+    from .physio import Physio, _chunk_bounds
+
+    if not isinstance(sidecar, dict):
+        sidecar = read_sidecar(path if sidecar is None else sidecar)
+    fs = sidecar.get("SamplingFrequency")
+    chunk = int(round(chunk_seconds * fs))
+    overlap = int(round(overlap_seconds * fs))
+    if chunk < 1 or not 0 <= overlap < chunk:
+        raise ValueError(
+            f"Chunks of {chunk} samples with {overlap} samples overlap are not "
+            "valid: chunks must be longer than their overlap."
+        )
+    step = chunk - overlap
+
+    blocks = iter_text_blocks(path, "\t", block_bytes)
+    header = next(blocks)
+    ch_names = sidecar.get("Columns", header)
+    buffer, buffer_start = None, 0
+    start, core_start = 0, 0
+
+    def window(start, stop, core_start, core_stop):
+        chunk = Physio(
+            buffer[start - buffer_start : stop - buffer_start],
+            fs=fs,
+            ch_names=None if ch_names is None else list(ch_names),
+            copy=False,
+        )
+        chunk._offset = start
+        chunk._core = (core_start - start, core_stop - start)
+        return chunk
+
+    for block in blocks:
+        buffer = block if buffer is None else np.concatenate([buffer, block])
+        # Only yield a window once later samples exist, to know if it is the last
+        while buffer_start + len(buffer) > start + chunk:
+            core_stop = start + step + overlap // 2
+            yield window(start, start + chunk, core_start, core_stop)
+            start, core_start = start + step, core_stop
+        buffer, buffer_start = buffer[start - buffer_start :], start
+
+    if buffer is not None:
+        for bounds in _chunk_bounds(
+            buffer_start + len(buffer), chunk, overlap, start, core_start
+        ):
+            yield window(*bounds)
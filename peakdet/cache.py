@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed on-disk cache for the results of processing steps.
+
+Results are keyed on the content of the input Physio object (see
+:meth:`peakdet.physio.Physio.fingerprint`) and on the name, version and
+parameters of the operation, so that re-running an unchanged step on an
+unchanged recording reads its outputs from disk instead of computing them
+again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .history import _OPERATIONS, Operation, _jsonable, record
+from .points import PackedPoints
+
+_EXTENSION = ".npz"
+_POINT_KEYS = ["peaks", "troughs"]
+
+
+class ResultCache:
+    """
+    On-disk cache of operation outputs, with a size cap and LRU eviction.
+
+    Each entry is a ``.npz`` file named after its key, storing the peaks,
+    troughs, rejected segments and detection parameters computed by the
+    operation, and its output samples if they differ from the input ones
+    (derived signals). Entries are written atomically, so a cache directory
+    can be shared by concurrent processes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Cache directory. It is created if needed.
+    max_bytes : int, optional
+        Maximum total size of the entries in bytes. The least recently used
+        entries are removed when it is exceeded. Default: 2**30 (1 GiB)
+
+    Attributes
+    ----------
+    hits : int
+        Number of operations whose outputs were read from the cache
+    misses : int
+        Number of operations that had to be computed
+    """
+
+    def __init__(self, path, max_bytes=2**30):
+        """Initialise ResultCache object."""
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def __str__(self):
+        return "{name}(path={path}, hits={hits}, misses={misses})".format(
+            name=self.__class__.__name__,
+            path=self.path,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+    __repr__ = __str__
+
+    def _entry(self, key):
+        """Return the path of the entry of `key`."""
+        return os.path.join(self.path, key + _EXTENSION)
+
+    def _entries(self):
+        """Return (path, size, last use) of all entries."""
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def key(self, physio, name, params=None, version=1):
+        """
+        Return the cache key of operation `name` applied to `physio`.
+
+        Parameters
+        ----------
+        physio : :obj:`peakdet.physio.Physio`
+            Input of the operation.
+        name : str
+            Name of the operation.
+        params : dict, optional
+            Parameters of the operation. Default: None
+        version : int, optional
+            Version of the operation. Default: 1
+
+        Returns
+        -------
+        str
+            Hex digest identifying the inputs and the operation
+        """
+        op = Operation(name, params, version)
+        return hashlib.blake2b(
+            (physio.fingerprint() + op.id).encode("utf-8"), digest_size=20
+        ).hexdigest()
+
+    def get(self, key):
+        """
+        Return the outputs stored for `key`, or None if there are none.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, see :meth:`ResultCache.key`.
+
+        Returns
+        -------
+        dict or None
+            Stored arrays
+        """
+        path = self._entry(key)
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                outputs = {k: f[k] for k in f.files}
+        except (OSError, ValueError):
+            return None
+        # The modification time is the last use, for LRU eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return outputs
+
+    def put(self, key, outputs):
+        """
+        Store `outputs` for `key`, then evict old entries if needed.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, see :meth:`ResultCache.key`.
+        outputs : dict
+            Arrays to store.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **outputs)
+            os.replace(tmp, self._entry(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+
+        Parameters
+        ----------
+        max_bytes : int or None, optional
+            Size to fit in. If None, the cache size cap. Default: None
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self.evict(0)
+        self.hits = self.misses = 0
+
+    def info(self):
+        """
+        Return statistics on the cache.
+
+        Returns
+        -------
+        dict
+            Number of `hits` and `misses`, number of `entries` and their total
+            size in bytes (`nbytes`)
+        """
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "nbytes": sum(size for _, size, _ in entries),
+        }
+
+    def apply(self, physio, name, **params):
+        """
+        Apply registered operation `name` to `physio`, using cached outputs.
+
+        On a hit, the stored outputs are restored and the operation is
+        recorded in the history as if it had run. Operations that modify
+        `physio` in place (e.g. detection) do so on hits as well.
+
+        Parameters
+        ----------
+        physio : :obj:`peakdet.physio.Physio`
+            Input of the operation.
+        name : str
+            Name of a registered operation, e.g. 'detect'.
+        **params
+            Parameters of the operation.
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Output of the operation
+
+        Raises
+        ------
+        ValueError
+            If operation `name` is not registered
+        """
+        # Register the operations of peakdet
+        from . import detect  # noqa: F401
+
+        if name not in _OPERATIONS:
+            raise ValueError(f"Operation {name} is not registered.")
+        func, version = _OPERATIONS[name]
+        key = self.key(physio, name, params, version)
+
+        outputs = self.get(key)
+        if outputs is not None:
+            self.hits += 1
+            return _restore(physio, outputs)
+
+        self.misses += 1
+        samples = [physio.channel(ch, raw=True) for ch in range(physio.nch)]
+        nhistory = len(physio.history)
+        out = func(physio, **params)
+        self.put(key, _collect(out, samples, out.history[nhistory:]))
+        return out
+
+
+def _collect(physio, samples, operations):
+    """Return the outputs of `physio` to store, with samples if not in `samples`."""
+    outputs = {}
+    for k in _POINT_KEYS:
+        points = PackedPoints.from_list(physio._metadata[k])
+        outputs[f"{k}_indices"] = points.indices
+        outputs[f"{k}_offsets"] = points.offsets
+    metadata = {
+        "reject": physio._metadata["reject"],
+        "detection": physio._metadata.get("detection"),
+        "history": [op.to_dict() for op in operations],
+    }
+    outputs["metadata"] = np.array(json.dumps(metadata, default=_jsonable_default))
+
+    # Store the samples only if the operation derived new ones
+    derived = physio.nch != len(samples) or any(
+        not np.may_share_memory(physio.channel(ch, raw=True), samples[ch])
+        and not np.array_equal(physio.channel(ch, raw=True), samples[ch])
+        for ch in range(physio.nch)
+    )
+    if derived:
+        outputs["lengths"] = physio.channel_nsamples
+        outputs["samples"] = np.concatenate(
+            [physio.channel(ch, raw=True) for ch in range(physio.nch)]
+        )
+        outputs["scale"] = physio.scale
+        outputs["intercept"] = physio.intercept
+    return outputs
+
+
+def _jsonable_default(obj):
+    """Convert numpy objects in metadata to JSON-compatible types."""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    return _jsonable(obj)
+
+
+def _restore(physio, outputs):
+    """Return `physio` with the stored `outputs` of an operation."""
+    if "samples" in outputs:
+        from .ragged import RaggedArray
+
+        offsets = np.concatenate([[0], np.cumsum(outputs["lengths"])])
+        data = RaggedArray(outputs["samples"], offsets)
+        if not physio.is_ragged:
+            data = data.aligned()
+        physio = physio.__class__(
+            data,
+            fs=physio.fs,
+            ch_names=physio._ch_names,
+            history=physio.history,
+            metadata=dict(physio._metadata),
+            copy=False,
+            scale=outputs["scale"],
+            intercept=outputs["intercept"],
+        )
+
+    metadata = json.loads(str(outputs["metadata"]))
+    for k in _POINT_KEYS:
+        physio._metadata[k] = PackedPoints(
+            outputs[f"{k}_indices"], outputs[f"{k}_offsets"]
+        )
+    physio._metadata["reject"] = [[tuple(r) for r in rej] for rej in metadata["reject"]]
+    if metadata["detection"] is not None:
+        physio._metadata["detection"] = metadata["detection"]
+    physio._invalidate(reject=True)
+    # Record the operations as they were recorded when they ran
+    for op in metadata["history"]:
+        record(physio, op["name"], op["params"], op["version"])
+    return physio
@@ -0,0 +1,729 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to detect peaks and troughs in physiological data.
+"""
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .history import record, register
+from .physio import _in_intervals
+
+POINT_TYPES = ["peaks", "troughs"]
+
+
+def _candidates(signal, kind="peaks"):
+    """
+    Return indices of local extrema in `signal`.
+
+    Extrema are found as sign changes of the first difference. Flat extrema
+    (plateaus) are reported at their first sample. Samples are compared rather
+    than subtracted, so integer signals cannot overflow.
+    """
+    rising = signal[1:] > signal[:-1]
+    falling = signal[1:] < signal[:-1]
+    if kind == "troughs":
+        rising, falling = falling, rising
+    changing = rising | falling
+    if changing.all():
+        return np.flatnonzero(rising[:-1] & falling[1:]) + 1
+    # With plateaus, compare the differences on each side of every flat run
+    boundaries = np.flatnonzero(changing)
+    rising = rising[boundaries]
+    # The extremum is the first sample after the boundary that precedes it
+    return boundaries[:-1][rising[:-1] & ~rising[1:]] + 1
+
+
+def _window_max(values, lo, hi):
+    """Return the maximum of each window `values[lo[i]:hi[i]]`, -inf if empty."""
+    out = np.full(lo.size, -np.inf)
+    full = lo < hi
+    lo, hi = lo[full], hi[full]
+    if lo.size:
+        # reduceat over interleaved (lo, hi) pairs reduces each window on its
+        # own; windows up to the end stop one sample short and get it after
+        last = hi == values.size
+        bounds = np.stack([lo, np.minimum(hi, values.size - 1)], axis=1).ravel()
+        found = np.maximum.reduceat(values, bounds)[::2]
+        found[last] = np.maximum(found[last], values[-1])
+        out[full] = found
+    return out
+
+
+def _suppress(idx, score, dist):
+    """
+    Return a mask of points in `idx` with the highest `score` within `dist` samples.
+
+    A point is kept if no other point closer than `dist` samples has a higher
+    score, or the same score and a lower index, so kept points are at least
+    `dist` samples apart. Each point is compared with all the points around
+    it, kept or not, so that the result only depends on the samples within
+    `dist` of the point.
+
+    The points are grouped in bins of `dist` samples. As a bin lies within the
+    window of each of its points, only the first maximum of a bin can be kept,
+    and it is compared with the neighbouring bins, overlapped by its window.
+    """
+    if dist <= 1 or idx.size < 2:
+        return np.ones(idx.size, dtype=bool)
+    bins = idx // dist
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    stops = np.r_[starts[1:], idx.size]
+    bmax = np.maximum.reduceat(score, starts)
+    hits = np.flatnonzero(score == np.repeat(bmax, stops - starts))
+    top = hits[np.searchsorted(hits, starts)]
+
+    # Compare with the maxima of the neighbouring bins: if one is not lower
+    # (on the left) or is higher (on the right) but lies outside the window,
+    # the part of the bin within the window is checked
+    adjacent = np.flatnonzero(bins[starts[1:]] == bins[starts[:-1]] + 1)
+    first, window = idx[top] - dist + 1, idx[top] + dist - 1
+    before = np.full(top.size, -np.inf)
+    before[adjacent + 1] = bmax[adjacent]
+    check = np.flatnonzero(before >= bmax)
+    check = check[idx[top[check - 1]] < first[check]]
+    lo = np.searchsorted(idx, first[check], side="left")
+    before[check] = _window_max(score, lo, starts[check])
+
+    after = np.full(top.size, -np.inf)
+    after[adjacent] = bmax[adjacent + 1]
+    check = np.flatnonzero((after > bmax) & (bmax > before))
+    check = check[idx[top[check + 1]] > window[check]]
+    hi = np.searchsorted(idx, window[check], side="right")
+    after[check] = _window_max(score, stops[check], hi)
+
+    keep = np.zeros(idx.size, dtype=bool)
+    keep[top[(bmax > before) & (bmax >= after)]] = True
+    return keep
+
+
+def find_points(signal, thresh=0.2, dist=0, kind="peaks", vrange=None, reject=None):
+    """
+    Find peaks or troughs in a 1D signal.
+
+    Parameters
+    ----------
+    signal : array_like
+        1D signal.
+    thresh : float, optional
+        Threshold in [0, 1], relative to the range of the signal. Peaks must be
+        above `thresh` and troughs below `1 - thresh` once the signal is
+        normalized to [0, 1]. Default: 0.2
+    dist : int, optional
+        Minimum distance in samples between points. A point is kept only if
+        it is the highest peak (lowest trough) within `dist` samples on each
+        side, the first one among equal points. Default: 0
+    kind : {'peaks', 'troughs'}, optional
+        Type of points to find. Default: 'peaks'
+    vrange : tuple of float or None, optional
+        (min, max) values used to normalize the signal. If None, the minimum
+        and maximum of `signal` are used. Default: None
+    reject : tuple of :obj:`numpy.ndarray` or None, optional
+        Sorted starts and ends (excluded) of non-overlapping rejected
+        segments. Points in them are not detected, and do not suppress
+        points outside them. Default: None
+
+    Returns
+    -------
+    :obj:`numpy.ndarray`
+        Sorted indices of the points
+
+    Raises
+    ------
+    ValueError
+        If `kind` is not supported
+
+    Notes
+    -----
+    Points are not suppressed greedily, as in :func:`scipy.signal.find_peaks`:
+    a point closer than `dist` to a higher one is dropped even if the higher
+    one is itself dropped. For instance, peaks at samples 5, 10 and 15 with
+    decreasing heights and `dist` = 6 only give sample 5, where greedy
+    suppression would also keep sample 15. Whether a point is kept thus only
+    depends on the signal within `dist` samples of it, which lets
+    :class:`StreamingPeakDetector` confirm points with a fixed latency.
+    """
+    if kind not in POINT_TYPES:
+        raise ValueError(f"Point type {kind} not supported. Use one of {POINT_TYPES}.")
+    signal = np.asarray(signal)
+    idx = _candidates(signal, kind)
+    if reject is not None and len(reject[0]):
+        idx = idx[~_in_intervals(idx, *reject)]
+    if idx.size == 0:
+        return idx
+
+    lo, hi = (np.nanmin(signal), np.nanmax(signal)) if vrange is None else vrange
+    lo, hi = float(lo), float(hi)
+    values = signal[idx].astype(np.float64)
+    if kind == "peaks":
+        keep = values >= lo + thresh * (hi - lo)
+        score = values[keep]
+    else:
+        keep = values <= hi - thresh * (hi - lo)
+        score = -values[keep]
+
+    idx = idx[keep]
+    return idx[_suppress(idx, score, dist)]
+
+
+def _per_channel(value, channels, name):
+    """Return `value` as a list with one item per channel in `channels`."""
+    if isinstance(value, dict):
+        missing = [ch for ch in channels if ch not in value]
+        if missing:
+            raise ValueError(f"{name} is not specified for channels {missing}.")
+        return [value[ch] for ch in channels]
+    if isinstance(value, (list, tuple, np.ndarray)):
+        if len(value) != len(channels):
+            raise ValueError(
+                f"{name} has {len(value)} values, but {len(channels)} channels "
+                "were selected."
+            )
+        return list(value)
+    return [value] * len(channels)
+
+
+def _stored_params(physio, ch, kind, vrange):
+    """
+    Return the kind and range to detect `kind` on the stored samples of `ch`.
+
+    Normalization by the range is affine, so points of scaled data are found
+    on stored samples directly; a negative scale swaps peaks and troughs.
+    """
+    scale, intercept = physio.scale[ch], physio.intercept[ch]
+    if scale < 0:
+        kind = POINT_TYPES[1 - POINT_TYPES.index(kind)]
+    lo, hi = sorted((v - intercept) / scale for v in vrange)
+    return kind, (lo, hi)
+
+
+def _detection_params(physio):
+    """Return a copy of the detection parameters stored in `physio`, per channel."""
+    stored = physio._metadata.get("detection", [{} for _ in range(physio.nch)])
+    return [
+        {
+            k: {"vrange": p["vrange"], "regions": [list(r) for r in p["regions"]]}
+            for k, p in params.items()
+        }
+        for params in stored
+    ]
+
+
+@register("detect")
+def detect(
+    physio,
+    channels=None,
+    thresh=0.2,
+    dist=0,
+    kind="peaks",
+    opposite=False,
+    n_jobs=1,
+    progress=None,
+):
+    """
+    Detect peaks or troughs in channels of `physio` and store them.
+
+    Detected points replace the ones in ``physio._metadata[kind]`` for the
+    selected channels. Rejected segments are ignored: they hold no points,
+    and their samples do not suppress points around them (the normalization
+    range still covers the whole channel). Channels are processed in
+    parallel threads, as the
+    detection kernels spend most of their time in NumPy code that releases
+    the GIL.
+
+    Parameters
+    ----------
+    physio : :obj:`peakdet.physio.Physio`
+        Object holding the data.
+    channels : int, list of int, or None, optional
+        Channels in which to detect points. If None, all channels. Default: None
+    thresh : float, list of float, or dict, optional
+        Threshold in [0, 1], relative to the range of the signal. Can be given
+        per channel as a list (one value per selected channel) or a dict
+        (channel: value). Default: 0.2
+    dist : int, list of int, or dict, optional
+        Minimum distance in samples between points, optionally per channel.
+        Default: 0
+    kind : {'peaks', 'troughs'}, list, or dict, optional
+        Type of points to detect, optionally per channel. Default: 'peaks'
+    opposite : bool, list of bool, or dict, optional
+        Also detect the opposite type of points with the same parameters,
+        optionally per channel. Default: False
+    n_jobs : int, optional
+        Number of threads. If -1, one per CPU. Default: 1
+    progress : callable or None, optional
+        Called as ``progress(fraction, message)`` after each step (range of a
+        channel, or one type of points in a channel), from the thread that
+        ran it. It can raise an exception to stop the detection, in which
+        case `physio` is not modified. Default: None
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        The same object, with updated metadata
+
+    Raises
+    ------
+    ValueError
+        If per-channel parameters do not match the selected channels
+    """
+    if channels is None:
+        channels = list(range(physio.nch))
+    elif np.ndim(channels) == 0:
+        channels = [channels]
+    channels = [int(ch) for ch in channels]
+    params = {
+        "thresh": _per_channel(thresh, channels, "thresh"),
+        "dist": _per_channel(dist, channels, "dist"),
+        "kind": _per_channel(kind, channels, "kind"),
+        "opposite": _per_channel(opposite, channels, "opposite"),
+    }
+    for k in params["kind"]:
+        if k not in POINT_TYPES:
+            raise ValueError(f"Point type {k} not supported. Use one of {POINT_TYPES}.")
+
+    # Merged before starting threads, as they are cached in `physio`
+    reject = [physio._merged_reject(ch) for ch in channels]
+    # One step for the range of each channel, one for each type of points
+    nsteps = sum(2 + bool(opposite) for opposite in params["opposite"])
+    done = itertools.count(1)
+
+    def report(message):
+        if progress is not None:
+            # next() on a count is atomic, so threads do not share a step
+            progress(next(done) / nsteps, message)
+
+    def run(n):
+        # A contiguous copy of the channel makes all following passes faster.
+        # Compact (e.g. int16) samples are used as stored, without conversion
+        ch = channels[n]
+        signal = np.ascontiguousarray(physio.channel(ch, raw=True))
+        vrange = sorted(
+            float(v) * physio.scale[ch] + physio.intercept[ch]
+            for v in (np.nanmin(signal), np.nanmax(signal))
+        )
+        report(f"Computed the range of channel {ch}")
+        kinds = POINT_TYPES if params["opposite"][n] else [params["kind"][n]]
+        points = {}
+        for k in kinds:
+            stored_kind, stored_range = _stored_params(physio, ch, k, vrange)
+            points[k] = find_points(
+                signal,
+                params["thresh"][n],
+                params["dist"][n],
+                stored_kind,
+                stored_range,
+                reject[n],
+            )
+            report(f"Detected {k} in channel {ch}")
+        return vrange, points
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else max(int(n_jobs), 1)
+    if n_jobs == 1 or len(channels) == 1:
+        results = [run(n) for n in range(len(channels))]
+    else:
+        with ThreadPoolExecutor(max_workers=min(n_jobs, len(channels))) as pool:
+            results = list(pool.map(run, range(len(channels))))
+
+    points = {k: {} for k in POINT_TYPES}
+    detection = _detection_params(physio)
+    for n, (ch, (vrange, result)) in enumerate(zip(channels, results)):
+        for k, idx in result.items():
+            points[k][ch] = idx
+            # Parameters are indexed by region, for incremental re-detection
+            detection[ch][k] = {
+                "vrange": list(vrange),
+                "regions": [
+                    [
+                        0,
+                        int(physio.channel_nsamples[ch]),
+                        params["thresh"][n],
+                        params["dist"][n],
+                    ]
+                ],
+            }
+    # Replace the packed points, as they might be shared with other objects
+    for k, new in points.items():
+        if new:
+            physio._metadata[k] = physio._metadata[k].replace(new)
+    physio._metadata["detection"] = detection
+    physio._invalidate(channels)
+
+    record(physio, "detect", dict(channels=channels, **params))
+    return physio
+
+
+def detect_points(
+    physio, channel=0, thresh=0.2, dist=0, kind="peaks", opposite=False, progress=None
+):
+    """
+    Detect peaks or troughs in a channel of `physio` and store them.
+
+    Detected points replace the ones in ``physio._metadata[kind][channel]``.
+    See :func:`detect` to process several channels at once.
+
+    Parameters
+    ----------
+    physio : :obj:`peakdet.physio.Physio`
+        Object holding the data.
+    channel : int, optional
+        Channel in which to detect points. Default: 0
+    thresh : float, optional
+        Threshold in [0, 1], relative to the range of the signal. Default: 0.2
+    dist : int, optional
+        Minimum distance in samples between points. Default: 0
+    kind : {'peaks', 'troughs'}, optional
+        Type of points to detect. Default: 'peaks'
+    opposite : bool, optional
+        Also detect the opposite type of points (troughs for peaks and vice
+        versa) with the same parameters. Default: False
+    progress : callable or None, optional
+        Called as ``progress(fraction, message)`` after each step, see
+        :func:`detect`. Default: None
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        The same object, with updated metadata
+    """
+    return detect(physio, [channel], thresh, dist, kind, opposite, progress=progress)
+
+
+@register("redetect")
+def redetect(physio, start, stop, channels=None, kinds=None, thresh=None, dist=None):
+    """
+    Re-detect points of `physio` only between samples `start` and `stop`.
+
+    Points outside [start, stop) are left untouched, and only the samples in
+    the edited span plus a safety margin of about `dist` samples on each side
+    are read, so the cost is proportional to the edited span rather than the
+    length of the recording. Channels must have been processed with
+    :func:`detect` first: their parameters are stored per region in
+    ``physio._metadata["detection"]``, and new parameters only apply to the
+    edited region. The normalization range of the first detection is reused,
+    so that thresholds are consistent across regions.
+
+    With unchanged parameters, the result is the same as detecting on the
+    whole recording, unless the signal is flat for longer than the margin at
+    the edges of the span. As with :func:`detect`, rejected segments are
+    ignored: after rejecting a segment, re-detect it and `dist` samples on
+    each side, where its samples may have suppressed points.
+
+    Parameters
+    ----------
+    physio : :obj:`peakdet.physio.Physio`
+        Object holding the data.
+    start : int
+        First sample of the edited span.
+    stop : int
+        Sample at which the edited span ends (excluded).
+    channels : int, list of int, or None, optional
+        Channels to update. If None, all channels with stored parameters.
+        Default: None
+    kinds : str, list of str, or None, optional
+        Types of points to update. If None, all types detected in each
+        channel. Default: None
+    thresh : float or None, optional
+        New threshold for the span. If None, the one of the region containing
+        `start` is used. Default: None
+    dist : int or None, optional
+        New minimum distance for the span. If None, the one of the region
+        containing `start` is used. Default: None
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        The same object, with updated metadata
+
+    Raises
+    ------
+    ValueError
+        If a selected channel or type of points has not been processed with
+        :func:`detect`
+    """
+    detection = _detection_params(physio)
+    if channels is None:
+        channels = [ch for ch in range(physio.nch) if detection[ch]]
+    elif np.ndim(channels) == 0:
+        channels = [channels]
+    start, stop = max(int(start), 0), int(stop)
+    if stop <= start:
+        return physio
+
+    points = {k: {} for k in POINT_TYPES}
+    for ch in channels:
+        if not detection[ch]:
+            raise ValueError(f"Channel {ch} has no detection to update.")
+        # Indices are samples of each channel, whose lengths can differ
+        nsamples = int(physio.channel_nsamples[ch])
+        if min(stop, nsamples) <= start:
+            continue
+        for k in detection[ch] if kinds is None else np.atleast_1d(kinds):
+            if k not in detection[ch]:
+                raise ValueError(f"Channel {ch} has no detection of {k} to update.")
+            params = detection[ch][k]
+            regions = params["regions"]
+            # Parameters of the region containing the start of the span
+            n = np.searchsorted([r[0] for r in regions], start, side="right") - 1
+            th = regions[n][2] if thresh is None else thresh
+            d = int(regions[n][3] if dist is None else dist)
+
+            # Candidates need one more sample, their window `d` more samples
+            margin = d + 2
+            lo, hi = max(start - margin, 0), min(stop + margin, nsamples)
+            signal = np.ascontiguousarray(physio.channel(ch, raw=True)[lo:hi])
+            stored_kind, stored_range = _stored_params(physio, ch, k, params["vrange"])
+            starts, ends = physio._merged_reject(ch)
+            found = find_points(
+                signal, th, d, stored_kind, stored_range, (starts - lo, ends - lo)
+            )
+            found += lo
+            found = found[(found >= start) & (found < stop)]
+
+            old = physio._metadata[k][ch]
+            i, j = np.searchsorted(old, [start, stop])
+            points[k][ch] = np.concatenate([old[:i], found.astype(old.dtype), old[j:]])
+            params["regions"] = _split_regions(
+                regions, start, min(stop, nsamples), th, d
+            )
+
+    for k, new in points.items():
+        if new:
+            physio._metadata[k] = physio._metadata[k].replace(new)
+    physio._metadata["detection"] = detection
+    physio._invalidate(channels)
+    record(
+        physio,
+        "redetect",
+        {
+            "start": start,
+            "stop": stop,
+            "channels": list(channels),
+            "kinds": kinds,
+            "thresh": thresh,
+            "dist": dist,
+        },
+    )
+    return physio
+
+
+def _split_regions(regions, start, stop, thresh, dist):
+    """Insert region [start, stop) with new parameters in sorted `regions`."""
+    out = []
+    for r0, r1, th, d in regions:
+        if r0 < start:
+            out.append([r0, min(r1, start), th, d])
+        if r1 > stop:
+            out.append([max(r0, stop), r1, th, d])
+    out.append([start, stop, thresh, dist])
+    out.sort(key=lambda r: r[0])
+    # Merge neighbouring regions with the same parameters
+    merged = [out[0]]
+    for r in out[1:]:
+        if r[0] == merged[-1][1] and r[2:] == merged[-1][2:]:
+            merged[-1][1] = r[1]
+        else:
+            merged.append(r)
+    return merged
+
+
+class StreamingPeakDetector:
+    """
+    Online detector of peaks or troughs in blocks of samples.
+
+    Samples are fed in blocks as they arrive, and each call returns the points
+    that can be confirmed so far. Given the same parameters (and `vrange`), the
+    detected points are exactly the ones found by :func:`find_points` on the
+    whole signal, whatever the block sizes.
+
+    A point at sample ``i`` is returned once sample ``i + max(dist, 1)`` has
+    been pushed, or later if the signal is flat after ``i``: this is the
+    latency of the detector. Its state only holds the candidates closer than
+    `dist` samples to the undecided ones, so memory use does not depend on
+    the length of the stream.
+
+    Parameters
+    ----------
+    nch : int, optional
+        Number of channels in each block. Default: 1
+    thresh : float, list of float, or dict, optional
+        Threshold in [0, 1], relative to `vrange`, optionally per channel.
+        Default: 0.2
+    dist : int, list of int, or dict, optional
+        Minimum distance in samples between points, optionally per channel.
+        Default: 0
+    kind : {'peaks', 'troughs'}, list, or dict, optional
+        Type of points to detect, optionally per channel. Default: 'peaks'
+    vrange : tuple of float, list of tuples, or dict, optional
+        (min, max) values used to normalize the signal, optionally per
+        channel. As the full signal is not known in advance, it must be
+        provided (e.g. from the ADC range or a calibration run).
+        Default: (0, 1)
+
+    Attributes
+    ----------
+    nsamples : int
+        Number of samples pushed so far
+    latency : list of int
+        Minimum delay in samples before a point is returned, for each channel
+    """
+
+    def __init__(self, nch=1, thresh=0.2, dist=0, kind="peaks", vrange=(0, 1)):
+        """Initialise StreamingPeakDetector object."""
+        channels = list(range(nch))
+        self._thresh = _per_channel(thresh, channels, "thresh")
+        self._dist = [int(d) for d in _per_channel(dist, channels, "dist")]
+        self._kind = _per_channel(kind, channels, "kind")
+        if isinstance(vrange, tuple) and np.ndim(vrange[0]) == 0:
+            vrange = [vrange] * nch
+        self._vrange = _per_channel(vrange, channels, "vrange")
+        for k in self._kind:
+            if k not in POINT_TYPES:
+                raise ValueError(
+                    f"Point type {k} not supported. Use one of {POINT_TYPES}."
+                )
+
+        self.nch = nch
+        self.nsamples = 0
+        self.latency = [max(d, 1) for d in self._dist]
+        self._last = [None] * nch
+        # Start and entering direction (True if rising) of the current flat run
+        self._run_start = [0] * nch
+        self._run_rising = [None] * nch
+        # Candidates not decided yet, plus the decided ones still in their window
+        self._pending = [np.empty(0, dtype=np.int64)] * nch
+        self._score = [np.empty(0)] * nch
+        self._decided = [0] * nch
+
+    @classmethod
+    def from_physio(
+        cls, physio, channels=None, thresh=0.2, dist=0, kind="peaks", vrange=None
+    ):
+        """
+        Create a detector for the channels of `physio`.
+
+        Parameters
+        ----------
+        physio : :obj:`peakdet.physio.Physio`
+            Object whose channels will be streamed.
+        channels : list of int or None, optional
+            Channels that will be streamed. If None, all channels. Default: None
+        thresh, dist, kind : optional
+            See :class:`StreamingPeakDetector`.
+        vrange : tuple of float, list of tuples, or None, optional
+            (min, max) values used to normalize each channel. If None, the
+            range of the data already in `physio` is used. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.detect.StreamingPeakDetector`
+            New detector
+        """
+        channels = list(range(physio.nch)) if channels is None else list(channels)
+        if vrange is None:
+            vrange = [
+                (np.nanmin(physio.channel(ch)), np.nanmax(physio.channel(ch)))
+                for ch in channels
+            ]
+        return cls(len(channels), thresh, dist, kind, vrange)
+
+    def _candidates(self, ch, block):
+        """Update the run state of channel `ch` and return new candidates."""
+        base = self.nsamples
+        if self._last[ch] is not None:
+            block = np.concatenate([[self._last[ch]], block])
+            base -= 1
+        self._last[ch] = block[-1]
+
+        rising = block[1:] > block[:-1]
+        falling = block[1:] < block[:-1]
+        if self._kind[ch] == "troughs":
+            rising, falling = falling, rising
+        boundaries = np.flatnonzero(rising | falling)
+        if boundaries.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        rising = rising[boundaries]
+        # Each boundary closes the run that started after the previous one
+        starts = base + boundaries + 1
+        if self._run_rising[ch] is None:
+            entering, starts, closing = rising[:-1], starts[:-1], boundaries[1:]
+            rising_out = rising[1:]
+        else:
+            entering = np.concatenate([[self._run_rising[ch]], rising[:-1]])
+            starts = np.concatenate([[self._run_start[ch]], starts[:-1]])
+            closing, rising_out = boundaries, rising
+        self._run_start[ch] = base + boundaries[-1] + 1
+        self._run_rising[ch] = rising[-1]
+
+        is_point = entering & ~rising_out
+        idx = starts[is_point].astype(np.int64)
+        values = block[closing[is_point]].astype(np.float64)
+
+        lo, hi = (float(v) for v in self._vrange[ch])
+        if self._kind[ch] == "peaks":
+            keep = values >= lo + self._thresh[ch] * (hi - lo)
+            return idx[keep], values[keep]
+        keep = values <= hi - self._thresh[ch] * (hi - lo)
+        return idx[keep], -values[keep]
+
+    def _confirm(self, ch, known):
+        """Return points of channel `ch` whose window ends before sample `known`."""
+        dist, latency = self._dist[ch], self.latency[ch]
+        idx, score = self._pending[ch], self._score[ch]
+        # A point is decided once every candidate within its window is known
+        decided = (idx >= self._decided[ch]) & (idx <= known - latency + 1)
+        points = idx[_suppress(idx, score, dist) & decided]
+
+        if known == np.inf:
+            self._decided[ch] = self.nsamples
+        else:
+            self._decided[ch] = max(self._decided[ch], int(known) - latency + 2)
+        context = idx >= self._decided[ch] - max(dist - 1, 0)
+        self._pending[ch], self._score[ch] = idx[context], score[context]
+        return points
+
+    def push(self, block):
+        """
+        Feed a block of samples and return newly confirmed points.
+
+        Parameters
+        ----------
+        block : array_like
+            Samples with shape (n_samples, nch), or (n_samples,) if nch is 1.
+
+        Returns
+        -------
+        list of :obj:`numpy.ndarray`
+            Absolute indices of the confirmed points, for each channel
+        """
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        if block.shape[1] != self.nch:
+            raise ValueError(
+                f"Block has {block.shape[1]} channels, but detector expects {self.nch}."
+            )
+        if block.shape[0] == 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(self.nch)]
+
+        for ch in range(self.nch):
+            idx, score = self._candidates(ch, block[:, ch])
+            self._pending[ch] = np.concatenate([self._pending[ch], idx])
+            self._score[ch] = np.concatenate([self._score[ch], score])
+        self.nsamples += block.shape[0]
+        # Candidates before the start of the current (flat) run are all known
+        return [self._confirm(ch, self._run_start[ch] - 1) for ch in range(self.nch)]
+
+    def flush(self):
+        """
+        Signal the end of the stream and return the remaining points.
+
+        Returns
+        -------
+        list of :obj:`numpy.ndarray`
+            Absolute indices of the remaining points, for each channel
+        """
+        return [self._confirm(ch, np.inf) for ch in range(self.nch)]
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-resolution min/max envelopes of physiological signals, for display.
+
+An envelope pyramid stores, for blocks of increasing size, the minimum and
+maximum of the samples in each block. Any time range can then be drawn at
+screen resolution from the coarsest level that is still finer than a pixel,
+without reading every sample, and without losing short spikes: the extrema
+of every block are kept.
+"""
+import numpy as np
+
+
+def _reduce_blocks(mins, maxs, size):
+    """Return min and max of consecutive blocks of `size` items (last may be short)."""
+    starts = np.arange(0, mins.shape[0], size)
+    # fmin/fmax ignore NaNs, unless a whole block is NaN
+    return np.fmin.reduceat(mins, starts), np.fmax.reduceat(maxs, starts)
+
+
+class Envelope:
+    """
+    Min/max pyramid of a 1D signal.
+
+    Level 0 holds the minimum and maximum of blocks of `block` samples, and
+    each following level reduces the previous one by `factor`, down to a
+    single block. Level 0 is computed in one vectorized pass over the
+    samples (by chunks, so memory-mapped signals are not loaded at once);
+    the other levels only read the previous level.
+
+    Parameters
+    ----------
+    samples : array_like
+        1D signal (stored samples, e.g. raw ADC values).
+    block : int, optional
+        Number of samples in the blocks of level 0. Default: 16
+    factor : int, optional
+        Reduction factor between consecutive levels. Default: 4
+    scale : float, optional
+        Factor converting samples to physical units. Default: 1
+    intercept : float, optional
+        Value added to scaled samples. Default: 0
+
+    Attributes
+    ----------
+    sizes : list of int
+        Number of samples in the blocks of each level
+    levels : list of tuple of :obj:`numpy.ndarray`
+        Minimum and maximum of the blocks of each level, in stored units
+    """
+
+    def __init__(self, samples, block=16, factor=4, scale=1, intercept=0):
+        """Initialise Envelope object."""
+        if block < 1 or factor < 2:
+            raise ValueError(
+                f"Block size must be positive and factor at least 2, got {block} "
+                f"and {factor}."
+            )
+        self.samples = samples
+        self.nsamples = samples.shape[0]
+        self.block, self.factor = block, factor
+        self.scale, self.intercept = scale, intercept
+
+        # Level 0, by chunks of whole blocks
+        step = block * max(2**20 // block, 1)
+        mins, maxs = [], []
+        for start in range(0, self.nsamples, step):
+            chunk = np.asarray(samples[start : start + step])
+            lo, hi = _reduce_blocks(chunk, chunk, block)
+            mins.append(lo)
+            maxs.append(hi)
+        dtype = np.asarray(samples[:0]).dtype
+        self.levels = [
+            (
+                np.concatenate(mins) if mins else np.empty(0, dtype),
+                np.concatenate(maxs) if maxs else np.empty(0, dtype),
+            )
+        ]
+        self.sizes = [block]
+        while self.levels[-1][0].shape[0] > 1:
+            self.levels.append(_reduce_blocks(*self.levels[-1], factor))
+            self.sizes.append(self.sizes[-1] * factor)
+
+    def extend(self, samples):
+        """
+        Update the pyramid after samples were appended to the signal.
+
+        Only the blocks of each level from the last (possibly short) one
+        onwards are computed again, so the cost is proportional to the number
+        of new samples, not to the length of the signal.
+
+        Parameters
+        ----------
+        samples : array_like
+            1D signal, whose first samples are the current ones.
+
+        Raises
+        ------
+        ValueError
+            If `samples` is shorter than the current signal
+        """
+        nsamples = samples.shape[0]
+        if nsamples < self.nsamples:
+            raise ValueError(
+                f"Cannot extend an envelope of {self.nsamples} samples with "
+                f"{nsamples} samples."
+            )
+        # First block of level 0 that changes
+        first = self.nsamples // self.block
+        chunk = np.asarray(samples[first * self.block : nsamples])
+        new = _reduce_blocks(chunk, chunk, self.block)
+        levels = []
+        while True:
+            if levels:
+                # Blocks of the previous level from the first changed one
+                first //= self.factor
+                lo, hi = levels[-1]
+                start = first * self.factor
+                new = _reduce_blocks(lo[start:], hi[start:], self.factor)
+            n = len(levels)
+            # Levels that did not exist yet have no blocks to keep
+            old = self.levels[n] if n < len(self.levels) else new
+            levels.append(
+                (
+                    np.concatenate([old[0][:first], new[0]]),
+                    np.concatenate([old[1][:first], new[1]]),
+                )
+            )
+            if levels[-1][0].shape[0] <= 1:
+                break
+        self.samples, self.nsamples = samples, nsamples
+        self.levels = levels
+        self.sizes = [self.block * self.factor**n for n in range(len(levels))]
+
+    def __str__(self):
+        return "{name}(nsamples={nsamples}, levels={levels})".format(
+            name=self.__class__.__name__,
+            nsamples=self.nsamples,
+            levels=len(self.levels),
+        )
+
+    __repr__ = __str__
+
+    @property
+    def nbytes(self):
+        """Memory used by the pyramid, in bytes."""
+        return sum(lo.nbytes + hi.nbytes for lo, hi in self.levels)
+
+    def _physical(self, mins, maxs):
+        """Convert stored `mins` and `maxs` to physical units."""
+        if self.scale == 1 and self.intercept == 0:
+            return mins, maxs
+        mins = mins * self.scale + self.intercept
+        maxs = maxs * self.scale + self.intercept
+        # A negative scale swaps minima and maxima
+        return (maxs, mins) if self.scale < 0 else (mins, maxs)
+
+    def _bins(self, start, stop, npixels):
+        """
+        Return first sample, min and max (stored units) of bins of a range.
+
+        The last output is True if bins are single samples.
+        """
+        start, stop = max(int(start), 0), min(int(stop), self.nsamples)
+        if stop <= start:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, True
+        per_pixel = (stop - start) / max(int(npixels), 1)
+
+        if per_pixel < self.block:
+            # Not many more samples than bins: use the samples themselves
+            samples = np.asarray(self.samples[start:stop])
+            return np.arange(start, stop), samples, samples, True
+
+        # Coarsest level with blocks no larger than a pixel
+        n = int(np.searchsorted(self.sizes, per_pixel, side="right")) - 1
+        size = self.sizes[n]
+        lo, hi = start // size, -(-stop // size)
+        mins, maxs = self.levels[n][0][lo:hi], self.levels[n][1][lo:hi]
+        # Group blocks into bins of (at most) one pixel
+        group = max(int(per_pixel // size), 1)
+        mins, maxs = _reduce_blocks(mins, maxs, group)
+        index = np.maximum(np.arange(lo, hi, group) * size, start)
+        return index, mins, maxs, False
+
+    def query(self, start, stop, npixels):
+        """
+        Return the min/max envelope of samples `start` to `stop` at a resolution.
+
+        The cost is proportional to `npixels`, not to the number of samples in
+        the range. Blocks at the edges of the range can include a few samples
+        outside of it.
+
+        Parameters
+        ----------
+        start : int
+            First sample of the range.
+        stop : int
+            Sample at which the range ends (excluded).
+        npixels : int
+            Number of bins, e.g. the width of the axes in pixels. Up to
+            ``block`` times more bins (single samples) are returned for short
+            ranges.
+
+        Returns
+        -------
+        index : :obj:`numpy.ndarray`
+            First sample of each bin
+        mins, maxs : :obj:`numpy.ndarray`
+            Minimum and maximum of the samples in each bin, in physical units
+        """
+        index, mins, maxs, _ = self._bins(start, stop, npixels)
+        return (index,) + self._physical(mins, maxs)
+
+    def line(self, start, stop, npixels):
+        """
+        Return a polyline drawing the envelope of samples `start` to `stop`.
+
+        Each bin is drawn as a vertical segment from its minimum to its
+        maximum, joined to the next one, so that no extremum is lost. Short
+        ranges are drawn with their samples.
+
+        Parameters
+        ----------
+        start : int
+            First sample of the range.
+        stop : int
+            Sample at which the range ends (excluded).
+        npixels : int
+            Number of bins, e.g. the width of the axes in pixels.
+
+        Returns
+        -------
+        x : :obj:`numpy.ndarray`
+            Sample index of each vertex
+        y : :obj:`numpy.ndarray`
+            Value of each vertex, in physical units
+        """
+        index, mins, maxs, exact = self._bins(start, stop, npixels)
+        mins, maxs = self._physical(mins, maxs)
+        if exact:
+            return index, mins
+        return np.repeat(index, 2), np.stack([mins, maxs], axis=1).ravel()
@@ -2,16 +2,32 @@
 """
 Helper function to initialize a GUI window for visualizing and editing physiological data.
 """
+import os
+import time
 import tkinter as tk
 from copy import deepcopy
-from tkinter import ttk
+from tkinter import filedialog, ttk
 
+import numpy as np
 from darkdetect import theme
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.collections import PolyCollection
 from sv_ttk import set_theme
 
 from peakdet import __version__
 
+from .bids import (
+    _iter_bytes,
+    _uncompressed_size,
+    find_sidecar,
+    iter_text_blocks,
+    read_sidecar,
+)
+from .detect import POINT_TYPES, detect_points, redetect
+from .history import record
+from .io import EXTENSION
+from .jobs import JobRunner
+from .physio import Physio
 from .viz import plot_physiodata
 
 
@@ -20,12 +36,228 @@ def emptyfunc(physio=None):
     pass
 
 
+class TextLoader:
+    """
+    Reader of a (gzipped) delimited text file, run as a background job.
+
+    Rows are parsed block by block into a growing buffer, and the rows read
+    so far are available in :attr:`loaded` while the job runs, so that the
+    beginning of the recording can be shown and edited before the end of the
+    file is read.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the file.
+    block_bytes : int, optional
+        Number of bytes to read at once. Smaller blocks show the beginning of
+        the file sooner. Default: 4 MiB
+
+    Attributes
+    ----------
+    header : list of str or None
+        Column names if the file has a header line, else None
+    loaded : tuple
+        Buffer and number of rows read so far. The buffer is replaced by a
+        larger one when it is full, so the first rows of a buffer are never
+        modified once read.
+    nrows_estimate : int or None
+        Expected number of rows, from the size of the file
+    """
+
+    def __init__(self, path, block_bytes=2**22):
+        """Initialise TextLoader object."""
+        self.path = os.fspath(path)
+        self.block_bytes = block_bytes
+        self.header = None
+        self.loaded = (None, 0)
+        self.nrows_estimate = None
+
+    def _estimate_nrows(self, sample_bytes=2**16):
+        """Estimate the number of rows from the length of the first lines."""
+        chunks = _iter_bytes(self.path, sample_bytes)
+        sample = b""
+        for chunk in chunks:
+            sample += chunk
+            if len(sample) >= sample_bytes:
+                break
+        chunks.close()
+        row_bytes = len(sample) / max(sample.count(b"\n"), 1)
+        return int(_uncompressed_size(self.path) / max(row_bytes, 1)) + 1
+
+    def __call__(self, job):
+        """Read the file, reporting progress to `job`."""
+        self.nrows_estimate = self._estimate_nrows()
+        blocks = iter_text_blocks(self.path, block_bytes=self.block_bytes)
+        self.header = next(blocks)
+
+        data, nrows = None, 0
+        for block in blocks:
+            if data is None:
+                data = np.empty((int(self.nrows_estimate * 1.05) + 1, block.shape[1]))
+            if nrows + len(block) > len(data):
+                # A new buffer, so that views of the previous one stay valid
+                shape = (max(2 * len(data), nrows + len(block)), data.shape[1])
+                grown = np.empty(shape)
+                grown[:nrows] = data[:nrows]
+                data = grown
+            data[nrows : nrows + len(block)] = block
+            nrows += len(block)
+            # Publish buffer and rows at once, for the main thread
+            self.loaded = (data, nrows)
+            job.progress(min(nrows / self.nrows_estimate, 1), f"Loaded {nrows} samples")
+        return self.loaded
+
+
+class PointOverlay:
+    """
+    Peak, trough and artefact markers drawn over the cached traces of a canvas.
+
+    Markers are animated artists, so full redraws of the figure only render
+    the channel traces. The rendered background of each axes is cached after
+    every full draw, and editing the points of a channel only restores the
+    background of its axes and draws its markers on top (blitting).
+
+    Parameters
+    ----------
+    canvas : :obj:`matplotlib.backends.backend_tkagg.FigureCanvasTkAgg`
+        Canvas of the figure.
+    axes : list of :obj:`matplotlib.axes.Axes`
+        Axes of each channel.
+    physio : :obj:`peakdet.physio.Physio`
+        Object holding the points.
+    fs : array_like
+        Sampling rate of each channel, to convert samples to time.
+    """
+
+    def __init__(self, canvas, axes, physio, fs):
+        """Initialise PointOverlay object."""
+        self.canvas, self.axes, self.physio = canvas, list(axes), physio
+        self.fs = np.broadcast_to(np.asarray(fs, dtype=np.float64), len(self.axes))
+        self.backgrounds = [None] * len(self.axes)
+        self.artists = []
+        for ch, ax in enumerate(self.axes):
+            artists = {}
+            for k, marker in [("peaks", "r^"), ("troughs", "bv")]:
+                (artists[k],) = ax.plot([], [], marker, linestyle="none", animated=True)
+            # Rejected segments span the height of the axes
+            artists["reject"] = PolyCollection(
+                [],
+                transform=ax.get_xaxis_transform(),
+                facecolor="grey",
+                alpha=0.3,
+                animated=True,
+            )
+            ax.add_collection(artists["reject"], autolim=False)
+            self.artists.append(artists)
+            self._set_data(ch)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _set_data(self, ch):
+        """Update the markers of channel `ch` from the physio object."""
+        fs, scale = self.fs[ch], self.physio.scale[ch]
+        samples = self.physio.channel(ch, raw=True)
+        for k in ["peaks", "troughs"]:
+            idx = self.physio._masked(k)[ch].compressed()
+            values = samples[idx] * scale + self.physio.intercept[ch]
+            self.artists[ch][k].set_data(idx / fs, values)
+        starts, ends = self.physio._merged_reject(ch)
+        self.artists[ch]["reject"].set_verts(
+            [
+                [(s / fs, 0), (s / fs, 1), (e / fs, 1), (e / fs, 0)]
+                for s, e in zip(starts, ends)
+            ]
+        )
+
+    def _draw_markers(self, ch):
+        """Draw the markers of channel `ch` on its axes."""
+        for artist in self.artists[ch].values():
+            self.axes[ch].draw_artist(artist)
+
+    def _on_draw(self, event):
+        """Cache the background of all axes after a full draw, then add markers."""
+        if event.canvas.is_saving():
+            # Exported figures are not blitted: draw the markers in them
+            for artists in self.artists:
+                for artist in artists.values():
+                    artist.draw(event.renderer)
+            return
+        for ch, ax in enumerate(self.axes):
+            self.backgrounds[ch] = self.canvas.copy_from_bbox(ax.bbox)
+            self._draw_markers(ch)
+        # Markers are not part of the full draw, show them
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def update(self, ch):
+        """
+        Redraw the markers of channel `ch` after its points were edited.
+
+        Only the axes of the channel are updated.
+
+        Parameters
+        ----------
+        ch : int
+            Edited channel.
+        """
+        self._set_data(ch)
+        if self.backgrounds[ch] is None:
+            # Nothing was drawn yet: the next full draw shows the markers
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.backgrounds[ch])
+        self._draw_markers(ch)
+        self.canvas.blit(self.axes[ch].bbox)
+
+    def nearest(self, ch, kind, x, tolerance=10):
+        """
+        Return the point of `kind` closest to display position `x`, if any.
+
+        Parameters
+        ----------
+        ch : int
+            Channel of the points.
+        kind : {'peaks', 'troughs'}
+            Type of points.
+        x : float
+            Horizontal position in display coordinates (pixels).
+        tolerance : float, optional
+            Maximum distance in pixels. Default: 10
+
+        Returns
+        -------
+        int or None
+            Sample index of the closest point, None if none is close enough
+        """
+        points = self.physio._metadata[kind][ch]
+        if points.size == 0:
+            return None
+        ax = self.axes[ch]
+        time = ax.transData.inverted().transform([(x, 0)])[0, 0]
+        n = np.searchsorted(points, time * self.fs[ch])
+        candidates = points[max(n - 1, 0) : n + 1]
+        pixels = ax.transData.transform(
+            np.stack([candidates / self.fs[ch], np.zeros(candidates.size)], axis=1)
+        )[:, 0]
+        best = np.argmin(np.abs(pixels - x))
+        return int(candidates[best]) if abs(pixels[best] - x) <= tolerance else None
+
+
 class Window:
     def __init__(self, master, physio=None, fs=None):
         # This whole thing works only if "physio" is shallow-copied. Otherwise, it does not.
-
-        # ## Temporary channel for preview
-        channel_list = ["Channel 1", "Channel 2", "Channel 3"]
+        self.master = master
+        self.physio = physio
+        self.fs = fs
+        if physio is not None and not isinstance(physio, Physio):
+            self.physio = Physio(physio, fs=fs)
+            self.fs = None
+
+        # ## Channels for preview
+        channel_list = (
+            ["Channel 1", "Channel 2", "Channel 3"]
+            if self.physio is None
+            else self.physio._ch_names
+        )
 
         # ## Style
         set_theme(theme())
@@ -40,8 +272,8 @@ class Window:
         # File menu
         menu_file = tk.Menu(menu_master, tearoff=0)
         menu_master.add_cascade(label="File", menu=menu_file)
-        menu_file.add_command(label="Load", command=lambda: emptyfunc(physio))
-        menu_file.add_command(label="Save", command=lambda: emptyfunc(physio))
+        menu_file.add_command(label="Load", command=self.load_file)
+        menu_file.add_command(label="Save", command=self.save_file)
         menu_file.add_separator()
         menu_file.add_command(label="Exit", command=master.destroy)
 
@@ -61,8 +293,8 @@ class Window:
         # ## Report active file
         frame_title = ttk.Frame(master)
         frame_title.grid(row=0, column=0, columnspan=2, sticky="new", pady=(10, 5))
-        label = ttk.Label(frame_title, text="Name of file")
-        label.grid(row=0, column=0)
+        self.label_file = ttk.Label(frame_title, text="Name of file")
+        self.label_file.grid(row=0, column=0)
 
         # ######################## Left Frame ######################## #
 
@@ -114,9 +346,31 @@ class Window:
             row=4, column=0, columnspan=2, sticky="ew", padx=5, pady=3
         )
 
-        button_runpointdet = ttk.Button(frame_peakdet, text="Run detection")
+        button_runpointdet = ttk.Button(
+            frame_peakdet, text="Run detection", command=self.run_detection
+        )
         button_runpointdet.grid(row=5, column=0, columnspan=2, padx=5, pady=3)
 
+        # Progress of background jobs, which can be cancelled
+        progress_jobs = ttk.Progressbar(frame_peakdet, mode="indeterminate")
+        progress_jobs.grid(row=6, column=0, sticky="ew", padx=5, pady=3)
+        button_canceljobs = ttk.Button(
+            frame_peakdet, text="Cancel", command=self.cancel_jobs
+        )
+        button_canceljobs.grid(row=6, column=1, sticky="e", padx=5, pady=3)
+        label_status = ttk.Label(frame_peakdet, text="")
+        label_status.grid(row=7, column=0, columnspan=2, sticky="w", padx=5)
+
+        self.box_activechannel = box_activechannel
+        self.box_pointtype = box_pointtype
+        self.entry_thresh = entry_thresh
+        self.entry_dist = entry_dist
+        self.detect_opposite = detect_opposite
+        self.interaction = interaction
+        self.progress_jobs = progress_jobs
+        self.label_status = label_status
+        self.jobs = JobRunner(master)
+
         # Frame for peak editing
         frame_editpoints = ttk.LabelFrame(left_column, text="Edit Points")
         frame_editpoints.grid(row=1, column=0, sticky="ew", padx=3, pady=5)
@@ -201,22 +455,345 @@ class Window:
         right_column = ttk.Frame(master)
         right_column.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
 
-        # Get right_column dimensions to pass to plot_physiodata
-        right_column.update_idletasks()  # Ensure geometry information is updated
-        left_column.update_idletasks()  # Ensure geometry information is updated
-        plot_height = right_column.winfo_height() / 100
-        plot_width = (master.winfo_width() - left_column.winfo_width() - 10) / 100
+        self.left_column = left_column
+        self.right_column = right_column
+        self.frame_plotinteraction = frame_plotinteraction
+        self.canvas = None
+        self.toolbar = None
+        self.overlay = None
+        # Channel and sample where a span is being dragged over
+        self._drag_start = None
+        # Object shown from a text file while it loads, and its sidecar
+        self._loaded, self._loaded_shown, self._sidecar = None, 0, {}
+        self.plot()
+
+    def plot(self):
+        """Draw the current physio data, replacing the previous plot if any."""
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().destroy()
+            self.toolbar.destroy()
 
+        # Get right_column dimensions to pass to plot_physiodata
+        self.right_column.update_idletasks()  # Ensure geometry information is updated
+        self.left_column.update_idletasks()  # Ensure geometry information is updated
+        plot_height = self.right_column.winfo_height() / 100
+        plot_width = (
+            self.master.winfo_width() - self.left_column.winfo_width() - 10
+        ) / 100
+
+        # Points are drawn by the overlay, so that edits do not redraw traces
         fig, axes = plot_physiodata(
-            physio, fs=fs, height=plot_height, width=plot_width, show=False
+            self.physio,
+            fs=self.fs,
+            height=plot_height,
+            width=plot_width,
+            show=False,
+            markers=False,
+            interactive=False,
         )
-        canvas = FigureCanvasTkAgg(fig, master=right_column)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-        toolbar = NavigationToolbar2Tk(canvas, frame_plotinteraction)
-        toolbar.update()
-        toolbar.pack(anchor="c", padx=5, pady=3)
+        self.canvas = FigureCanvasTkAgg(fig, master=self.right_column)
+        fs = self.physio.fs if self.fs is None else self.fs
+        fs = np.nan_to_num(np.asarray(1 if fs is None else fs, dtype=np.float64), nan=1)
+        self.overlay = PointOverlay(self.canvas, axes, self.physio, fs)
+        self.canvas.mpl_connect("button_press_event", self.on_press)
+        self.canvas.mpl_connect("button_release_event", self.on_release)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame_plotinteraction)
+        self.toolbar.update()
+        self.toolbar.pack(anchor="c", padx=5, pady=3)
+
+    def _detection_settings(self):
+        """Return the selected channel and detection parameters, None if invalid."""
+        channel = self.box_activechannel.current()
+        kind = self.box_pointtype.get().lower()
+        if self.physio is None or channel < 0 or kind not in POINT_TYPES:
+            return None
+        try:
+            thresh = float(self.entry_thresh.get())
+            dist = int(float(self.entry_dist.get()))
+        except ValueError:
+            return None
+        params = dict(
+            thresh=thresh, dist=dist, kind=kind, opposite=self.detect_opposite.get()
+        )
+        return channel, params
+
+    def _job_started(self, message):
+        """Show that a background job is running."""
+        self.label_status.config(text=message)
+        self.progress_jobs.config(mode="indeterminate")
+        self.progress_jobs.start()
+
+    def _job_progress(self, fraction, message=None):
+        """Show the progress reported by a background job."""
+        if fraction is not None:
+            self.progress_jobs.stop()
+            self.progress_jobs.config(mode="determinate", value=100 * fraction)
+        if message is not None:
+            self.label_status.config(text=message)
+
+    def _job_finished(self, message=""):
+        """Show that background jobs are over, unless some are still running."""
+        self.label_status.config(text=message)
+        if not self.jobs.running:
+            self.progress_jobs.stop()
+            self.progress_jobs.config(mode="determinate", value=0)
+
+    def cancel_jobs(self):
+        """Cancel all background jobs."""
+        self.jobs.cancel()
+        self._job_finished("Cancelled")
+
+    def run_detection(self):
+        """Detect points in the active channel in the background."""
+        settings = self._detection_settings()
+        if settings is None:
+            return
+        channel, params = settings
+        # Detect on a snapshot sharing the samples, so that the points can be
+        # edited meanwhile: only the detected channel is updated at the end
+        physio = self.physio
+        snapshot = physio.__class__(
+            physio._data,
+            fs=physio.fs,
+            ch_names=physio._ch_names,
+            history=physio.history,
+            metadata=dict(physio._metadata),
+            copy=False,
+            scale=physio.scale,
+            intercept=physio.intercept,
+        )
+        self.jobs.submit(
+            ("detect", channel),
+            # Progress is reported after each step, and stops cancelled jobs
+            lambda job: detect_points(
+                snapshot, channel, progress=job.progress, **params
+            ),
+            on_done=lambda out: self._detection_done(physio, channel, params, out),
+            on_error=lambda exc: self._job_finished(f"Detection failed: {exc}"),
+            on_progress=self._job_progress,
+        )
+        self._job_started(f"Detecting {params['kind']} in channel {channel + 1}")
+
+    def _detection_done(self, physio, channel, params, out):
+        """Store the points detected in a snapshot of `physio`."""
+        # Drop results of stale parameters or of a replaced object
+        current = self._detection_settings()
+        if physio is not self.physio or current != (channel, params):
+            self._job_finished("Parameters changed, detection discarded")
+            return
+        kinds = POINT_TYPES if params["opposite"] else [params["kind"]]
+        for k in kinds:
+            physio.set_points(k, channel, out._metadata[k][channel])
+        detection = list(
+            physio._metadata.get("detection") or [{} for _ in range(physio.nch)]
+        )
+        detection[channel] = out._metadata["detection"][channel]
+        physio._metadata["detection"] = detection
+        op = out.history[-1]
+        record(physio, op.name, op.params, op.version)
+        self.overlay.update(channel)
+        self._job_finished(f"Detected {params['kind']} in channel {channel + 1}")
+
+    def _point_kind(self):
+        """Return the selected type of points, peaks by default."""
+        kind = self.box_pointtype.get().lower()
+        return kind if kind in POINT_TYPES else "peaks"
+
+    def on_press(self, event):
+        """Edit the points of the clicked channel, depending on the interaction."""
+        if self.toolbar.mode or event.inaxes not in self.overlay.axes:
+            return
+        ch = self.overlay.axes.index(event.inaxes)
+        sample = int(round(event.xdata * self.overlay.fs[ch]))
+        mode, kind = self.interaction.get(), self._point_kind()
+        if mode == 1:
+            point = self.overlay.nearest(ch, kind, event.x)
+            if point is None:
+                return
+            self.physio.remove_points(kind, ch, point)
+        elif mode == 2:
+            if not 0 <= sample < self.physio.channel_nsamples[ch]:
+                return
+            self.physio.add_points(kind, ch, sample)
+        elif mode in (3, 5):
+            # The span is processed when the button is released
+            self._drag_start = (ch, sample)
+            return
+        else:
+            return
+        self.overlay.update(ch)
+
+    def on_release(self, event):
+        """Re-detect points or mark an artefact in the span dragged over."""
+        if self._drag_start is None:
+            return
+        ch, start = self._drag_start
+        self._drag_start = None
+        if event.xdata is None:
+            return
+        end = int(round(event.xdata * self.overlay.fs[ch]))
+        start, end = np.clip(sorted([start, end]), 0, self.physio.channel_nsamples[ch])
+        if end <= start:
+            return
+        if self.interaction.get() == 3:
+            self._estimate_points(ch, start, end)
+            return
+        self.physio.add_reject(ch, start, end)
+        self._redetect_around(ch, start, end)
+        self.overlay.update(ch)
+
+    def _estimate_points(self, ch, start, end):
+        """Re-detect the points of `ch` in a span with the entered parameters."""
+        settings = self._detection_settings()
+        if settings is None:
+            self.label_status.config(text="Invalid detection settings")
+            return
+        params = settings[1]
+        kinds = POINT_TYPES if params["opposite"] else [params["kind"]]
+        detection = self.physio._metadata.get("detection")
+        if not detection or any(k not in detection[ch] for k in kinds):
+            self.label_status.config(text=f"Detect points in channel {ch + 1} first")
+            return
+        redetect(
+            self.physio,
+            start,
+            end,
+            channels=ch,
+            kinds=kinds,
+            thresh=params["thresh"],
+            dist=params["dist"],
+        )
+        self.overlay.update(ch)
+
+    def _redetect_around(self, ch, start, end):
+        """
+        Re-detect the points of `ch` that samples `start` to `end` may affect.
+
+        Samples suppress points up to `dist` samples away, so the span is
+        extended by the largest `dist` of the channel. Each region is
+        re-detected with its own parameters.
+        """
+        detection = self.physio._metadata.get("detection")
+        if not detection or not detection[ch]:
+            return
+        for kind, params in detection[ch].items():
+            regions = params["regions"]
+            margin = max(int(r[3]) for r in regions)
+            lo, hi = start - margin, end + margin
+            # Regions are replaced as they are re-detected: iterate on a copy
+            for r0, r1, _, _ in [list(r) for r in regions]:
+                if r0 < hi and r1 > lo:
+                    redetect(
+                        self.physio, max(r0, lo), min(r1, hi), channels=ch, kinds=kind
+                    )
+
+    def load_file(self):
+        """Ask for a peakdet or text file and open it in the editor."""
+        path = filedialog.askopenfilename(
+            filetypes=[
+                ("peakdet files", f"*{EXTENSION}"),
+                ("Text files", "*.tsv *.tsv.gz *.csv *.csv.gz *.txt"),
+                ("All files", "*"),
+            ]
+        )
+        if not path:
+            return
+        self.label_file.config(text=os.path.basename(path))
+        if path.endswith(EXTENSION):
+            self.jobs.cancel("load")
+            self._set_physio(Physio.load(path))
+            return
+
+        # Text files are parsed in the background, and shown while they load
+        sidecar = find_sidecar(path)
+        self._sidecar = {} if sidecar is None else read_sidecar(sidecar)
+        self._loaded, self._loaded_shown = None, 0
+        loader = TextLoader(path)
+        self.jobs.submit(
+            "load",
+            loader,
+            on_done=lambda out: self._show_loaded(loader, final=True),
+            on_error=lambda exc: self._job_finished(f"Loading failed: {exc}"),
+            on_progress=lambda *args: self._load_progress(loader, *args),
+        )
+        self._job_started(f"Loading {os.path.basename(path)}")
+
+    def _set_physio(self, physio):
+        """Show `physio` in the editor."""
+        self.physio = physio
+        self.fs = None
+        self.box_activechannel.config(values=physio._ch_names)
+        self.plot()
+
+    def _load_progress(self, loader, fraction, message):
+        """Show progress of `loader`, and the samples loaded so far."""
+        self._job_progress(fraction, message)
+        # Refresh the plot a few times per second at most
+        if time.monotonic() - self._loaded_shown >= 0.25:
+            self._show_loaded(loader)
+
+    def _show_loaded(self, loader, final=False):
+        """
+        Show the samples read by `loader`, keeping the edits made so far.
+
+        The object and the plot are created with the first samples, then
+        extended in place: envelopes only process the new samples, the view
+        and the toolbar history are kept, and detections running meanwhile
+        apply to the same object.
+        """
+        data, nrows = loader.loaded
+        if final:
+            self._job_finished(f"Loaded {nrows} samples")
+        if nrows == 0:
+            return
+        self._loaded_shown = time.monotonic()
+        if self._loaded is not None:
+            if self._loaded is not self.physio:
+                # Another object was opened meanwhile
+                return
+            self.physio._extend(data[:nrows])
+            for ax in self.overlay.axes:
+                ax.relim()
+                ax.autoscale_view(scalex=False)
+            # Traces are drawn again from their envelopes for the current view
+            ax = self.overlay.axes[0]
+            ax.callbacks.process("xlim_changed", ax)
+            self.canvas.draw_idle()
+            return
+
+        ch_names = self._sidecar.get("Columns", loader.header)
+        if ch_names is not None and len(ch_names) != data.shape[1]:
+            ch_names = None
+        self._loaded = Physio(
+            data[:nrows],
+            fs=self._sidecar.get("SamplingFrequency"),
+            ch_names=None if ch_names is None else list(ch_names),
+            copy=False,
+        )
+        self._set_physio(self._loaded)
+        if not final:
+            # Show the whole (estimated) duration, filled as samples arrive
+            fs = self._loaded.fs
+            fs = 1 if fs is None or np.isnan(fs).all() else np.nanmax(fs)
+            self.overlay.axes[0].set_xlim(0, loader.nrows_estimate / fs)
+            self.canvas.draw_idle()
+
+    def save_file(self):
+        """Ask for a destination and save the edited physio data there."""
+        path = filedialog.asksaveasfilename(
+            defaultextension=EXTENSION,
+            filetypes=[("peakdet files", f"*{EXTENSION}"), ("All files", "*")],
+        )
+        if not path:
+            return
+        if not isinstance(self.physio, Physio):
+            self.physio = Physio(self.physio, fs=self.fs)
+            self.fs = None
+        self.physio.save(path)
+        self.label_file.config(text=os.path.basename(path))
 
 
 def edit_physio(physio=None, fs=None):
@@ -225,10 +802,11 @@ def edit_physio(physio=None, fs=None):
     root.geometry("1920x1080")
     root.title(f"Peak Editor, prep4phys v{__version__}")
     new_physio = deepcopy(physio)
-    _ = Window(root, new_physio, fs)
+    window = Window(root, new_physio, fs)
     root.mainloop()
 
-    return new_physio
+    # The physio object might have been replaced through File > Load
+    return window.physio
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Operation log recording the functions applied to Physio objects.
+
+Each entry of ``Physio.history`` is an :obj:`Operation`: an immutable tuple
+with the name and version of the function, its parameters and the id of the
+previous operation. Ids chain the content of all previous operations, so two
+objects with the same last id went through the same steps. Entries are never
+modified, so histories are copied by reference, and large array parameters
+are stored once and identified by their content hash.
+"""
+import hashlib
+import json
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+# Arrays larger than this (in bytes) are stored by reference and content hash
+SMALL_PARAM_BYTES = 1024
+
+_OPERATIONS = {}
+
+
+def _hash(*buffers):
+    """Return the hex digest of bytes-like `buffers`."""
+    h = hashlib.blake2b(digest_size=16)
+    for buffer in buffers:
+        h.update(buffer)
+    return h.hexdigest()
+
+
+class ArrayRef:
+    """
+    Large array parameter of an operation, identified by its content hash.
+
+    Parameters
+    ----------
+    value : array_like or None
+        The array. It is None for operations loaded from disk, whose large
+        parameters were not saved.
+    digest : str or None, optional
+        Content hash of the array. If None, it is computed. Default: None
+    shape : tuple of int or None, optional
+        Shape of the array, if `value` is None. Default: None
+    dtype : str or None, optional
+        Data type of the array, if `value` is None. Default: None
+    """
+
+    __slots__ = ("value", "digest", "shape", "dtype")
+
+    def __init__(self, value, digest=None, shape=None, dtype=None):
+        """Initialise ArrayRef object."""
+        if value is not None:
+            value = np.array(value, copy=True)
+            value.flags.writeable = False
+            shape, dtype = value.shape, value.dtype.str
+            digest = _hash(
+                json.dumps([shape, dtype]).encode("utf-8"),
+                np.ascontiguousarray(value).data,
+            )
+        self.value, self.digest = value, digest
+        self.shape, self.dtype = tuple(shape), dtype
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayRef) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __str__(self):
+        return "{name}(digest={digest}, shape={shape}, dtype={dtype})".format(
+            name=self.__class__.__name__,
+            digest=self.digest,
+            shape=self.shape,
+            dtype=self.dtype,
+        )
+
+    __repr__ = __str__
+
+    def to_dict(self):
+        """Return the JSON-serializable description of the array (not its value)."""
+        return {"__ref__": self.digest, "shape": list(self.shape), "dtype": self.dtype}
+
+
+def _freeze(value):
+    """Return an immutable copy of parameter `value`."""
+    if isinstance(value, ArrayRef):
+        return value
+    if isinstance(value, Mapping):
+        if "__ref__" in value:
+            return ArrayRef(None, value["__ref__"], value["shape"], value["dtype"])
+        return MappingProxyType({str(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, np.ndarray):
+        if value.nbytes > SMALL_PARAM_BYTES:
+            return ArrayRef(value)
+        return _freeze(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _jsonable(value):
+    """Return frozen parameter `value` as JSON-compatible types."""
+    if isinstance(value, ArrayRef):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def _plain(value):
+    """Return frozen parameter `value` with dicts, e.g. for pickling."""
+    if isinstance(value, Mapping):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_plain(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    """Return frozen parameter `value` as arguments to call a function with."""
+    if isinstance(value, ArrayRef):
+        if value.value is None:
+            raise ValueError(
+                f"Value of parameter {value} is not available, it was not saved."
+            )
+        return value.value
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class Operation(tuple):
+    """
+    Immutable entry of the operation log of a Physio object.
+
+    The entry is a tuple ``(name, params, version, parent, id)``.
+
+    Parameters
+    ----------
+    name : str
+        Name of the function.
+    params : dict, optional
+        Parameters of the function. Arrays larger than ``SMALL_PARAM_BYTES``
+        are stored as :obj:`ArrayRef`. Default: None
+    version : int, optional
+        Version of the function, to be increased when its results change.
+        Default: 1
+    parent : str or None, optional
+        Id of the previous operation, None for the first one. Default: None
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name, params=None, version=1, parent=None):
+        """Create Operation object."""
+        params = _freeze({} if params is None else params)
+        content = json.dumps(
+            [parent, name, version, _jsonable(params)],
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+        return super().__new__(
+            cls, (str(name), params, int(version), parent, _hash(content))
+        )
+
+    def __getnewargs__(self):
+        return (self.name, _plain(self.params), self.version, self.parent)
+
+    def __deepcopy__(self, memo):
+        # Entries are immutable
+        return self
+
+    def __str__(self):
+        return "{name}({op}, version={version}, params={params})".format(
+            name=self.__class__.__name__,
+            op=self.name,
+            version=self.version,
+            params=dict(self.params),
+        )
+
+    __repr__ = __str__
+
+    name = property(lambda self: self[0], doc="Name of the function.")
+    params = property(lambda self: self[1], doc="Parameters of the function.")
+    version = property(lambda self: self[2], doc="Version of the function.")
+    parent = property(lambda self: self[3], doc="Id of the previous operation.")
+    id = property(lambda self: self[4], doc="Id of the operation and its parents.")
+
+    @classmethod
+    def from_entry(cls, entry, parent=None):
+        """
+        Convert a history entry, e.g. a ``(name, params)`` tuple, to an Operation.
+
+        Parameters
+        ----------
+        entry : tuple
+            Operation, or tuple with a function name and optionally its
+            parameters.
+        parent : str or None, optional
+            Id of the previous operation. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.history.Operation`
+            Operation
+        """
+        if isinstance(entry, cls) and entry.parent == parent:
+            return entry
+        if isinstance(entry, cls):
+            return cls(entry.name, entry.params, entry.version, parent)
+        params = entry[1] if len(entry) > 1 else {}
+        if not isinstance(params, Mapping):
+            params = {"args": params}
+        return cls(entry[0], params, parent=parent)
+
+    @classmethod
+    def from_dict(cls, entry):
+        """Create an Operation from the output of :meth:`Operation.to_dict`."""
+        return cls(entry["name"], entry["params"], entry["version"], entry["parent"])
+
+    def to_dict(self):
+        """
+        Return the operation as JSON-serializable types.
+
+        Large array parameters are described by their hash, without values.
+        """
+        return {
+            "name": self.name,
+            "version": self.version,
+            "parent": self.parent,
+            "id": self.id,
+            "params": _jsonable(self.params),
+        }
+
+    def kwargs(self):
+        """Return parameters as keyword arguments to call the function with."""
+        return _thaw(self.params)
+
+
+def as_history(entries):
+    """
+    Return `entries` as a list of Operations, chained by their parents.
+
+    Operations already chained are reused without copying.
+    """
+    history, parent = [], None
+    for entry in entries:
+        history.append(Operation.from_entry(entry, parent))
+        parent = history[-1].id
+    return history
+
+
+def record(physio, name, params=None, version=1):
+    """
+    Append an operation to the history of `physio`.
+
+    Parameters
+    ----------
+    physio : :obj:`peakdet.physio.Physio`
+        Object the operation was applied to.
+    name : str
+        Name of the function.
+    params : dict, optional
+        Parameters of the function. Default: None
+    version : int, optional
+        Version of the function. Default: 1
+    """
+    parent = physio._history[-1].id if physio._history else None
+    physio._history.append(Operation(name, params, version, parent))
+
+
+def register(name, version=1):
+    """
+    Register a function so that operations named `name` can be replayed.
+
+    The function must take a Physio object as first argument and the
+    operation parameters as keyword arguments, and return a Physio object.
+
+    Parameters
+    ----------
+    name : str
+        Name of the operation.
+    version : int, optional
+        Version of the function. Default: 1
+    """
+
+    def decorator(func):
+        _OPERATIONS[name] = (func, version)
+        return func
+
+    return decorator
+
+
+def replay(history, physio):
+    """
+    Apply the operations in `history` to `physio` again.
+
+    Parameters
+    ----------
+    history : list of :obj:`peakdet.history.Operation`
+        Operations to apply, e.g. the history of a processed object.
+    physio : :obj:`peakdet.physio.Physio`
+        Object to process, e.g. the raw input.
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        Processed object
+
+    Raises
+    ------
+    ValueError
+        If an operation is unknown, was recorded with another version of its
+        function, or has large parameters that were not saved
+    """
+    # Register the operations of peakdet
+    from . import detect  # noqa: F401
+
+    for op in as_history(history):
+        if op.name not in _OPERATIONS:
+            raise ValueError(f"Operation {op.name} cannot be replayed.")
+        func, version = _OPERATIONS[op.name]
+        if op.version != version:
+            raise ValueError(
+                f"Operation {op.name} was recorded with version {op.version}, "
+                f"but version {version} is installed."
+            )
+        physio = func(physio, **op.kwargs())
+    return physio
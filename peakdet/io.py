@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to save and load Physio objects in peakdet's native binary format.
+
+The format is made of:
+
+- a fixed 32-byte prefix with a magic string, the format version and the
+  position and size of the header;
+- the raw channel data, stored contiguously starting at a 64-byte aligned
+  offset, so that it can be memory-mapped (ragged data is stored as one
+  channel after the other, with per-channel offsets);
+- compact sections for peaks, troughs and rejected segments, each stored as
+  a flat index array plus per-channel offsets (peaks and troughs in the
+  index type of their :obj:`peakdet.points.PackedPoints`);
+- a JSON header with sampling rates, channel names, scale and intercept of
+  compact data, history, the remaining metadata and the position of every
+  section.
+"""
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .history import Operation
+from .points import PackedPoints
+from .ragged import RaggedArray
+
+MAGIC = b"PEAKDET\x00"
+VERSION = 1
+EXTENSION = ".phys"
+
+_PREFIX = struct.Struct("<8sIIQQ")
+_ALIGN = 64
+_INDEX_DTYPE = np.dtype("<i8")
+_BLOCK_ROWS = 2**16
+
+
+def _jsonable(obj):
+    """Convert numpy objects to JSON-compatible types."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _pad(f):
+    """Pad file `f` with zeros up to the next aligned position."""
+    pos = f.tell()
+    f.write(b"\x00" * (-pos % _ALIGN))
+    return f.tell()
+
+
+def _write_array(f, arr):
+    """Write 1D or 2D array `arr` to `f` at an aligned position, in blocks."""
+    offset = _pad(f)
+    for start in range(0, max(arr.shape[0], 1), _BLOCK_ROWS):
+        np.ascontiguousarray(arr[start : start + _BLOCK_ROWS]).tofile(f)
+    return offset
+
+
+def _pack_points(points):
+    """Pack a list of per-channel index arrays into (indices, offsets)."""
+    lengths = [len(p) for p in points]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(_INDEX_DTYPE)
+    indices = (
+        np.concatenate([np.asarray(p) for p in points]).astype(_INDEX_DTYPE)
+        if points
+        else np.empty(0, dtype=_INDEX_DTYPE)
+    )
+    return indices, offsets
+
+
+def _unpack_points(indices, offsets):
+    """Split flat `indices` back into a list of per-channel arrays."""
+    return [indices[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def save_physio(physio, path):
+    """
+    Save a Physio object in peakdet's native binary format.
+
+    Parameters
+    ----------
+    physio : :obj:`peakdet.physio.Physio`
+        Object to save.
+    path : str or os.PathLike
+        Output file path.
+
+    Raises
+    ------
+    TypeError
+        If history or metadata contain objects that cannot be serialized
+
+    Notes
+    -----
+    The file is written next to `path` under a temporary name, then moved
+    onto `path`. An object memory-mapped from `path` (e.g. loaded from it)
+    can thus be saved back to it, and `path` is left untouched if saving
+    fails.
+    """
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(
+        prefix=".", suffix=EXTENSION, dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            _write_physio(physio, f)
+        # Temporary files are private: use the permissions open() would give
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _write_physio(physio, f):
+    """Write `physio` to the open binary file `f`."""
+    data = physio._data
+    # Write Fortran-ordered data channel by channel without copying it
+    if physio.is_ragged:
+        order = "ragged"
+    elif (
+        isinstance(data, np.ndarray)
+        and data.flags.f_contiguous
+        and not data.flags.c_contiguous
+    ):
+        order = "F"
+    else:
+        order = "C"
+    metadata = dict(physio._metadata)
+    points = {
+        k: metadata.pop(k, PackedPoints.empty(physio.nch)) for k in ["peaks", "troughs"]
+    }
+    reject = metadata.pop("reject", [[] for _ in range(physio.nch)])
+
+    f.write(b"\x00" * _PREFIX.size)
+    if order == "ragged":
+        buffer = data.buffer if data.is_contiguous else data.copy().buffer
+        sections = {
+            "data": {
+                "offset": _write_array(f, buffer),
+                "dtype": buffer.dtype.str,
+                "shape": [buffer.size],
+                "order": order,
+                "offsets": [0] + np.cumsum(data.lengths).tolist(),
+            }
+        }
+    else:
+        sections = {
+            "data": {
+                "offset": _write_array(f, data.T if order == "F" else data),
+                "dtype": data.dtype.str,
+                "shape": list(data.shape),
+                "order": order,
+            }
+        }
+    nsamples = int(physio.channel_nsamples.max(initial=0))
+    for k, packed in points.items():
+        # Packed points are written as they are, in their compact index type
+        packed = PackedPoints.from_list(packed, nsamples)
+        indices = packed.indices.astype(packed.indices.dtype.newbyteorder("<"))
+        sections[k] = {
+            "offset": _write_array(f, indices),
+            "dtype": indices.dtype.str,
+            "count": indices.size,
+            "offsets": packed.offsets.tolist(),
+        }
+    indices, offsets = _pack_points(
+        [np.asarray(r, dtype=_INDEX_DTYPE).reshape(-1, 2) for r in reject]
+    )
+    sections["reject"] = {
+        "offset": _write_array(f, indices),
+        "count": indices.size,
+        "offsets": offsets.tolist(),
+    }
+
+    header = json.dumps(
+        {
+            "fs": physio.fs,
+            "ch_names": physio._ch_names,
+            "scale": physio.scale if physio.is_scaled else None,
+            "intercept": physio.intercept if physio.is_scaled else None,
+            "history": [op.to_dict() for op in physio.history],
+            "metadata": metadata,
+            "sections": sections,
+        },
+        default=_jsonable,
+    ).encode("utf-8")
+    header_offset = _pad(f)
+    f.write(header)
+    f.seek(0)
+    f.write(_PREFIX.pack(MAGIC, VERSION, 0, header_offset, len(header)))
+
+
+def load_physio(path, mmap=True):
+    """
+    Load a Physio object saved in peakdet's native binary format.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the file to load.
+    mmap : bool, optional
+        If True, the data is memory-mapped (read-only) rather than read in
+        memory, so that loading time does not depend on the recording length.
+        Default: True
+
+    Returns
+    -------
+    :obj:`peakdet.physio.Physio`
+        Loaded Physio object
+
+    Raises
+    ------
+    ValueError
+        If `path` is not a peakdet file or its version is not supported
+    """
+    from .physio import Physio
+
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size or not prefix.startswith(MAGIC):
+            raise ValueError(f"{path} is not a peakdet file.")
+        _, version, _, header_offset, header_len = _PREFIX.unpack(prefix)
+        if version > VERSION:
+            raise ValueError(
+                f"{path} has format version {version}, but only versions up to "
+                f"{VERSION} are supported. Please update peakdet."
+            )
+        f.seek(header_offset)
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+        sections = header["sections"]
+        metadata = header["metadata"]
+        for k in ["peaks", "troughs", "reject"]:
+            section = sections[k]
+            f.seek(section["offset"])
+            indices = np.fromfile(
+                f, dtype=section.get("dtype", _INDEX_DTYPE), count=section["count"]
+            )
+            if k == "reject":
+                metadata[k] = [
+                    [tuple(r) for r in rej.tolist()]
+                    for rej in _unpack_points(
+                        indices.reshape(-1, 2), section["offsets"]
+                    )
+                ]
+            else:
+                metadata[k] = PackedPoints(indices, section["offsets"])
+
+        section = sections["data"]
+        shape = tuple(section["shape"])
+        stored_shape = shape[::-1] if section["order"] == "F" else shape
+        if mmap and np.prod(stored_shape) > 0:
+            data = np.memmap(
+                path,
+                dtype=section["dtype"],
+                mode="r",
+                offset=section["offset"],
+                shape=stored_shape,
+            )
+        else:
+            f.seek(section["offset"])
+            data = np.fromfile(
+                f, dtype=section["dtype"], count=int(np.prod(stored_shape))
+            ).reshape(stored_shape)
+        if section["order"] == "F":
+            data = data.T
+        elif section["order"] == "ragged":
+            data = RaggedArray(data, section["offsets"])
+
+    return Physio(
+        data,
+        fs=header["fs"],
+        ch_names=header["ch_names"],
+        history=[
+            Operation.from_dict(h) if isinstance(h, dict) else tuple(h)
+            for h in header["history"]
+        ],
+        metadata=metadata,
+        copy=False,
+        scale=header.get("scale"),
+        intercept=header.get("intercept"),
+    )
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Background execution of long operations (detection, loading) for the GUI.
+
+Functions run in worker threads and post their progress and results to a
+thread-safe queue, which the Tk main loop polls with ``after()``: callbacks
+(e.g. updating the plot) always run in the main thread, and the window stays
+responsive while the operation runs.
+"""
+import queue
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised in a worker thread when its job was cancelled."""
+
+
+class Job:
+    """
+    Function running in a worker thread, started by :meth:`JobRunner.submit`.
+
+    The function is called as ``func(job, *args, **kwargs)``, and can call
+    :meth:`Job.progress` to report its progress and stop early if the job was
+    cancelled.
+
+    Attributes
+    ----------
+    key : hashable
+        Identifier of the job. A new job with the same key supersedes it.
+    result : object
+        Output of the function, once it is done
+    """
+
+    def __init__(self, runner, key, func, args, kwargs):
+        """Initialise Job object."""
+        self.key = key
+        self.result = None
+        self._runner = runner
+        self._func, self._args, self._kwargs = func, args, kwargs
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __str__(self):
+        return "{name}(key={key}, cancelled={cancelled})".format(
+            name=self.__class__.__name__, key=self.key, cancelled=self.cancelled
+        )
+
+    __repr__ = __str__
+
+    @property
+    def cancelled(self):
+        """Whether the job was cancelled or superseded."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Cancel the job: its progress and result are dropped."""
+        self._cancelled.set()
+
+    def progress(self, fraction=None, message=None):
+        """
+        Report the progress of the job, from the worker thread.
+
+        Parameters
+        ----------
+        fraction : float or None, optional
+            Fraction of the work done, in [0, 1], or None if unknown.
+            Default: None
+        message : str or None, optional
+            Description of the current step. Default: None
+
+        Raises
+        ------
+        JobCancelled
+            If the job was cancelled, so that the function stops
+        """
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.key} was cancelled.")
+        self._runner._post(self, "progress", (fraction, message))
+
+    def _run(self):
+        """Run the function and post its result (in the worker thread)."""
+        try:
+            result = self._func(self, *self._args, **self._kwargs)
+        except JobCancelled:
+            return
+        except Exception as exc:
+            self._runner._post(self, "error", exc)
+        else:
+            self._runner._post(self, "done", result)
+
+
+class JobRunner:
+    """
+    Run functions in worker threads and deliver their results in the Tk loop.
+
+    Each job has a key, e.g. the operation and channel it applies to.
+    Submitting a job cancels the running job with the same key, and results
+    of cancelled or superseded jobs are dropped when they arrive, so that
+    callbacks only see the output of the latest request.
+
+    Parameters
+    ----------
+    master : :obj:`tkinter.Misc`
+        Widget whose ``after()`` method polls the result queue.
+    interval : int, optional
+        Polling interval in milliseconds, while jobs are running. Default: 50
+    """
+
+    def __init__(self, master, interval=50):
+        """Initialise JobRunner object."""
+        self.master = master
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._callbacks = {}
+        self._polling = None
+
+    def __str__(self):
+        return "{name}(running={running})".format(
+            name=self.__class__.__name__, running=list(self._jobs)
+        )
+
+    __repr__ = __str__
+
+    @property
+    def running(self):
+        """Keys of the jobs that did not report their result yet."""
+        return list(self._jobs)
+
+    def submit(
+        self,
+        key,
+        func,
+        *args,
+        on_done=None,
+        on_error=None,
+        on_progress=None,
+        **kwargs,
+    ):
+        """
+        Run ``func(job, *args, **kwargs)`` in a worker thread.
+
+        Callbacks are called in the main thread.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifier of the job. A running job with the same key is
+            cancelled.
+        func : callable
+            Function to run. It receives the :obj:`Job` as first argument.
+        *args
+            Positional arguments of `func`.
+        on_done : callable or None, optional
+            Called with the output of `func` when it returns. Default: None
+        on_error : callable or None, optional
+            Called with the exception raised by `func`. If None, the exception
+            is raised in the Tk loop. Default: None
+        on_progress : callable or None, optional
+            Called with the fraction and message of each progress report.
+            Default: None
+        **kwargs
+            Keyword arguments of `func`.
+
+        Returns
+        -------
+        :obj:`peakdet.jobs.Job`
+            The submitted job
+        """
+        self.cancel(key)
+        job = Job(self, key, func, args, kwargs)
+        self._jobs[key] = job
+        self._callbacks[job] = (on_done, on_error, on_progress)
+        job._thread.start()
+        if self._polling is None:
+            self._polling = self.master.after(self.interval, self._poll)
+        return job
+
+    def cancel(self, key=None):
+        """
+        Cancel the job with `key`, or all jobs if `key` is None.
+
+        Parameters
+        ----------
+        key : hashable or None, optional
+            Key of the job to cancel. Default: None
+        """
+        keys = list(self._jobs) if key is None else [key]
+        for k in keys:
+            job = self._jobs.pop(k, None)
+            if job is not None:
+                job.cancel()
+                self._callbacks.pop(job, None)
+
+    def _post(self, job, event, value):
+        """Queue an event of `job` for the main thread."""
+        self._queue.put((job, event, value))
+
+    def _poll(self):
+        """Deliver queued events to the callbacks of current jobs."""
+        self._polling = None
+        try:
+            while True:
+                try:
+                    job, event, value = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._deliver(job, event, value)
+        finally:
+            # Callbacks can submit jobs, which already restarts polling
+            if self._jobs and self._polling is None:
+                self._polling = self.master.after(self.interval, self._poll)
+
+    def _deliver(self, job, event, value):
+        """Call the callback of `job` for `event`, unless the job is stale."""
+        # Drop events of cancelled and superseded jobs
+        if job.cancelled or self._jobs.get(job.key) is not job:
+            return
+        on_done, on_error, on_progress = self._callbacks[job]
+        if event == "progress":
+            if on_progress is not None:
+                on_progress(*value)
+            return
+        del self._jobs[job.key], self._callbacks[job]
+        if event == "done":
+            job.result = value
+            if on_done is not None:
+                on_done(value)
+        elif on_error is not None:
+            on_error(value)
+        else:
+            raise value
@@ -2,10 +2,123 @@
 """
 Helper class for holding physiological data and associated metadata information
 """
+import hashlib
+import json
+import os
 from copy import deepcopy
 
 import numpy as np
 
+from .envelope import Envelope
+from .history import as_history, record, register
+from .points import PackedPoints
+from .ragged import RaggedArray
+
+
+def _is_lazy_array(data):
+    """Whether `data` is a read-only array-like backend (e.g. a ChunkedArray)."""
+    return not isinstance(data, np.ndarray) and all(
+        hasattr(data, attr) for attr in ["shape", "dtype", "ndim", "__getitem__"]
+    )
+
+
+def _chunk_bounds(nsamples, chunk, overlap, start=0, core_start=0):
+    """
+    Yield bounds of overlapping chunks of `nsamples` samples.
+
+    Each chunk is described by (start, stop, core_start, core_stop), where the
+    core is the part of the chunk that it owns: cores tile the recording
+    without gaps or overlaps, with boundaries in the middle of each overlap.
+    """
+    step = chunk - overlap
+    while True:
+        stop = min(start + chunk, nsamples)
+        if stop >= nsamples:
+            yield start, stop, core_start, nsamples
+            return
+        core_stop = start + step + overlap // 2
+        yield start, stop, core_start, core_stop
+        start, core_start = start + step, core_stop
+
+
+def _crop_intervals(intervals, start, stop):
+    """Clip (start, end) intervals to [start, stop) and shift them by `start`."""
+    return [
+        (max(s, start) - start, min(e, stop) - start)
+        for s, e in intervals
+        if min(e, stop) > max(s, start)
+    ]
+
+
+def _crop_merged(starts, ends, start, stop):
+    """
+    Clip merged intervals to [start, stop) and shift them by `start`.
+
+    Only the intervals overlapping the range are visited, found by binary
+    search on the sorted `starts` and `ends`.
+    """
+    lo = np.searchsorted(ends, start, side="right")
+    hi = np.searchsorted(starts, stop, side="left")
+    return [
+        (int(max(s, start) - start), int(min(e, stop) - start))
+        for s, e in zip(starts[lo:hi], ends[lo:hi])
+    ]
+
+
+def _crop_detection(detection, starts, stops):
+    """
+    Clip the regions of detection parameters to [start, stop) of each channel.
+
+    Regions are shifted by the start of their channel, and the ones outside
+    the range are dropped.
+    """
+    cropped = []
+    for params, start, stop in zip(detection, starts, stops):
+        cropped.append(
+            {
+                k: {
+                    "vrange": p["vrange"],
+                    "regions": [
+                        [max(r0, start) - start, min(r1, stop) - start, th, d]
+                        for r0, r1, th, d in p["regions"]
+                        if r0 < stop and r1 > start
+                    ],
+                }
+                for k, p in params.items()
+            }
+        )
+    return cropped
+
+
+def _merge_intervals(intervals):
+    """
+    Sort and merge half-open (start, end) intervals.
+
+    Returns
+    -------
+    starts, ends : :obj:`numpy.ndarray`
+        Sorted starts and ends of disjoint, non-adjacent intervals
+    """
+    arr = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    arr = arr[arr[:, 1] > arr[:, 0]]
+    if arr.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    arr = arr[np.argsort(arr[:, 0], kind="stable")]
+    # An interval starts a new group if it begins after all previous ones ended
+    new = np.ones(arr.shape[0], dtype=bool)
+    new[1:] = arr[1:, 0] > np.maximum.accumulate(arr[:-1, 1])
+    groups = np.flatnonzero(new)
+    return arr[groups, 0], np.maximum.reduceat(arr[:, 1], groups)
+
+
+def _in_intervals(points, starts, ends):
+    """Return whether each of `points` is in one of the merged intervals."""
+    if starts.size == 0:
+        return np.zeros(np.shape(points), dtype=bool)
+    # Index of the last interval starting at or before each point
+    n = np.searchsorted(starts, points, side="right") - 1
+    return (n >= 0) & (points < ends[np.maximum(n, 0)])
+
 
 class Physio:
     """
@@ -13,14 +126,31 @@ class Physio:
 
     Parameters
     ----------
-    data : array_like
-        Input data array or a list of lists.
+    data : array_like or :obj:`peakdet.ragged.RaggedArray`
+        Input data array or a list of lists. Channels with different lengths
+        (e.g. sampling rates) can be given as a RaggedArray, see
+        :meth:`Physio.from_channels`.
     fs : array_like, optional
         Sampling rates corresponding to each channel in `data` (Hz). Default: None
     history : list of tuples, optional
-        Functions performed on `data`. Default: None
+        Functions performed on `data`, as :obj:`peakdet.history.Operation` or
+        ``(name, params)`` tuples. Default: None
     metadata : dict, optional
         Metadata associated with `data`. Default: None
+    copy : bool or None, optional
+        If True, `data` and `metadata` are copied (history entries are
+        immutable and always shared). If False, the object
+        keeps a read-only view of the input buffer and copies it only when it is
+        written to (copy-on-write). If None, `data` is copied unless it is a
+        :obj:`numpy.memmap` or a lazy array-like backend (e.g. a
+        :obj:`peakdet.store.ChunkedArray`), which stay backed by disk.
+        Default: None
+    scale : array_like or None, optional
+        Per-channel factor converting stored samples to physical units, for
+        compact (e.g. raw ADC int16) data: ``physical = raw * scale +
+        intercept``. If None, samples are stored in physical units. Default: None
+    intercept : array_like or None, optional
+        Per-channel value added to scaled samples, see `scale`. Default: None
 
     Attributes
     ----------
@@ -28,42 +158,111 @@ class Physio:
         Physiological waveform with shape (n_samples, n_channels)
     fs : :obj:`numpy.ndarray`
         Array of sampling rates corresponding to each channel in Hz
-    history : list of tuples
+    history : list of :obj:`peakdet.history.Operation`
         History of functions that have been performed on `data`, with relevant
         parameters provided to functions.
     peaks : list of :obj:`numpy.ndarray`
         List of 1D arrays, each containing indices of peaks in each channel of `data`
     troughs : list of :obj:`numpy.ndarray`
         List of 1D arrays, each containing indices of troughs in each channel of `data`
+
+    Notes
+    -----
+    With ragged data each channel keeps its own number of samples, and
+    peaks, troughs and rejected segments are sample indices of their own
+    channel. Use :meth:`Physio.channel` to access the samples of a channel
+    in any storage mode, and :meth:`Physio.aligned` (or `data`) for a matrix
+    view, available only when all channels share the same rate and length.
+
+    Peaks and troughs are stored in ``_metadata`` as
+    :obj:`peakdet.points.PackedPoints`, which can be indexed by channel like a
+    list of 1D arrays. Lists passed in `metadata` are packed (sorted and made
+    unique) on initialisation.
     """
 
     def __init__(
-        self, data, fs=None, ch_names=None, history=None, metadata=None, suppdata=None
+        self,
+        data,
+        fs=None,
+        ch_names=None,
+        history=None,
+        metadata=None,
+        suppdata=None,
+        copy=None,
+        scale=None,
+        intercept=None,
     ):
         """Initialise Physio object."""
-        self._data = np.asarray(deepcopy(data))
-        if self._data.ndim > 2:
+        if copy is None:
+            copy = not (
+                isinstance(data, np.memmap)
+                or isinstance(getattr(data, "buffer", None), np.memmap)
+                or _is_lazy_array(data)
+            )
+        if isinstance(data, RaggedArray):
+            # Channels of different lengths share one contiguous buffer
+            self._data = data.copy() if copy else data
+            self._owns_data = bool(copy)
+            if not copy:
+                buffer = data.buffer.view()
+                buffer.flags.writeable = False
+                self._data = RaggedArray._view(buffer, data.starts, data.stops)
+        elif copy:
+            self._data = np.array(data, copy=True)
+            self._owns_data = True
+        elif _is_lazy_array(data):
+            # Lazy backends are read on access and materialized on first write
+            self._data = data
+            self._owns_data = False
+        else:
+            # Keep memmaps as such, so that data stays backed by disk pages
+            self._data = data if isinstance(data, np.memmap) else np.asarray(data)
+            # If asarray did not have to build a new array, the buffer is the caller's
+            self._owns_data = not isinstance(data, np.ndarray)
+            if not self._owns_data:
+                self._data = self._data.view()
+                self._data.flags.writeable = False
+        if self.is_ragged:
+            pass
+        elif self._data.ndim > 2:
             raise ValueError(f"Provided data dimensionality {self._data.ndim} > 2.")
-        if self._data.ndim == 1:
+        elif self._data.ndim == 1:
             self._data = self._data[:, np.newaxis]
+        nch, nmax = self.nch, int(self.channel_nsamples.max(initial=0))
 
         if not np.issubdtype(self._data.dtype, np.number):
             raise ValueError(
                 f"Provided data of type {self._data.dtype} is not numeric."
             )
 
-        self._fs = np.asarray(deepcopy(fs), dtype=np.float64)
+        self._fs = np.array(fs, dtype=np.float64)
         if self._fs.ndim == 0:
-            self._fs = np.full(self._data.shape[1], self._fs)
-        elif self._fs.shape[0] != self._data.shape[1] or self._fs.ndim > 1:
+            self._fs = np.full(nch, self._fs)
+        elif self._fs.ndim > 1 or self._fs.shape[0] != nch:
             raise ValueError(
                 "Specified frequency must be either a number or a 1D array with length equal to the number of channels in data."
             )
 
+        self._scale = np.ones(nch) if scale is None else np.array(scale, dtype=float)
+        self._intercept = (
+            np.zeros(nch) if intercept is None else np.array(intercept, dtype=float)
+        )
+        for name, value in [("scale", self._scale), ("intercept", self._intercept)]:
+            if value.ndim == 0:
+                value = np.full(nch, value)
+            elif value.ndim > 1 or value.shape[0] != nch:
+                raise ValueError(
+                    f"Specified {name} must be either a number or a 1D array with "
+                    "length equal to the number of channels in data."
+                )
+            setattr(self, f"_{name}", value)
+        if not np.all(np.isfinite(self._scale) & (self._scale != 0)):
+            raise ValueError(
+                f"Specified scale {self._scale} must be finite and non-zero."
+            )
+
         self._ch_names = (
-            [f"ch{i}" for i in range(self._data.shape[1])]
-            if ch_names is None
-            else deepcopy(ch_names)
+            [f"ch{i}" for i in range(nch)] if ch_names is None else deepcopy(ch_names)
         )
         if not isinstance(self._ch_names, list) or any(
             [not isinstance(f, str) for f in self._ch_names]
@@ -72,85 +271,807 @@ class Physio:
                 "Provided channels name list must be a list-of-strings. Please check inputs."
             )
 
-        self._history = [] if history is None else deepcopy(history)
-        if not isinstance(self._history, list) or any(
-            [not isinstance(f, tuple) for f in self._history]
+        if history is None:
+            history = []
+        if not isinstance(history, list) or any(
+            [not isinstance(f, tuple) for f in history]
         ):
             raise TypeError(
                 f"Provided history {history} must be a list-of-tuples. Please check inputs."
             )
+        # Operations are immutable, so they are shared rather than copied
+        self._history = as_history(history)
 
         if metadata is not None:
             if not isinstance(metadata, dict):
                 raise TypeError(f"Provided metadata {metadata} must be dict-like.")
+            # Shallow copy, so that defaults are not added to the caller's dict
+            metadata = dict(metadata)
             for k in ["peaks", "troughs"]:
                 if k in metadata:
-                    if not isinstance(metadata[k], list) or any(
+                    if not isinstance(metadata[k], (list, PackedPoints)) or any(
                         [
                             not isinstance(arr, np.ndarray) or arr.ndim != 1
                             for arr in metadata[k]
                         ]
                     ):
                         raise TypeError(f"{k} must be a list of 1D numpy arrays.")
-                    if len(metadata[k]) != self._data.shape[1]:
+                    if len(metadata[k]) != nch:
                         raise ValueError(
                             f"{k} must have length equal to the number of channels in data."
                         )
+                    metadata[k] = PackedPoints.from_list(metadata[k], nmax)
                 else:
-                    metadata[k] = [
-                        np.empty(0, dtype=int) for _ in range(self._data.shape[1])
-                    ]
-            self._metadata = dict(**deepcopy(metadata))
+                    metadata[k] = PackedPoints.empty(nch, nmax)
+            if "reject" not in metadata:
+                metadata["reject"] = [[] for _ in range(nch)]
+            self._metadata = deepcopy(metadata) if copy else metadata
 
         else:
             self._metadata = {
-                "peaks": [np.empty(0, dtype=int) for _ in range(self._data.shape[1])],
-                "troughs": [np.empty(0, dtype=int) for _ in range(self._data.shape[1])],
-                "reject": [[] for _ in range(self._data.shape[1])],
+                "peaks": PackedPoints.empty(nch, nmax),
+                "troughs": PackedPoints.empty(nch, nmax),
+                "reject": [[] for _ in range(nch)],
             }
 
+        # Position of this object in a longer recording, for windows and chunks
+        self._offset = 0
+        self._core = None
+
+        # Masked points and merged rejected segments, per channel
+        self._masked_cache = {}
+        self._reject_cache = {}
+        self._cache_stats = {"hits": 0, "rebuilds": 0}
+        self._fingerprint = None
+        # Min/max pyramids of channels, for display
+        self._envelope_cache = {}
+
     def __array__(self):
-        return self.data
+        return np.asarray(self.data)
 
     def __getitem__(self, slicer):
-        return self.data[slicer]
+        if not self.is_scaled:
+            return self.data[slicer]
+        # Only the selected samples are converted to physical units
+        raw = self.aligned(raw=True)
+        scale, intercept = self._broadcast_scale(raw.shape)
+        return raw[slicer] * scale[slicer] + intercept[slicer]
+
+    def __setitem__(self, slicer, value):
+        self._ensure_owned()
+        self._fingerprint = None
+        # Only envelopes of the channels written to are computed again
+        channels = range(self.nch)
+        if isinstance(slicer, tuple) and len(slicer) == 2 and not self.is_ragged:
+            channels = set(np.arange(self.nch)[slicer[1]].ravel().tolist())
+        for key in [key for key in self._envelope_cache if key[0] in channels]:
+            del self._envelope_cache[key]
+        if not self.is_scaled:
+            self.data[slicer] = value
+            return
+        # Physical values are quantized to the storage type
+        raw = self.aligned(raw=True)
+        scale, intercept = self._broadcast_scale(raw.shape)
+        value = (np.asarray(value) - intercept[slicer]) / scale[slicer]
+        if np.issubdtype(raw.dtype, np.integer):
+            info = np.iinfo(raw.dtype)
+            value = np.clip(np.rint(value), info.min, info.max)
+        raw[slicer] = value
 
     def __len__(self):
-        return len(self.data)
+        return self.shape[0]
 
     def __str__(self):
         return "{name}(size={size}, fs={fs})".format(
-            name=self.__class__.__name__, size=self.data.size, fs=self.fs
+            name=self.__class__.__name__, size=self._data.size, fs=self.fs
         )
 
     __repr__ = __str__
 
+    @classmethod
+    def wrap(cls, data, fs=None, ch_names=None, history=None, metadata=None):
+        """
+        Wrap `data` in a Physio object without copying it.
+
+        The returned object keeps a read-only view of `data`, that is copied
+        only when the Physio object is written to (copy-on-write). Modifying
+        `data` in place after wrapping it will be reflected in the object.
+
+        Parameters
+        ----------
+        data : array_like
+            Input data array or a list of lists.
+        fs : array_like, optional
+            Sampling rates corresponding to each channel in `data` (Hz). Default: None
+        ch_names : list of str, optional
+            Names of the channels in `data`. Default: None
+        history : list of tuples, optional
+            Functions performed on `data`. Default: None
+        metadata : dict, optional
+            Metadata associated with `data`. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Physio object sharing `data`'s buffer
+        """
+        return cls(
+            data,
+            fs=fs,
+            ch_names=ch_names,
+            history=history,
+            metadata=metadata,
+            copy=False,
+        )
+
+    @classmethod
+    def from_channels(
+        cls, channels, fs=None, ch_names=None, history=None, metadata=None, dtype=None
+    ):
+        """
+        Create a Physio object from channels with their own number of samples.
+
+        Channels are stored in one contiguous buffer without padding or
+        resampling, so that e.g. a 5 kHz ECG and a 50 Hz respiration belt
+        each use only the memory they need.
+
+        Parameters
+        ----------
+        channels : list of array_like
+            1D samples of each channel.
+        fs : array_like, optional
+            Sampling rates corresponding to each channel (Hz). Default: None
+        ch_names : list of str, optional
+            Names of the channels. Default: None
+        history : list of tuples, optional
+            Functions performed on the data. Default: None
+        metadata : dict, optional
+            Metadata associated with the data. Peaks, troughs and rejected
+            segments are indices of the samples of their channel. Default: None
+        dtype : data-type or None, optional
+            Data type of the samples. If None, it is inferred from `channels`.
+            Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Physio object with ragged data
+        """
+        return cls(
+            RaggedArray.from_list(channels, dtype),
+            fs=fs,
+            ch_names=ch_names,
+            history=history,
+            metadata=metadata,
+            copy=False,
+        )
+
+    @classmethod
+    def open_mmap(
+        cls,
+        path,
+        dtype,
+        nch,
+        fs=None,
+        ch_names=None,
+        offset=0,
+        order="C",
+        mode="r",
+        history=None,
+        metadata=None,
+    ):
+        """
+        Open a raw binary recording as a disk-backed Physio object.
+
+        The samples are memory-mapped, so opening the file does not read it and
+        only the pages that are accessed are loaded in memory. Metadata (peaks,
+        troughs, rejected segments) are kept in memory.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            Path to a headerless binary file containing the samples.
+        dtype : data-type
+            Data type of the samples in the file.
+        nch : int
+            Number of channels in the file.
+        fs : array_like, optional
+            Sampling rates corresponding to each channel (Hz). Default: None
+        ch_names : list of str, optional
+            Names of the channels. Default: None
+        offset : int, optional
+            Offset in bytes of the first sample in the file. Default: 0
+        order : {'C', 'F'}, optional
+            'C' if samples are interleaved (sample-major, i.e. one row per
+            timepoint), 'F' if each channel is stored contiguously. Default: 'C'
+        mode : {'r', 'r+', 'c'}, optional
+            Mode of the memory map, see :obj:`numpy.memmap`. With 'r' the
+            file is never modified and writing to the object copies the data in
+            memory (copy-on-write). With 'r+' writes go to the file, and with
+            'c' they only change the pages written to, in memory: in both
+            cases the object stays backed by the file. Default: 'r'
+        history : list of tuples, optional
+            Functions performed on the data. Default: None
+        metadata : dict, optional
+            Metadata associated with the data. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Physio object backed by `path`
+
+        Raises
+        ------
+        ValueError
+            If the file size is not compatible with `dtype` and `nch`
+        """
+        dtype = np.dtype(dtype)
+        nbytes = os.path.getsize(path) - offset
+        if nch < 1 or nbytes < 0 or nbytes % (dtype.itemsize * nch):
+            raise ValueError(
+                f"Size of {path} is not compatible with {nch} channels of {dtype}."
+            )
+        data = np.memmap(
+            path,
+            dtype=dtype,
+            mode=mode,
+            offset=offset,
+            shape=(nbytes // (dtype.itemsize * nch), nch),
+            order=order,
+        )
+        physio = cls(
+            data,
+            fs=fs,
+            ch_names=ch_names,
+            history=history,
+            metadata=metadata,
+            copy=False,
+        )
+        if mode != "r":
+            # The map is writable: write through it instead of copying it
+            physio._data, physio._owns_data = data, True
+        return physio
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a Physio object saved with :meth:`Physio.save`.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            Path to the file to load.
+        mmap : bool, optional
+            If True, the data is memory-mapped rather than read in memory.
+            Default: True
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Loaded Physio object
+        """
+        from .io import load_physio
+
+        return load_physio(path, mmap=mmap)
+
+    def save(self, path):
+        """
+        Save the Physio object in peakdet's native binary format.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            Output file path.
+        """
+        from .io import save_physio
+
+        save_physio(self, path)
+
+    def _slice_samples(self, start, stop):
+        """
+        Return a Physio object with samples `start` to `stop` of this one.
+
+        Data is a view of this object's buffer. Peaks and troughs (assumed
+        sorted) and rejected segments (merged) are cropped and shifted with
+        binary searches, so the cost does not depend on the recording length.
+        Regions of detection parameters are cropped and shifted as well.
+        With ragged data, `start` and `stop` can be given for each channel.
+        """
+        metadata = dict(self._metadata)
+        for k in ["peaks", "troughs"]:
+            metadata[k] = self._metadata[k].crop(start, stop)
+        starts = np.broadcast_to(start, (self.nch,))
+        stops = np.broadcast_to(stop, (self.nch,))
+        if metadata.get("detection"):
+            # Regions of detection parameters are indexed like points
+            metadata["detection"] = _crop_detection(
+                metadata["detection"], starts, stops
+            )
+        if "reject" in metadata:
+            metadata["reject"] = [
+                _crop_merged(*self._merged_reject(ch), starts[ch], stops[ch])
+                for ch in range(self.nch)
+            ]
+        window = self.__class__(
+            self._data.crop(start, stop) if self.is_ragged else self._data[start:stop],
+            fs=self._fs,
+            ch_names=self._ch_names,
+            history=self._history,
+            metadata=metadata,
+            copy=False,
+            scale=self._scale,
+            intercept=self._intercept,
+        )
+        window._offset = self._offset + start
+        return window
+
+    def isel(self, samples):
+        """
+        Return the samples selected by `samples` as a Physio object.
+
+        The returned object shares this object's data buffer, and its peaks,
+        troughs and rejected segments are cropped and expressed relative to
+        its first sample, whose absolute index is `offset`. The cost is
+        logarithmic in the number of samples and points, plus the number of
+        returned points.
+
+        Parameters
+        ----------
+        samples : slice
+            Contiguous range of samples (negative bounds count from the end).
+            With ragged data, bounds apply to the samples of each channel.
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            View of the selected samples
+
+        Raises
+        ------
+        ValueError
+            If `samples` is not a slice with a step of 1
+        """
+        if not isinstance(samples, slice) or samples.step not in (None, 1):
+            raise ValueError(
+                f"Samples must be a slice with a step of 1, got {samples}."
+            )
+        bounds = np.array(
+            [samples.indices(int(n))[:2] for n in self.channel_nsamples]
+        ).reshape(-1, 2)
+        start, stop = bounds[:, 0], np.maximum(bounds[:, 1], bounds[:, 0])
+        if not self.is_ragged:
+            start, stop = int(start[0]), int(stop[0])
+        return self._slice_samples(start, stop)
+
+    def window(self, t0, t1):
+        """
+        Return the samples between times `t0` and `t1` as a Physio object.
+
+        Samples at times ``t0 <= t < t1`` are selected, where the time of
+        sample ``i`` of a channel is ``i / fs``. The returned object shares
+        this object's data buffer, see :meth:`Physio.isel`.
+
+        Parameters
+        ----------
+        t0 : float
+            Start time in seconds, relative to the first sample.
+        t1 : float
+            End time in seconds (excluded).
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            View of the selected samples
+
+        Raises
+        ------
+        ValueError
+            If sampling rates are unknown, or they differ between channels of
+            non-ragged data
+        """
+        if self.is_ragged:
+            if np.isnan(self._fs).any():
+                raise ValueError(
+                    f"All sampling rates must be known, but fs is {self._fs}."
+                )
+            fs = self._fs
+        else:
+            fs = self._samples_per_second()
+        nsamples = self.channel_nsamples
+        start = np.clip(np.ceil(np.multiply(t0, fs)), 0, nsamples).astype(np.int64)
+        stop = np.clip(np.ceil(np.multiply(t1, fs)), start, nsamples).astype(np.int64)
+        if not self.is_ragged:
+            start, stop = int(start[0]), int(stop[0])
+        return self._slice_samples(start, stop)
+
+    def _samples_per_second(self):
+        """Return the sampling rate shared by all channels."""
+        if np.isnan(self._fs).any() or np.unique(self._fs).size != 1:
+            raise ValueError(
+                "All channels must have the same, known sampling rate, "
+                f"but fs is {self._fs}."
+            )
+        return self._fs[0]
+
+    def iter_chunks(self, chunk_seconds, overlap_seconds=0):
+        """
+        Iterate over overlapping time windows of the recording.
+
+        Windows are Physio objects that share this object's data buffer. Their
+        peaks, troughs and rejected segments are cropped to the window and
+        expressed relative to its first sample, whose absolute index is
+        `offset`. Results computed on the windows can be merged back with
+        :meth:`Physio.stitch`.
+
+        Parameters
+        ----------
+        chunk_seconds : float
+            Duration of each window in seconds.
+        overlap_seconds : float, optional
+            Overlap between consecutive windows in seconds. It should be larger
+            than the context needed by the processing applied to the windows
+            (e.g. twice the minimum peak distance). Default: 0
+
+        Yields
+        ------
+        :obj:`peakdet.physio.Physio`
+            Window of the recording
+
+        Raises
+        ------
+        ValueError
+            If channels have different sampling rates, or the overlap is not
+            shorter than the windows
+        """
+        fs = self._samples_per_second()
+        chunk = int(round(chunk_seconds * fs))
+        overlap = int(round(overlap_seconds * fs))
+        if chunk < 1 or not 0 <= overlap < chunk:
+            raise ValueError(
+                f"Chunks of {chunk} samples with {overlap} samples overlap are not "
+                "valid: chunks must be longer than their overlap."
+            )
+        for start, stop, core_start, core_stop in _chunk_bounds(
+            int(self.channel_nsamples.max()), chunk, overlap
+        ):
+            window = self._slice_samples(start, stop)
+            window._core = (core_start - start, core_stop - start)
+            yield window
+
+    def stitch(self, chunks, keys=("peaks", "troughs")):
+        """
+        Merge metadata computed on windows of this recording back into it.
+
+        For each window only the points within its core (the part of the
+        window that is not owned by a neighbouring window) are kept, so that
+        points in overlaps are neither duplicated nor lost.
+
+        Parameters
+        ----------
+        chunks : iterable of :obj:`peakdet.physio.Physio`
+            Windows, as yielded by :meth:`Physio.iter_chunks`.
+        keys : iterable of str, optional
+            Metadata to merge, among 'peaks', 'troughs' and 'reject'.
+            Default: ('peaks', 'troughs')
+        """
+        merged = {k: [[] for _ in range(self.nch)] for k in keys}
+        for chunk in chunks:
+            core_start, core_stop = chunk._core or (0, chunk.channel_nsamples.max())
+            shifts = np.broadcast_to(chunk._offset - self._offset, (self.nch,))
+            for k in keys:
+                if k != "reject":
+                    # Points of all channels are cropped and shifted at once
+                    points = chunk._metadata[k].crop(core_start, core_stop)
+                    points = points.shift(core_start + shifts)
+                    for ch in range(self.nch):
+                        merged[k][ch].append(points[ch])
+                    continue
+                for ch, intervals in enumerate(chunk._metadata[k]):
+                    shift = shifts[ch] + core_start
+                    merged[k][ch].append(
+                        [
+                            (s + shift, e + shift)
+                            for s, e in _crop_intervals(
+                                intervals, core_start, core_stop
+                            )
+                        ]
+                    )
+
+        for k in keys:
+            if k == "reject":
+                # Segments crossing a core boundary are joined back together
+                self._metadata[k] = []
+                for intervals in merged[k]:
+                    joined = []
+                    for s, e in [i for part in intervals for i in part]:
+                        if joined and joined[-1][1] == s:
+                            joined[-1] = (joined[-1][0], e)
+                        else:
+                            joined.append((s, e))
+                    self._metadata[k].append(joined)
+            else:
+                self._metadata[k] = PackedPoints.from_list(
+                    [
+                        np.concatenate(parts) if parts else np.empty(0, dtype=int)
+                        for parts in merged[k]
+                    ],
+                    int(self.channel_nsamples.max()),
+                )
+        self._invalidate(reject="reject" in keys)
+
+    def _ensure_owned(self):
+        """Copy the data buffer if it is shared with the caller (copy-on-write)."""
+        if not self._owns_data:
+            if self.is_ragged:
+                self._data = self._data.copy()
+            else:
+                self._data = np.array(self._data, copy=True)
+            self._owns_data = True
+
+    def _broadcast_scale(self, shape):
+        """Return scale and intercept broadcast (without copy) to `shape`."""
+        return (
+            np.broadcast_to(self._scale, shape),
+            np.broadcast_to(self._intercept, shape),
+        )
+
+    def channel(self, ch, raw=False):
+        """
+        Return the samples of channel `ch`.
+
+        Parameters
+        ----------
+        ch : int
+            Channel index.
+        raw : bool, optional
+            If True, return the stored samples (e.g. ADC values) rather than
+            physical values. Default: False
+
+        Returns
+        -------
+        array_like
+            1D samples of the channel. They are a view of the stored samples,
+            unless the channel is scaled and `raw` is False.
+        """
+        samples = self._data[ch] if self.is_ragged else self._data[:, ch]
+        if raw or (self._scale[ch] == 1 and self._intercept[ch] == 0):
+            return samples
+        return samples * self._scale[ch] + self._intercept[ch]
+
+    def envelope(self, ch, block=16, factor=4):
+        """
+        Return the min/max envelope pyramid of channel `ch`, for display.
+
+        The pyramid is computed from the stored samples on first use, then
+        cached until samples of the channel are modified.
+
+        Parameters
+        ----------
+        ch : int
+            Channel index.
+        block : int, optional
+            Number of samples in the blocks of the finest level. Default: 16
+        factor : int, optional
+            Reduction factor between consecutive levels. Default: 4
+
+        Returns
+        -------
+        :obj:`peakdet.envelope.Envelope`
+            Envelope of the channel, in physical units
+        """
+        ch = range(self.nch)[ch]
+        key = (ch, block, factor)
+        if key not in self._envelope_cache:
+            self._envelope_cache[key] = Envelope(
+                self.channel(ch, raw=True),
+                block=block,
+                factor=factor,
+                scale=self._scale[ch],
+                intercept=self._intercept[ch],
+            )
+        return self._envelope_cache[key]
+
+    def _extend(self, data):
+        """
+        Replace the samples with `data`, whose first rows are the current ones.
+
+        This shows a recording while it is read: points and rejected segments
+        stay valid, and cached envelopes are extended with the new samples
+        only. `data` is kept as a read-only view, like with ``copy=False``.
+        """
+        data = np.asarray(data)
+        if (
+            self.is_ragged
+            or data.ndim != 2
+            or data.shape[1] != self.nch
+            or data.shape[0] < self.nsamples
+            or data.dtype != self._data.dtype
+        ):
+            raise ValueError(
+                f"Cannot extend data of shape {self.shape} and type "
+                f"{self._data.dtype} with data of shape {data.shape} and type "
+                f"{data.dtype}."
+            )
+        view = data.view()
+        view.flags.writeable = False
+        self._data, self._owns_data = view, False
+        self._fingerprint = None
+        for (ch, _, _), envelope in self._envelope_cache.items():
+            envelope.extend(self.channel(ch, raw=True))
+
+    def aligned(self, raw=False):
+        """
+        Return data as a (n_samples, n_channels) matrix.
+
+        Parameters
+        ----------
+        raw : bool, optional
+            If True, return the stored samples rather than physical values.
+            Default: False
+
+        Returns
+        -------
+        array_like
+            Data matrix. It is a view of the stored samples, unless data is
+            scaled and `raw` is False.
+
+        Raises
+        ------
+        ValueError
+            If data is ragged and channels have different sampling rates or
+            numbers of samples
+        """
+        if not self.is_ragged:
+            samples = self._data
+        elif np.unique(self._fs).size > 1 and not np.isnan(self._fs).all():
+            raise ValueError(
+                f"Channels have different sampling rates ({self._fs}) and "
+                "cannot be aligned. Use Physio.channel to access them."
+            )
+        else:
+            samples = self._data.aligned()
+        if raw or not self.is_scaled:
+            return samples
+        return samples * self._scale + self._intercept
+
+    def compact(self, dtype=np.int16):
+        """
+        Return a copy of the object with samples stored in a compact type.
+
+        With an integer `dtype`, each channel is quantized over its own range
+        (the scale and intercept are chosen so that the range spans the whole
+        type), and physical values are recovered as ``raw * scale +
+        intercept``. The maximum absolute error is ``abs(scale) / 2``, i.e.
+        the channel range divided by about 131000 for int16. With a floating
+        `dtype` samples are only cast, with a relative error of about 6e-8 for
+        float32. Peaks, troughs and rejected segments are kept. Quantization
+        can flatten the top of smooth extrema, so points detected on compact
+        data can be a few samples earlier than on the original data.
+
+        Parameters
+        ----------
+        dtype : data-type, optional
+            Storage type, e.g. int16 or float32. Default: int16
+
+        Returns
+        -------
+        :obj:`peakdet.physio.Physio`
+            Object with compact samples
+
+        Raises
+        ------
+        ValueError
+            If `dtype` is an integer type and data contains NaN or inf values
+        """
+        dtype = np.dtype(dtype)
+        scale, intercept = np.ones(self.nch), np.zeros(self.nch)
+        channels = []
+        for ch in range(self.nch):
+            samples = np.asarray(self.channel(ch), dtype=np.float64)
+            if np.issubdtype(dtype, np.integer):
+                if not np.isfinite(samples).all():
+                    raise ValueError(
+                        f"Channel {ch} has non-finite values and cannot be "
+                        f"stored as {dtype}."
+                    )
+                lo, hi = (samples.min(), samples.max()) if samples.size else (0, 0)
+                # Symmetric range, so that the type minimum is never used
+                intercept[ch] = (hi + lo) / 2
+                scale[ch] = (hi - lo) / (2 * np.iinfo(dtype).max) or 1
+                samples = np.rint((samples - intercept[ch]) / scale[ch])
+            channels.append(samples.astype(dtype))
+
+        if self.is_ragged:
+            data = RaggedArray.from_list(channels, dtype)
+        else:
+            data = np.empty((self.nsamples, self.nch), dtype=dtype, order="F")
+            for ch, samples in enumerate(channels):
+                data[:, ch] = samples
+        out = self.__class__(
+            data,
+            fs=self._fs,
+            ch_names=self._ch_names,
+            history=self._history,
+            metadata=dict(self._metadata),
+            copy=False,
+            scale=scale,
+            intercept=intercept,
+        )
+        record(out, "compact", {"dtype": dtype.str})
+        return out
+
     @property
     def data(self):
-        """Physiological data."""
-        return self._data
+        """Physiological data, as a (n_samples, n_channels) matrix."""
+        return self.aligned()
+
+    @property
+    def raw(self):
+        """Stored samples, as a (n_samples, n_channels) matrix."""
+        return self.aligned(raw=True)
+
+    @property
+    def scale(self):
+        """Per-channel factor converting stored samples to physical units."""
+        return self._scale
+
+    @property
+    def intercept(self):
+        """Per-channel value added to scaled samples to get physical units."""
+        return self._intercept
+
+    @property
+    def is_scaled(self):
+        """Whether stored samples must be scaled to get physical values."""
+        return bool(np.any(self._scale != 1) or np.any(self._intercept != 0))
+
+    @property
+    def is_ragged(self):
+        """Whether channels are stored with their own number of samples."""
+        return isinstance(self._data, RaggedArray)
+
+    @property
+    def is_mmap(self):
+        """Whether `data` is backed by a memory-mapped file."""
+        return isinstance(getattr(self._data, "buffer", self._data), np.memmap)
 
     @property
     def ndim(self):
-        """Ndarray ndim."""
-        return self._data.ndim
+        """Ndarray ndim, always 2 (samples and channels)."""
+        return 2
 
     @property
     def shape(self):
-        """Ndarray ndim."""
+        """
+        Ndarray shape, (n_samples, n_channels).
+
+        It is computed from the stored samples, without converting them. If
+        data is ragged, n_samples is the number of samples of the longest
+        channel.
+        """
+        if self.is_ragged:
+            return (int(self._data.lengths.max(initial=0)), self.nch)
         return self._data.shape
 
     @property
     def nsamples(self):
         """
-        Property. Returns number of channels (ch).
+        Property. Returns number of samples.
 
         Returns
         -------
-        int
-            Number of channels
+        int or :obj:`numpy.ndarray`
+            Number of samples, or number of samples of each channel if data
+            is ragged
         """
-        return self._data.shape[0]
+        return self._data.lengths if self.is_ragged else self._data.shape[0]
+
+    @property
+    def channel_nsamples(self):
+        """Number of samples of each channel."""
+        if self.is_ragged:
+            return self._data.lengths
+        return np.full(self.nch, self._data.shape[0])
 
     @property
     def nch(self):
@@ -162,7 +1083,16 @@ class Physio:
         int
             Number of channels
         """
-        return self._data.shape[1]
+        return len(self._data) if self.is_ragged else self._data.shape[1]
+
+    @property
+    def offset(self):
+        """
+        Absolute index of the first sample, if this is a window of a recording.
+
+        It is an array with one index per channel for windows of ragged data.
+        """
+        return self._offset
 
     @property
     def fs(self):
@@ -189,22 +1119,232 @@ class Physio:
         """Return indices of rejected areas in `data`."""
         return self._metadata["reject"]
 
-    @property
     def _masked(self, k):
-        mask_range = []
-        for sublist in self._metadata["reject"]:
-            ranges = []
-            for start, end in sublist:
-                ranges.append(np.arange(start, end))
-            concatenated = np.concatenate(ranges) if ranges else np.array([], dtype=int)
-            mask_range.append(concatenated)
-
-        mask = []
-        for n, array in enumerate(self._metadata[k]):
-            mask.append(
-                np.ma.masked_array(
-                    self._metadata[k], mask=np.isin(array, mask_range[n])
-                )
+        """Return points `k` of each channel, masked where they are rejected."""
+        missing = [ch for ch in range(self.nch) if (k, ch) not in self._masked_cache]
+        points = self._metadata[k]
+        if len(missing) == self.nch:
+            # Channels are masked in one vectorized pass over the packed points
+            mask = points.mask([self._merged_reject(ch) for ch in range(self.nch)])
+            masks = [
+                mask[points.offsets[ch] : points.offsets[ch + 1]] for ch in missing
+            ]
+        else:
+            # Only channels edited since the last call are masked again
+            masks = [
+                _in_intervals(points[ch], *self._merged_reject(ch)) for ch in missing
+            ]
+        for ch, mask in zip(missing, masks):
+            # Cached arrays are shared by all callers, so they are read-only
+            data = points[ch].view()
+            data.flags.writeable = mask.flags.writeable = False
+            self._masked_cache[k, ch] = np.ma.masked_array(
+                data, mask=mask, shrink=False
             )
+        self._cache_stats["rebuilds"] += len(missing)
+        self._cache_stats["hits"] += self.nch - len(missing)
+        return [self._masked_cache[k, ch] for ch in range(self.nch)]
+
+    def _merged_reject(self, ch):
+        """Return sorted starts and ends of merged rejected segments of `ch`."""
+        if ch not in self._reject_cache:
+            self._reject_cache[ch] = _merge_intervals(self._metadata["reject"][ch])
+        return self._reject_cache[ch]
+
+    def _invalidate(self, channels=None, kinds=None, reject=False):
+        """
+        Drop cached masked points of `channels` (all if None) and `kinds`.
+
+        This must be called after editing ``_metadata`` directly. If `reject`
+        is True, merged rejected segments are dropped too.
+        """
+        self._fingerprint = None
+        channels = range(self.nch) if channels is None else np.atleast_1d(channels)
+        kinds = ["peaks", "troughs"] if kinds is None else np.atleast_1d(kinds)
+        for ch in channels:
+            for k in kinds:
+                self._masked_cache.pop((k, ch), None)
+            if reject:
+                self._reject_cache.pop(ch, None)
+
+    def fingerprint(self, memoize=True, chunk_bytes=2**24):
+        """
+        Return a stable hash of the content of the object.
+
+        Stored samples (with their type), sampling rates, channel names,
+        scale and intercept, peaks, troughs and rejected segments are
+        streamed through BLAKE2b. Samples are hashed channel by channel, in
+        chunks of at most `chunk_bytes`, so the result does not depend on the
+        memory layout and memory-mapped data is read once, without being
+        loaded in memory as a whole. History is not included.
+
+        Parameters
+        ----------
+        memoize : bool, optional
+            If True, the fingerprint is kept until the object is modified
+            through its methods (setting samples, editing points or rejected
+            segments, detection). Writing to `data` directly is not tracked.
+            Objects sharing a buffer they do not own (wrapped arrays, windows,
+            read-only memory maps and lazy backends) are always hashed again,
+            as the buffer can change without them knowing. Default: True
+        chunk_bytes : int, optional
+            Maximum size of the chunks of samples hashed at once. Default:
+            2**24 (16 MiB)
+
+        Returns
+        -------
+        str
+            Hex digest
+        """
+        # Buffers owned by others can be written to behind our back
+        memoize = memoize and self._owns_data
+        if memoize and self._fingerprint is not None:
+            return self._fingerprint
+
+        h = hashlib.blake2b(digest_size=20)
+        h.update(
+            json.dumps(
+                [
+                    self._fs.tolist(),
+                    self._ch_names,
+                    self._scale.tolist(),
+                    self._intercept.tolist(),
+                    self.channel_nsamples.tolist(),
+                ]
+            ).encode("utf-8")
+        )
+        for ch in range(self.nch):
+            samples = self.channel(ch, raw=True)
+            dtype = np.dtype(samples.dtype).newbyteorder("<")
+            h.update(dtype.str.encode("utf-8"))
+            step = max(chunk_bytes // dtype.itemsize, 1)
+            for start in range(0, samples.shape[0], step):
+                # Contiguous little-endian chunks are hashed without copies
+                chunk = np.ascontiguousarray(samples[start : start + step], dtype)
+                h.update(chunk.data)
+        for k in ["peaks", "troughs"]:
+            points = PackedPoints.from_list(self._metadata[k])
+            h.update(np.ascontiguousarray(points.indices, "<i8").data)
+            h.update(np.ascontiguousarray(points.offsets, "<i8").data)
+        for starts, ends in map(self._merged_reject, range(self.nch)):
+            h.update(np.stack([starts, ends]).astype("<i8").tobytes())
+            h.update(b"|")
+
+        digest = h.hexdigest()
+        if memoize:
+            self._fingerprint = digest
+        return digest
+
+    def cache_info(self):
+        """
+        Return statistics on the cache of masked peaks and troughs.
+
+        Returns
+        -------
+        dict
+            Number of cache `hits` and `rebuilds` of masked channel points,
+            and number of channel points currently cached (`size`)
+        """
+        return dict(self._cache_stats, size=len(self._masked_cache))
+
+    def set_points(self, kind, channel, indices):
+        """
+        Replace peaks or troughs of a channel.
+
+        Parameters
+        ----------
+        kind : {'peaks', 'troughs'}
+            Type of points to replace.
+        channel : int
+            Channel of the points.
+        indices : array_like
+            New indices of the points. They are sorted and made unique.
+        """
+        # Replace the packed points, as they might be shared with other objects
+        self._metadata[kind] = self._metadata[kind].replace({channel: indices})
+        self._invalidate(channel, kind)
+
+    def add_points(self, kind, channel, indices):
+        """
+        Add peaks or troughs to a channel.
+
+        Parameters
+        ----------
+        kind : {'peaks', 'troughs'}
+            Type of points to add.
+        channel : int
+            Channel of the points.
+        indices : int or array_like
+            Indices of the points to add.
+        """
+        self.set_points(
+            kind,
+            channel,
+            np.concatenate([self._metadata[kind][channel], np.atleast_1d(indices)]),
+        )
+
+    def remove_points(self, kind, channel, indices):
+        """
+        Remove peaks or troughs from a channel.
+
+        Parameters
+        ----------
+        kind : {'peaks', 'troughs'}
+            Type of points to remove.
+        channel : int
+            Channel of the points.
+        indices : int or array_like
+            Indices of the points to remove. Indices that are not points of
+            the channel are ignored.
+        """
+        points = self._metadata[kind][channel]
+        self.set_points(kind, channel, points[~np.isin(points, indices)])
+
+    def add_reject(self, channel, start, end):
+        """
+        Mark samples `start` to `end` (excluded) of a channel as rejected.
+
+        Parameters
+        ----------
+        channel : int
+            Channel of the rejected segment.
+        start : int
+            First rejected sample.
+        end : int
+            Sample at which the rejected segment ends (excluded).
+        """
+        reject = list(self._metadata["reject"])
+        reject[channel] = list(reject[channel]) + [(int(start), int(end))]
+        self._metadata["reject"] = reject
+        self._invalidate(channel, reject=True)
+
+    def remove_reject(self, channel, start, end):
+        """
+        Unmark samples `start` to `end` (excluded) of a channel as rejected.
+
+        Rejected segments partially overlapping the range are shortened or
+        split.
+
+        Parameters
+        ----------
+        channel : int
+            Channel of the rejected segments.
+        start : int
+            First sample to unmark.
+        end : int
+            Sample at which to stop unmarking (excluded).
+        """
+        kept = []
+        for s, e in self._metadata["reject"][channel]:
+            if s < end and e > start:
+                # Keep the parts of the segment outside the unmarked range
+                kept += [(s, start), (end, e)]
+            else:
+                kept.append((s, e))
+        reject = list(self._metadata["reject"])
+        reject[channel] = [(s, e) for s, e in kept if e > s]
+        self._metadata["reject"] = reject
+        self._invalidate(channel, reject=True)
+
 
-        return mask
+register("compact")(Physio.compact)
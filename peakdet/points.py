@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Packed storage for per-channel point indices (e.g. peaks and troughs).
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+
+def index_dtype(nsamples=None):
+    """
+    Return the smallest signed integer type able to index `nsamples` samples.
+
+    Parameters
+    ----------
+    nsamples : int or None, optional
+        Number of samples. If None, int64 is returned. Default: None
+
+    Returns
+    -------
+    :obj:`numpy.dtype`
+        int32 if `nsamples` is lower than 2**31, int64 otherwise
+    """
+    if nsamples is not None and nsamples < 2**31:
+        return np.dtype(np.int32)
+    return np.dtype(np.int64)
+
+
+class PackedPoints(Sequence):
+    """
+    Sorted point indices of several channels, packed in one contiguous array.
+
+    Points of channel ``ch`` are ``indices[offsets[ch]:offsets[ch + 1]]``
+    (compressed sparse row layout). Indexing the object by channel returns a
+    view of its points, so that it can be used as a list of 1D arrays, while
+    bulk operations (shift, crop, mask, save) work on all channels at once.
+    Objects are not modified in place: operations return new objects.
+
+    Parameters
+    ----------
+    indices : array_like
+        Sorted point indices of all channels, concatenated.
+    offsets : array_like
+        Start of the points of each channel in `indices`, plus the total
+        number of points (length n_channels + 1).
+
+    Attributes
+    ----------
+    indices : :obj:`numpy.ndarray`
+        Point indices of all channels
+    offsets : :obj:`numpy.ndarray`
+        Start of the points of each channel in `indices`, plus their number
+    """
+
+    def __init__(self, indices, offsets):
+        """Initialise PackedPoints object."""
+        self.indices = np.asarray(indices)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if not np.issubdtype(self.indices.dtype, np.integer) or self.indices.ndim != 1:
+            raise TypeError("Point indices must be a 1D array of integers.")
+        if (
+            self.offsets.ndim != 1
+            or self.offsets.size < 1
+            or self.offsets[0] != 0
+            or self.offsets[-1] != self.indices.size
+            or np.any(np.diff(self.offsets) < 0)
+        ):
+            raise ValueError(
+                f"Offsets {self.offsets} do not match {self.indices.size} indices."
+            )
+        self.indices.flags.writeable = False
+
+    @classmethod
+    def from_list(cls, points, nsamples=None):
+        """
+        Pack a list of per-channel arrays of point indices.
+
+        Parameters
+        ----------
+        points : list of array_like
+            Indices of the points of each channel. They are sorted and made
+            unique.
+        nsamples : int or None, optional
+            Number of samples in the recording, used to pick the most compact
+            index type. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.points.PackedPoints`
+            Packed points
+        """
+        if isinstance(points, cls):
+            return points.astype(index_dtype(nsamples))
+        points = [np.unique(np.asarray(p, dtype=np.int64)) for p in points]
+        offsets = np.zeros(len(points) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([p.size for p in points])
+        indices = (
+            np.concatenate(points) if points else np.empty(0, dtype=np.int64)
+        ).astype(index_dtype(nsamples))
+        return cls(indices, offsets)
+
+    @classmethod
+    def empty(cls, nch, nsamples=None):
+        """
+        Return packed points of `nch` channels without any point.
+
+        Parameters
+        ----------
+        nch : int
+            Number of channels.
+        nsamples : int or None, optional
+            Number of samples in the recording. Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.points.PackedPoints`
+            Empty packed points
+        """
+        return cls(np.empty(0, dtype=index_dtype(nsamples)), np.zeros(nch + 1))
+
+    def __getitem__(self, ch):
+        if isinstance(ch, slice):
+            return [self[n] for n in range(*ch.indices(len(self)))]
+        ch = range(len(self))[ch]
+        return self.indices[self.offsets[ch] : self.offsets[ch + 1]]
+
+    def __len__(self):
+        return self.offsets.size - 1
+
+    def __str__(self):
+        return "{name}(nch={nch}, npoints={npoints}, dtype={dtype})".format(
+            name=self.__class__.__name__,
+            nch=len(self),
+            npoints=self.indices.size,
+            dtype=self.indices.dtype,
+        )
+
+    __repr__ = __str__
+
+    @property
+    def counts(self):
+        """Number of points of each channel."""
+        return np.diff(self.offsets)
+
+    @property
+    def channels(self):
+        """Channel of each point in `indices`."""
+        return np.repeat(np.arange(len(self)), self.counts)
+
+    @property
+    def nbytes(self):
+        """Memory used by the packed arrays, in bytes."""
+        return self.indices.nbytes + self.offsets.nbytes
+
+    def tolist(self):
+        """Return the points of each channel as a list of (read-only) views."""
+        return [self[ch] for ch in range(len(self))]
+
+    def astype(self, dtype):
+        """Return packed points with indices of type `dtype`."""
+        if self.indices.dtype == dtype:
+            return self
+        return self.__class__(self.indices.astype(dtype), self.offsets)
+
+    def replace(self, points):
+        """
+        Return packed points where some channels have new points.
+
+        Parameters
+        ----------
+        points : dict
+            New point indices (array_like) for each channel to replace. They
+            are sorted and made unique.
+
+        Returns
+        -------
+        :obj:`peakdet.points.PackedPoints`
+            Updated packed points
+        """
+        arrays = self.tolist()
+        for ch, idx in points.items():
+            arrays[ch] = np.unique(np.asarray(idx, dtype=np.int64))
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([a.size for a in arrays])
+        indices = np.empty(offsets[-1], dtype=np.int64)
+        for ch, idx in enumerate(arrays):
+            indices[offsets[ch] : offsets[ch + 1]] = idx
+        # Keep the current index type, unless new points do not fit in it
+        dtype = self.indices.dtype
+        if indices.size and indices.max() > np.iinfo(dtype).max:
+            dtype = np.dtype(np.int64)
+        return self.__class__(indices.astype(dtype), offsets)
+
+    def shift(self, n):
+        """
+        Return packed points with indices shifted by `n` samples.
+
+        Parameters
+        ----------
+        n : int or array_like
+            Shift of all channels or of each of them.
+
+        Returns
+        -------
+        :obj:`peakdet.points.PackedPoints`
+            Shifted packed points
+        """
+        n = np.broadcast_to(np.asarray(n, dtype=np.int64), (len(self),))
+        indices = self.indices.astype(np.int64) + np.repeat(n, self.counts)
+        # Keep the current index type, unless shifted points do not fit in it
+        dtype = self.indices.dtype
+        if indices.size and indices.max() > np.iinfo(dtype).max:
+            dtype = np.dtype(np.int64)
+        return self.__class__(indices.astype(dtype), self.offsets)
+
+    def crop(self, start, stop):
+        """
+        Return points within [start, stop) of each channel, shifted by `start`.
+
+        Parameters
+        ----------
+        start : int or array_like
+            First sample of the range, for all channels or for each of them.
+        stop : int or array_like
+            Sample at which the range ends (excluded), for all channels or for
+            each of them.
+
+        Returns
+        -------
+        :obj:`peakdet.points.PackedPoints`
+            Cropped packed points
+        """
+        start = np.broadcast_to(np.asarray(start, dtype=np.int64), (len(self),))
+        stop = np.broadcast_to(np.asarray(stop, dtype=np.int64), (len(self),))
+        # Binary search in each channel, then a single gather for all of them
+        lo = np.array(
+            [np.searchsorted(self[ch], start[ch]) for ch in range(len(self))],
+            dtype=np.int64,
+        )
+        hi = np.array(
+            [np.searchsorted(self[ch], stop[ch]) for ch in range(len(self))],
+            dtype=np.int64,
+        )
+        lo, hi = lo + self.offsets[:-1], np.maximum(hi, lo) + self.offsets[:-1]
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(hi - lo)
+        take = np.repeat(lo - offsets[:-1], hi - lo) + np.arange(offsets[-1])
+        shift = np.repeat(start, hi - lo)
+        return self.__class__(
+            (self.indices[take] - shift).astype(self.indices.dtype), offsets
+        )
+
+    def mask(self, intervals):
+        """
+        Return whether each point falls in per-channel intervals.
+
+        Parameters
+        ----------
+        intervals : list of tuple of :obj:`numpy.ndarray`
+            For each channel, sorted starts and ends of disjoint, half-open
+            intervals.
+
+        Returns
+        -------
+        :obj:`numpy.ndarray`
+            Boolean array with the same length as `indices`
+        """
+        if len(intervals) != len(self):
+            raise ValueError(
+                f"Got intervals for {len(intervals)} channels, expected {len(self)}."
+            )
+        starts = [np.asarray(s, dtype=np.int64) for s, _ in intervals]
+        ends = [np.asarray(e, dtype=np.int64) for _, e in intervals]
+        if not any(s.size for s in starts):
+            return np.zeros(self.indices.size, dtype=bool)
+        # Move each channel to its own range, so that one search covers them all
+        span = 1 + max(
+            [int(self.indices.max()) if self.indices.size else 0]
+            + [int(e.max()) for e in ends if e.size]
+        )
+        base = np.arange(len(self), dtype=np.int64) * span
+        starts = np.concatenate([s + b for s, b in zip(starts, base)])
+        ends = np.concatenate([e + b for e, b in zip(ends, base)])
+        points = self.indices.astype(np.int64) + base[self.channels]
+        n = np.searchsorted(starts, points, side="right") - 1
+        return (n >= 0) & (points < ends[np.maximum(n, 0)])
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Storage for channels with different numbers of samples (e.g. sampling rates).
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class RaggedArray(Sequence):
+    """
+    Samples of several channels of different lengths in one contiguous buffer.
+
+    Samples of channel ``ch`` are ``buffer[starts[ch]:stops[ch]]``, so that
+    each channel keeps its own length (and sampling rate) without padding.
+    Indexing the object by channel returns a view of its samples, and cropping
+    channels returns a RaggedArray sharing the same buffer.
+
+    Parameters
+    ----------
+    buffer : array_like
+        Samples of all channels, concatenated.
+    offsets : array_like
+        Start of the samples of each channel in `buffer`, plus the total number
+        of samples (length n_channels + 1).
+
+    Attributes
+    ----------
+    buffer : :obj:`numpy.ndarray`
+        Samples of all channels
+    starts : :obj:`numpy.ndarray`
+        Position of the first sample of each channel in `buffer`
+    stops : :obj:`numpy.ndarray`
+        Position after the last sample of each channel in `buffer`
+    """
+
+    def __init__(self, buffer, offsets):
+        """Initialise RaggedArray object."""
+        # Keep memmaps as such, so that samples stay backed by disk pages
+        self.buffer = buffer if isinstance(buffer, np.memmap) else np.asarray(buffer)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if self.buffer.ndim != 1:
+            raise ValueError(
+                f"Buffer must be 1D, got dimensionality {self.buffer.ndim}."
+            )
+        if (
+            offsets.ndim != 1
+            or offsets.size < 2
+            or offsets[0] != 0
+            or offsets[-1] != self.buffer.size
+            or np.any(np.diff(offsets) < 0)
+        ):
+            raise ValueError(
+                f"Offsets {offsets} do not match {self.buffer.size} samples."
+            )
+        self.starts, self.stops = offsets[:-1], offsets[1:]
+
+    @classmethod
+    def _view(cls, buffer, starts, stops):
+        """Return a RaggedArray of `buffer[starts[ch]:stops[ch]]` without copying."""
+        out = cls.__new__(cls)
+        out.buffer = buffer
+        out.starts = np.asarray(starts, dtype=np.int64)
+        out.stops = np.asarray(stops, dtype=np.int64)
+        return out
+
+    @classmethod
+    def from_list(cls, channels, dtype=None):
+        """
+        Concatenate a list of 1D channels in a RaggedArray.
+
+        Parameters
+        ----------
+        channels : list of array_like
+            Samples of each channel.
+        dtype : data-type or None, optional
+            Data type of the buffer. If None, it is inferred from `channels`.
+            Default: None
+
+        Returns
+        -------
+        :obj:`peakdet.ragged.RaggedArray`
+            Ragged array with a copy of `channels`
+        """
+        channels = [np.asarray(ch) for ch in channels]
+        if not channels or any(ch.ndim != 1 for ch in channels):
+            raise ValueError("Channels must be a non-empty list of 1D arrays.")
+        if dtype is None:
+            dtype = np.result_type(*channels)
+        offsets = np.zeros(len(channels) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([ch.size for ch in channels])
+        buffer = np.empty(offsets[-1], dtype=dtype)
+        for n, ch in enumerate(channels):
+            buffer[offsets[n] : offsets[n + 1]] = ch
+        return cls(buffer, offsets)
+
+    def __getitem__(self, ch):
+        if isinstance(ch, slice):
+            return [self[n] for n in range(*ch.indices(len(self)))]
+        ch = range(len(self))[ch]
+        return self.buffer[self.starts[ch] : self.stops[ch]]
+
+    def __len__(self):
+        return self.starts.size
+
+    def __str__(self):
+        return "{name}(nch={nch}, lengths={lengths}, dtype={dtype})".format(
+            name=self.__class__.__name__,
+            nch=len(self),
+            lengths=self.lengths.tolist(),
+            dtype=self.dtype,
+        )
+
+    __repr__ = __str__
+
+    @property
+    def dtype(self):
+        """Data type of the samples."""
+        return self.buffer.dtype
+
+    @property
+    def lengths(self):
+        """Number of samples of each channel."""
+        return self.stops - self.starts
+
+    @property
+    def size(self):
+        """Number of samples across all channels."""
+        return int(self.lengths.sum())
+
+    @property
+    def nbytes(self):
+        """Size of the samples in bytes."""
+        return self.size * self.dtype.itemsize
+
+    @property
+    def is_contiguous(self):
+        """Whether channels are packed one after the other in the whole buffer."""
+        return (
+            self.starts[0] == 0
+            and self.stops[-1] == self.buffer.size
+            and np.array_equal(self.starts[1:], self.stops[:-1])
+        )
+
+    @property
+    def is_aligned(self):
+        """Whether channels can be viewed as a matrix without copying them."""
+        lengths, steps = self.lengths, np.diff(self.starts)
+        return np.all(lengths == lengths[0]) and np.all(steps == steps[:1])
+
+    def aligned(self):
+        """
+        Return the channels as a (n_samples, n_channels) matrix without copying.
+
+        The matrix is a strided (Fortran-ordered) view of `buffer`. It is
+        read-only if the buffer is.
+
+        Returns
+        -------
+        :obj:`numpy.ndarray`
+            View of the samples with one column per channel
+
+        Raises
+        ------
+        ValueError
+            If channels have different numbers of samples
+        """
+        if not self.is_aligned:
+            raise ValueError(
+                f"Channels have different numbers of samples ({self.lengths}) "
+                "and cannot be viewed as a matrix."
+            )
+        step = self.starts[1] - self.starts[0] if len(self) > 1 else 0
+        itemsize = self.dtype.itemsize
+        return np.lib.stride_tricks.as_strided(
+            self.buffer[self.starts[0] :],
+            shape=(int(self.lengths[0]), len(self)),
+            strides=(itemsize, int(step) * itemsize),
+            writeable=self.buffer.flags.writeable,
+        )
+
+    def copy(self):
+        """Return a contiguous copy of the ragged array, with its own buffer."""
+        return self.from_list(list(self), self.dtype)
+
+    def crop(self, start, stop):
+        """
+        Return a view of samples `start` to `stop` (excluded) of each channel.
+
+        Parameters
+        ----------
+        start : int or array_like
+            First sample, for all channels or for each of them.
+        stop : int or array_like
+            Sample at which to stop, for all channels or for each of them.
+
+        Returns
+        -------
+        :obj:`peakdet.ragged.RaggedArray`
+            Cropped channels, sharing `buffer`
+        """
+        lengths = self.lengths
+        start = np.clip(np.broadcast_to(start, lengths.shape), 0, lengths)
+        stop = np.clip(np.broadcast_to(stop, lengths.shape), start, lengths)
+        return self._view(self.buffer, self.starts + start, self.starts + stop)
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked, compressed storage for physiological data with random access.
+
+The samples are split in blocks of a fixed number of timepoints, and each
+block is compressed independently with a standard library codec. Reading a
+time window only decompresses the blocks it overlaps.
+"""
+import bz2
+import json
+import lzma
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+MAGIC = b"PEAKDETC"
+VERSION = 1
+
+CODECS = {
+    "zlib": (lambda buf, level: zlib.compress(buf, level), zlib.decompress),
+    "lzma": (lambda buf, level: lzma.compress(buf, preset=level), lzma.decompress),
+    "bz2": (lambda buf, level: bz2.compress(buf, level), bz2.decompress),
+}
+_DEFAULT_LEVEL = {"zlib": 6, "lzma": 6, "bz2": 9}
+
+_PREFIX = struct.Struct("<8sIIQQ")
+_OFFSET_DTYPE = np.dtype("<u8")
+
+
+def _shuffle(block):
+    """Group the n-th byte of every item together, to improve compression."""
+    return block.view(np.uint8).reshape(-1, block.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(buf, dtype, nch):
+    """Revert :func:`_shuffle` on decompressed buffer `buf`."""
+    raw = np.frombuffer(buf, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(raw.T).view(dtype).reshape(-1, nch)
+
+
+def write_chunked(
+    data, path, block_size=2**16, codec="zlib", level=None, shuffle=True, attrs=None
+):
+    """
+    Write `data` to `path` as independently compressed blocks of samples.
+
+    Parameters
+    ----------
+    data : array_like or :obj:`peakdet.physio.Physio`
+        Data with shape (n_samples,) or (n_samples, n_channels).
+    path : str or os.PathLike
+        Output file path.
+    block_size : int, optional
+        Number of samples in each block. Default: 65536
+    codec : {'zlib', 'lzma', 'bz2'}, optional
+        Compression codec. Default: 'zlib'
+    level : int or None, optional
+        Compression level. If None, the codec default is used. Default: None
+    shuffle : bool, optional
+        Byte-shuffle samples before compressing them. This usually improves
+        compression ratio of numeric data considerably. Default: True
+    attrs : dict or None, optional
+        JSON-serializable attributes (e.g. sampling rate and channel names) to
+        store with the data. Default: None
+
+    Raises
+    ------
+    ValueError
+        If `codec` is not supported or `block_size` is not positive
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Codec {codec} not supported. Use one of {list(CODECS)}.")
+    if block_size < 1:
+        raise ValueError(f"Block size must be positive, got {block_size}.")
+    compress = CODECS[codec][0]
+    level = _DEFAULT_LEVEL[codec] if level is None else level
+
+    # If data is a physio object, use its data
+    if hasattr(data, "history"):
+        data = data.data
+    if not hasattr(data, "shape"):
+        data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+
+    nblocks = -(-data.shape[0] // block_size)
+    offsets = np.zeros(nblocks + 1, dtype=_OFFSET_DTYPE)
+    with open(path, "wb") as f:
+        f.write(b"\x00" * _PREFIX.size)
+        offsets[0] = f.tell()
+        for n in range(nblocks):
+            block = np.ascontiguousarray(data[n * block_size : (n + 1) * block_size])
+            f.write(compress(_shuffle(block) if shuffle else block.tobytes(), level))
+            offsets[n + 1] = f.tell()
+
+        index_offset = f.tell()
+        index = json.dumps(
+            {
+                "dtype": np.dtype(data.dtype).str,
+                "shape": list(data.shape),
+                "block_size": block_size,
+                "codec": codec,
+                "shuffle": shuffle,
+                "attrs": {} if attrs is None else attrs,
+            }
+        ).encode("utf-8")
+        f.write(index)
+        offsets.tofile(f)
+        f.seek(0)
+        f.write(_PREFIX.pack(MAGIC, VERSION, 0, index_offset, len(index)))
+
+
+class ChunkedArray:
+    """
+    Read-only, array-like view of a file written with :func:`write_chunked`.
+
+    Indexing along the first (time) axis decompresses only the blocks that
+    overlap the requested samples. The most recently used blocks are kept in
+    memory. It can be wrapped by :obj:`peakdet.physio.Physio` without
+    decompressing it, e.g. ``Physio.wrap(ChunkedArray(path), fs=fs)``.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Path to the chunked file.
+    cache_blocks : int, optional
+        Number of decompressed blocks to keep in memory. Default: 8
+
+    Attributes
+    ----------
+    shape : tuple of int
+        Shape of the data, (n_samples, n_channels)
+    dtype : :obj:`numpy.dtype`
+        Data type of the samples
+    block_size : int
+        Number of samples in each block
+    codec : str
+        Codec used to compress the blocks
+    attrs : dict
+        Attributes stored with the data
+    """
+
+    def __init__(self, path, cache_blocks=8):
+        """Initialise ChunkedArray object."""
+        self._file = open(path, "rb")
+        prefix = self._file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size or not prefix.startswith(MAGIC):
+            self._file.close()
+            raise ValueError(f"{path} is not a peakdet chunked file.")
+        _, version, _, index_offset, index_len = _PREFIX.unpack(prefix)
+        if version > VERSION:
+            self._file.close()
+            raise ValueError(
+                f"{path} has format version {version}, but only versions up to "
+                f"{VERSION} are supported. Please update peakdet."
+            )
+        self._file.seek(index_offset)
+        index = json.loads(self._file.read(index_len).decode("utf-8"))
+
+        self.dtype = np.dtype(index["dtype"])
+        self.shape = tuple(index["shape"])
+        self.block_size = index["block_size"]
+        self.codec = index["codec"]
+        self.attrs = index["attrs"]
+        self._shuffle = index["shuffle"]
+        self._decompress = CODECS[self.codec][1]
+        self.nblocks = -(-self.shape[0] // self.block_size)
+        self._offsets = np.fromfile(
+            self._file, dtype=_OFFSET_DTYPE, count=self.nblocks + 1
+        )
+
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._lock = threading.Lock()
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.read(0, self.shape[0])
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __str__(self):
+        return "{name}(shape={shape}, dtype={dtype}, codec={codec})".format(
+            name=self.__class__.__name__,
+            shape=self.shape,
+            dtype=self.dtype,
+            codec=self.codec,
+        )
+
+    __repr__ = __str__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        rows, cols = key[0], key[1:]
+        if rows is Ellipsis:
+            rows = slice(None)
+
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.shape[0])
+            if step < 0:
+                lo, hi = stop + 1, start + 1
+                out = self.read(lo, max(lo, hi))[::-1][::-step]
+            else:
+                out = self.read(start, max(start, stop))[::step]
+        elif np.ndim(rows) == 0:
+            row = int(rows) + (self.shape[0] if rows < 0 else 0)
+            if not 0 <= row < self.shape[0]:
+                raise IndexError(f"Index {rows} out of bounds for {self.shape[0]}.")
+            out = self.read(row, row + 1)[0]
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            shape = rows.shape
+            rows = rows.ravel()
+            rows = np.where(rows < 0, rows + self.shape[0], rows)
+            if rows.size and not 0 <= rows.min() <= rows.max() < self.shape[0]:
+                raise IndexError(f"Index out of bounds for {self.shape[0]}.")
+            out = np.empty((rows.size, self.shape[1]), dtype=self.dtype)
+            blocks = rows // self.block_size
+            for n in np.unique(blocks):
+                sel = blocks == n
+                out[sel] = self._block(n)[rows[sel] - n * self.block_size]
+            out = out.reshape(shape + (self.shape[1],))
+        return out[(Ellipsis,) + cols] if cols else out
+
+    @property
+    def ndim(self):
+        """Number of dimensions."""
+        return len(self.shape)
+
+    @property
+    def size(self):
+        """Number of samples across all channels."""
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        """Size of the uncompressed data in bytes."""
+        return self.size * self.dtype.itemsize
+
+    @property
+    def nbytes_compressed(self):
+        """Size of the compressed blocks in bytes."""
+        return int(self._offsets[-1] - self._offsets[0])
+
+    def _block(self, n):
+        """Return the decompressed block `n`, from the cache if possible."""
+        with self._lock:
+            if n in self._cache:
+                self._cache.move_to_end(n)
+                return self._cache[n]
+            self._file.seek(int(self._offsets[n]))
+            buf = self._file.read(int(self._offsets[n + 1] - self._offsets[n]))
+
+        buf = self._decompress(buf)
+        if self._shuffle:
+            block = _unshuffle(buf, self.dtype, self.shape[1])
+        else:
+            block = np.frombuffer(buf, dtype=self.dtype).reshape(-1, self.shape[1])
+        block.flags.writeable = False
+
+        with self._lock:
+            self._cache[n] = block
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+    def read(self, start, stop):
+        """
+        Read samples `start` to `stop` (excluded) of all channels.
+
+        Parameters
+        ----------
+        start : int
+            First sample to read.
+        stop : int
+            Sample at which to stop reading.
+
+        Returns
+        -------
+        :obj:`numpy.ndarray`
+            Array with shape (stop - start, n_channels)
+        """
+        start, stop = max(start, 0), min(stop, self.shape[0])
+        out = np.empty((max(stop - start, 0), self.shape[1]), dtype=self.dtype)
+        if stop <= start:
+            return out
+        for n in range(start // self.block_size, (stop - 1) // self.block_size + 1):
+            b0 = n * self.block_size
+            lo, hi = max(start, b0), min(stop, b0 + self.block_size)
+            out[lo - start : hi - start] = self._block(n)[lo - b0 : hi - b0]
+        return out
+
+    def iter_blocks(self):
+        """
+        Iterate over the decompressed blocks, in order.
+
+        Yields
+        ------
+        :obj:`numpy.ndarray`
+            Block with shape (block_size, n_channels) (shorter for the last one)
+        """
+        for n in range(self.nblocks):
+            yield self._block(n)
+
+    def close(self):
+        """Close the underlying file."""
+        self._file.close()
@@ -0,0 +1,135 @@
+"""Tests for peakdet.bids: streaming reader of delimited text files."""
+
+import gzip
+import json
+import os
+
+import numpy as np
+import pytest
+
+from peakdet.bids import (
+    _uncompressed_size,
+    iter_bids_chunks,
+    iter_text_blocks,
+    load_bids_physio,
+    read_physio_text,
+)
+
+
+def _text(data, delimiter="\t", header=None, newline="\n"):
+    """Return `data` as delimited text, with missing values as n/a."""
+    lines = [] if header is None else [delimiter.join(header)]
+    for row in data:
+        lines.append(delimiter.join("n/a" if np.isnan(v) else f"{v:.6f}" for v in row))
+    return (newline.join(lines) + newline).encode()
+
+
+def _write(path, content):
+    """Write `content` (bytes) to `path`, compressed if it ends in .gz."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    data = np.round(rng.normal(size=(500, 3)), 6)
+    data[[3, 250], [1, 0]] = np.nan
+    return data
+
+
+@pytest.mark.parametrize("block_bytes", [1, 7, 64, 1000, 2**24])
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_blocks_split_anywhere(tmp_path, data, block_bytes, newline):
+    content = _text(data, header=["a", "b", "c"], newline=newline)
+    path = _write(tmp_path / "rec_physio.tsv.gz", content)
+
+    blocks = iter_text_blocks(path, block_bytes=block_bytes)
+    assert next(blocks) == ["a", "b", "c"]
+    np.testing.assert_array_equal(np.concatenate(list(blocks)), data)
+
+    loaded, header = read_physio_text(path, block_bytes=block_bytes)
+    assert header == ["a", "b", "c"]
+    np.testing.assert_array_equal(loaded, data)
+
+
+@pytest.mark.parametrize(
+    "name, delimiter",
+    [("rec.tsv.gz", "\t"), ("rec.csv.gz", ","), ("rec.csv", ","), ("rec.txt.gz", " ")],
+)
+def test_delimiter_from_extension(tmp_path, data, name, delimiter):
+    path = _write(tmp_path / name, _text(data, delimiter))
+
+    loaded, header = read_physio_text(path)
+    assert header is None
+    np.testing.assert_array_equal(loaded, data)
+
+
+def test_concatenated_members(tmp_path, data):
+    # The gzip footer only has the size of the last member, which underestimates
+    # the size of the file and makes the reader grow its output
+    path = str(tmp_path / "rec.tsv.gz")
+    with open(path, "wb") as f:
+        f.write(gzip.compress(_text(data[:480])))
+        f.write(gzip.compress(_text(data[480:])))
+    assert _uncompressed_size(path) < len(_text(data))
+
+    loaded, _ = read_physio_text(path, block_bytes=256)
+    np.testing.assert_array_equal(loaded, data)
+
+
+def test_uncompressed_size(tmp_path, data):
+    content = _text(data)
+    assert _uncompressed_size(_write(tmp_path / "rec.tsv", content)) == len(content)
+    assert _uncompressed_size(_write(tmp_path / "rec.tsv.gz", content)) == len(content)
+
+    # Tiny files grow when compressed, but the estimate is never below the
+    # file size
+    tiny = _write(tmp_path / "tiny.tsv.gz", b"1\t2\n")
+    assert _uncompressed_size(tiny) >= os.path.getsize(tiny)
+    loaded, header = read_physio_text(tiny)
+    assert header is None
+    np.testing.assert_array_equal(loaded, [[1, 2]])
+
+
+def test_invalid_rows(tmp_path):
+    path = _write(tmp_path / "rec.tsv", b"1\t2\n3\tx\n")
+    with pytest.raises(ValueError, match="2 numeric columns"):
+        read_physio_text(path)
+
+    path = _write(tmp_path / "rec.tsv", b"1\t2\n3\t4\t5\n")
+    with pytest.raises(ValueError, match="2 numeric columns"):
+        read_physio_text(path)
+
+
+@pytest.fixture
+def recording(tmp_path):
+    rng = np.random.default_rng(1)
+    data = np.round(rng.normal(size=(2345, 2)), 6)
+    path = _write(tmp_path / "sub-01_physio.tsv.gz", _text(data))
+    with open(tmp_path / "sub-01_physio.json", "w") as f:
+        json.dump({"SamplingFrequency": 100, "Columns": ["cardiac", "resp"]}, f)
+    return path
+
+
+@pytest.mark.parametrize("block_bytes", [50, 4096, 2**24])
+@pytest.mark.parametrize("chunk, overlap", [(5, 0), (5, 1.5), (3.33, 0.5), (30, 2)])
+def test_bids_chunks_match_iter_chunks(recording, block_bytes, chunk, overlap):
+    physio = load_bids_physio(recording)
+    expected = list(physio.iter_chunks(chunk, overlap))
+    chunks = list(iter_bids_chunks(recording, chunk, overlap, block_bytes=block_bytes))
+
+    assert len(chunks) == len(expected)
+    for window, other in zip(chunks, expected):
+        assert window.offset == other.offset
+        assert window._core == other._core
+        assert window._ch_names == ["cardiac", "resp"]
+        for ch in range(2):
+            np.testing.assert_array_equal(window.channel(ch), other.channel(ch))
+
+
+def test_bids_chunks_invalid_overlap(recording):
+    with pytest.raises(ValueError, match="longer than their overlap"):
+        next(iter_bids_chunks(recording, 1, 1))
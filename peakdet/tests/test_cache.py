@@ -0,0 +1,112 @@
+"""Tests for peakdet.cache: on-disk cache of operation outputs."""
+
+import os
+
+import numpy as np
+import pytest
+
+from peakdet.cache import ResultCache, _collect, _restore
+from peakdet.detect import detect
+from peakdet.physio import Physio
+
+
+@pytest.fixture
+def raw():
+    rng = np.random.default_rng(0)
+    t = np.arange(3000) / 100
+    data = np.stack([np.sin(2 * np.pi * t), np.cos(np.pi * t)], axis=1)
+    return Physio(data + rng.normal(scale=0.05, size=data.shape), fs=100)
+
+
+def _assert_same(physio, other):
+    """Check that `physio` and `other` have the same points and history."""
+    for k in ["peaks", "troughs"]:
+        for ch in range(physio.nch):
+            np.testing.assert_array_equal(
+                physio._metadata[k][ch], other._metadata[k][ch]
+            )
+    assert physio.rejected == other.rejected
+    assert physio._metadata.get("detection") == other._metadata.get("detection")
+    assert [op.id for op in physio.history] == [op.id for op in other.history]
+
+
+def test_hit_and_miss(tmp_path, raw):
+    cache = ResultCache(tmp_path)
+    expected = detect(Physio(raw.data, fs=100), thresh=0.3, opposite=True)
+
+    computed = cache.apply(
+        Physio(raw.data, fs=100), "detect", thresh=0.3, opposite=True
+    )
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["entries"]) == (0, 1, 1)
+    assert info["nbytes"] == sum(f.stat().st_size for f in tmp_path.iterdir())
+    restored = cache.apply(
+        Physio(raw.data, fs=100), "detect", thresh=0.3, opposite=True
+    )
+    assert (cache.hits, cache.misses) == (1, 1)
+    _assert_same(computed, expected)
+    _assert_same(restored, expected)
+
+    # Other parameters or other samples miss
+    cache.apply(Physio(raw.data, fs=100), "detect", thresh=0.4, opposite=True)
+    cache.apply(Physio(raw.data[:2000], fs=100), "detect", thresh=0.3, opposite=True)
+    assert cache.info()["misses"] == 3 and cache.info()["entries"] == 3
+
+    cache.clear()
+    assert cache.info() == dict(hits=0, misses=0, entries=0, nbytes=0)
+    with pytest.raises(ValueError, match="not registered"):
+        cache.apply(raw, "unknown_op")
+
+
+def test_derived_samples(tmp_path, raw):
+    cache = ResultCache(tmp_path)
+    computed = cache.apply(raw, "compact", dtype=np.int16)
+    restored = cache.apply(raw, "compact", dtype=np.int16)
+
+    assert cache.hits == 1
+    assert restored.raw.dtype == np.int16
+    np.testing.assert_array_equal(restored.raw, computed.raw)
+    np.testing.assert_array_equal(restored.scale, computed.scale)
+    np.testing.assert_array_equal(restored.intercept, computed.intercept)
+    _assert_same(restored, computed)
+    # The input is left untouched
+    assert raw.history == [] and raw.raw.dtype == np.float64
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResultCache(tmp_path)
+    for n, key in enumerate(["a", "b", "c"]):
+        cache.put(key, {"x": np.zeros(1000)})
+        os.utime(cache._entry(key), (1000 + n, 1000 + n))
+    size = os.path.getsize(cache._entry("a"))
+
+    # Reading an entry makes it the most recently used one
+    assert cache.get("a") is not None
+    cache.evict(2 * size)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    # Entries are evicted when the cap is exceeded
+    cache.max_bytes = 2 * size
+    cache.put("d", {"x": np.ones(1000)})
+    assert sorted(os.listdir(tmp_path)) == ["a.npz", "d.npz"]
+    np.testing.assert_array_equal(cache.get("d")["x"], 1)
+
+
+def test_collect_and_restore(raw):
+    processed = detect(Physio(raw.data, fs=100), thresh=0.3, opposite=True)
+    processed.add_reject(1, 100, 300)
+    samples = [processed.channel(ch, raw=True) for ch in range(processed.nch)]
+
+    outputs = _collect(processed, samples, processed.history)
+    assert "samples" not in outputs
+    restored = _restore(Physio(raw.data, fs=100), outputs)
+    _assert_same(restored, processed)
+    assert restored.peaks[1].mask.any()
+
+    # Samples are stored when they were derived by the operation
+    outputs = _collect(processed, [s + 1 for s in samples], processed.history)
+    np.testing.assert_array_equal(outputs["lengths"], [3000, 3000])
+    restored = _restore(Physio(raw.data + 1, fs=100), outputs)
+    np.testing.assert_array_equal(restored.data, processed.data)
+    _assert_same(restored, processed)
@@ -0,0 +1,224 @@
+"""Tests for peakdet.detect."""
+
+import numpy as np
+import pytest
+
+from peakdet.detect import StreamingPeakDetector, detect, find_points, redetect
+from peakdet.physio import Physio
+
+
+def _stream(detector, signal, rng):
+    """Feed `signal` to `detector` in random block sizes, return all points."""
+    points, start = [], 0
+    while start < signal.shape[0]:
+        stop = start + int(rng.integers(0, 200))
+        points.append(detector.push(signal[start:stop]))
+        start = stop
+    points.append(detector.flush())
+    return [np.concatenate([p[ch] for p in points]) for ch in range(detector.nch)]
+
+
+def _naive_points(signal, thresh, dist, kind):
+    """Find points of `signal` with plain loops, as a reference for find_points."""
+    signal = [float(v) for v in signal]
+    if kind == "troughs":
+        signal = [-v for v in signal]
+    lo, hi = min(signal), max(signal)
+    limit = lo + thresh * (hi - lo)
+    points = []
+    for i in range(1, len(signal) - 1):
+        if signal[i] <= signal[i - 1] or signal[i] < limit:
+            continue
+        # Plateaus are reported at their first sample
+        j = i
+        while j + 1 < len(signal) and signal[j + 1] == signal[j]:
+            j += 1
+        if j + 1 < len(signal) and signal[j + 1] < signal[j]:
+            points.append(i)
+    if dist <= 1:
+        return np.array(points, dtype=int)
+    kept = []
+    for n, i in enumerate(points):
+        lo, hi = n, n
+        while lo > 0 and i - points[lo - 1] < dist:
+            lo -= 1
+        while hi + 1 < len(points) and points[hi + 1] - i < dist:
+            hi += 1
+        # Highest point within dist, the first one among equal points
+        if all(
+            signal[j] < signal[i] or (signal[j] == signal[i] and j > i)
+            for j in points[lo : hi + 1]
+            if j != i
+        ):
+            kept.append(i)
+    return np.array(kept, dtype=int)
+
+
+def _signal(rng, n, plateaus):
+    """Return a noisy oscillation, with flat runs if `plateaus`."""
+    x = np.sin(np.linspace(0, n / 40, n)) + rng.normal(scale=0.3, size=n)
+    if plateaus:
+        # Quantizing creates many runs of equal samples
+        x = np.round(x * 4) / 4
+    return x
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("kind", ["peaks", "troughs"])
+@pytest.mark.parametrize("dist", [0, 1, 7, 50])
+@pytest.mark.parametrize("plateaus", [False, True])
+def test_streaming_matches_offline(seed, kind, dist, plateaus):
+    rng = np.random.default_rng(seed)
+    signal = _signal(rng, 3000, plateaus)
+    thresh = float(rng.uniform(0, 0.8))
+    vrange = (float(signal.min()), float(signal.max()))
+
+    detector = StreamingPeakDetector(thresh=thresh, dist=dist, kind=kind, vrange=vrange)
+    streamed = _stream(detector, signal, rng)[0]
+    offline = find_points(signal, thresh, dist, kind, vrange)
+
+    np.testing.assert_array_equal(streamed, offline)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_streaming_channels_match_offline(seed):
+    rng = np.random.default_rng(seed)
+    signal = np.stack([_signal(rng, 2000, p) for p in [False, True]], axis=1)
+    params = dict(thresh=[0.1, 0.5], dist=[3, 20], kind=["peaks", "troughs"])
+    vrange = [(float(s.min()), float(s.max())) for s in signal.T]
+
+    detector = StreamingPeakDetector(nch=2, vrange=vrange, **params)
+    streamed = _stream(detector, signal, rng)
+
+    for ch in range(2):
+        offline = find_points(
+            signal[:, ch],
+            params["thresh"][ch],
+            params["dist"][ch],
+            params["kind"][ch],
+            vrange[ch],
+        )
+        np.testing.assert_array_equal(streamed[ch], offline)
+
+
+def test_streaming_state_is_bounded():
+    rng = np.random.default_rng(0)
+    detector = StreamingPeakDetector(dist=20, vrange=(-2, 2))
+    for _ in range(200):
+        detector.push(_signal(rng, 500, False))
+    assert detector._pending[0].size <= 2 * 20
+
+
+@pytest.fixture
+def detected():
+    rng = np.random.default_rng(0)
+    signal = np.sin(np.linspace(0, 400, 20000)) + rng.normal(scale=0.2, size=20000)
+    physio = Physio(signal, fs=100)
+    detect(physio, thresh=0.3, dist=20)
+    # Regions with other parameters
+    redetect(physio, 11000, 12500, thresh=0.6, dist=40)
+    return physio
+
+
+def test_redetect_undetected_kind(detected):
+    with pytest.raises(ValueError, match="troughs"):
+        redetect(detected, 0, 100, kinds="troughs")
+
+
+@pytest.mark.parametrize(
+    "start, stop, span",
+    [
+        (5000, 10000, (500, 4500)),
+        (10000, 16000, (1100, 2400)),
+        (10000, 16000, (2600, 5500)),
+    ],
+)
+def test_redetect_in_window_keeps_points(detected, start, stop, span):
+    window = detected.isel(slice(start, stop))
+    before = window._metadata["peaks"][0].copy()
+    regions = window._metadata["detection"][0]["peaks"]["regions"]
+    assert regions[0][0] == 0 and regions[-1][1] == stop - start
+
+    # Within one region, with its own parameters, and away from the edges
+    # of the window, where samples outside are missing
+    redetect(window, *span)
+
+    np.testing.assert_array_equal(window._metadata["peaks"][0], before)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 4])
+def test_detect_reports_progress(n_jobs):
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(5000, 3)))
+    reports = []
+
+    detect(
+        physio,
+        opposite=[True, False, False],
+        n_jobs=n_jobs,
+        progress=lambda fraction, message: reports.append((fraction, message)),
+    )
+
+    # Range of each channel, then peaks and troughs of the first one
+    assert sorted(f for f, _ in reports) == [n / 7 for n in range(1, 8)]
+    assert "Detected troughs in channel 0" in [m for _, m in reports]
+
+
+def test_detect_stops_when_progress_raises():
+    physio = Physio(np.random.default_rng(0).normal(size=(5000, 2)))
+
+    def progress(fraction, message):
+        if fraction > 0.5:
+            raise RuntimeError("Stopped")
+
+    with pytest.raises(RuntimeError, match="Stopped"):
+        detect(physio, progress=progress)
+    assert "detection" not in physio._metadata
+    assert physio.history == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("kind", ["peaks", "troughs"])
+@pytest.mark.parametrize("thresh", [0, 0.3, 0.8])
+@pytest.mark.parametrize("dist", [0, 1, 7, 50])
+@pytest.mark.parametrize("plateaus", [False, True])
+def test_find_points_matches_naive_loop(seed, kind, thresh, dist, plateaus):
+    signal = _signal(np.random.default_rng(seed), 3000, plateaus)
+
+    np.testing.assert_array_equal(
+        find_points(signal, thresh, dist, kind),
+        _naive_points(signal, thresh, dist, kind),
+    )
+
+
+@pytest.mark.parametrize("kind", ["peaks", "troughs"])
+def test_find_points_distance_rule(kind):
+    signal = np.zeros(40)
+    # Decreasing peaks 5 samples apart, then two equal peaks 4 samples apart
+    signal[[5, 10, 15, 25, 29]] = [10, 9, 8, 5, 5]
+    if kind == "troughs":
+        signal = -signal
+
+    # 15 is dropped next to 10, although 10 is itself dropped next to 5
+    np.testing.assert_array_equal(find_points(signal, 0.1, 6, kind), [5, 25])
+    np.testing.assert_array_equal(find_points(signal, 0.1, 5, kind), [5, 10, 15, 25])
+
+
+def test_find_points_ignores_rejected():
+    signal = np.zeros(30)
+    signal[[5, 10, 20]] = [10, 9, 8]
+
+    np.testing.assert_array_equal(find_points(signal, 0.1, 6), [5, 20])
+    # The rejected peak does not suppress the one next to it
+    reject = (np.array([3, 25]), np.array([8, 27]))
+    np.testing.assert_array_equal(find_points(signal, 0.1, 6, reject=reject), [10, 20])
+
+
+def test_find_points_integer_matches_naive_loop():
+    rng = np.random.default_rng(0)
+    signal = np.round(_signal(rng, 3000, False) * 1000).astype(np.int16)
+
+    for kind in ["peaks", "troughs"]:
+        np.testing.assert_array_equal(
+            find_points(signal, 0.3, 20, kind), _naive_points(signal, 0.3, 20, kind)
+        )
@@ -0,0 +1,90 @@
+"""Tests for peakdet.gui."""
+
+import io
+from types import SimpleNamespace
+
+import matplotlib
+import numpy as np
+import pytest
+
+from peakdet.detect import detect, redetect
+from peakdet.physio import Physio
+from peakdet.viz import plot_physiodata
+
+pytest.importorskip("darkdetect")
+pytest.importorskip("sv_ttk")
+matplotlib.use("Agg")
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.image import imread  # noqa: E402
+
+from peakdet.gui import PointOverlay, Window  # noqa: E402
+
+
+@pytest.fixture
+def overlay():
+    physio = Physio(np.random.default_rng(0).normal(size=(1000, 2)), fs=100)
+    physio.set_points("peaks", 0, np.arange(10, 1000, 50))
+    physio.add_reject(1, 100, 300)
+    fig, axes = plot_physiodata(
+        physio, width=8, height=4, show=False, markers=False, interactive=False
+    )
+    overlay = PointOverlay(FigureCanvasAgg(fig), axes, physio, physio.fs)
+    overlay.canvas.draw()
+    return overlay
+
+
+def _red_pixels(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    buffer.seek(0)
+    image = imread(buffer)
+    return ((image[..., 0] > 0.9) & (image[..., 1] < 0.2) & (image[..., 2] < 0.2)).sum()
+
+
+def test_saved_figure_has_markers(overlay):
+    fig = overlay.canvas.figure
+    background = overlay.backgrounds[0]
+    assert _red_pixels(fig) > 0
+    # Saving does not replace the backgrounds used for blitting
+    assert overlay.backgrounds[0] is background
+
+    overlay.physio.set_points("peaks", 0, [])
+    overlay.update(0)
+    assert _red_pixels(fig) == 0
+
+
+@pytest.mark.parametrize("fmt", ["pdf", "svg"])
+def test_save_vector_formats(overlay, fmt):
+    buffer = io.BytesIO()
+    overlay.canvas.figure.savefig(buffer, format=fmt)
+    assert buffer.getvalue()
+
+
+def _detected(signal, reject=None):
+    """Return a Physio of `signal` detected in two regions, after `reject`."""
+    physio = Physio(signal, fs=100)
+    if reject is not None:
+        physio.add_reject(0, *reject)
+    detect(physio, thresh=0.3, dist=40, opposite=True)
+    redetect(physio, 1530, 3000, thresh=0.5, dist=20)
+    return physio
+
+
+def test_artefact_redetects_around_it():
+    rng = np.random.default_rng(0)
+    signal = np.sin(np.arange(4000) * 2 * np.pi / 50) + rng.normal(scale=0.1, size=4000)
+    # The artefact hides the peaks and troughs closer than dist
+    signal[1500:1505] = [5, -5, 5, -5, 5]
+    physio = _detected(signal)
+
+    physio.add_reject(0, 1500, 1505)
+    Window._redetect_around(SimpleNamespace(physio=physio), 0, 1500, 1505)
+
+    expected = _detected(signal, (1500, 1505))
+    for k in ["peaks", "troughs"]:
+        np.testing.assert_array_equal(physio._metadata[k][0], expected._metadata[k][0])
+        near = physio._metadata[k][0]
+        assert not np.any((near >= 1500) & (near < 1505))
+        assert np.any((near >= 1505) & (near < 1545))
+    assert physio._metadata["detection"] == expected._metadata["detection"]
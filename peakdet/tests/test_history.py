@@ -0,0 +1,102 @@
+"""Tests for peakdet.history: recording and replaying operations."""
+
+import numpy as np
+import pytest
+
+from peakdet import history
+from peakdet.detect import detect, redetect
+from peakdet.history import ArrayRef, Operation, record, register, replay
+from peakdet.physio import Physio
+
+
+@pytest.fixture
+def subtract(monkeypatch):
+    """Register an operation with a large array parameter."""
+    monkeypatch.setattr(history, "_OPERATIONS", dict(history._OPERATIONS))
+
+    @register("subtract_baseline", version=2)
+    def subtract_baseline(physio, baseline, channel=0):
+        physio[:, channel] = physio.channel(channel) - baseline
+        record(
+            physio,
+            "subtract_baseline",
+            {"baseline": baseline, "channel": channel},
+            version=2,
+        )
+        return physio
+
+    return subtract_baseline
+
+
+@pytest.fixture
+def raw():
+    rng = np.random.default_rng(0)
+    t = np.arange(2000) / 100
+    data = np.stack([np.sin(2 * np.pi * t), np.cos(np.pi * t)], axis=1)
+    return Physio(data + rng.normal(scale=0.05, size=data.shape), fs=100)
+
+
+def test_replay_round_trip(raw, subtract):
+    baseline = np.linspace(0, 1, 2000)
+    processed = Physio(raw.data, fs=100)
+    subtract(processed, baseline, channel=1)
+    detect(processed, thresh=0.3, dist=20, opposite=True)
+    redetect(processed, 500, 900, channels=[0], thresh=0.5)
+
+    ops = processed.history
+    assert [op.name for op in ops] == ["subtract_baseline", "detect", "redetect"]
+    assert [op.parent for op in ops] == [None, ops[0].id, ops[1].id]
+    ref = ops[0].params["baseline"]
+    assert isinstance(ref, ArrayRef)
+    assert ref == ArrayRef(baseline)
+    assert not ref.value.flags.writeable
+
+    replayed = replay(ops, Physio(raw.data, fs=100))
+    np.testing.assert_array_equal(replayed.data, processed.data)
+    for k in ["peaks", "troughs"]:
+        for ch in range(2):
+            np.testing.assert_array_equal(
+                replayed._metadata[k][ch], processed._metadata[k][ch]
+            )
+    assert replayed._metadata["detection"] == processed._metadata["detection"]
+    # Replaying records the same operations
+    assert [op.id for op in replayed.history] == [op.id for op in ops]
+
+
+def test_replay_from_tuples(raw):
+    processed = detect(Physio(raw.data, fs=100), thresh=0.3, kind="troughs")
+    replayed = replay([("detect", {"thresh": 0.3, "kind": "troughs"})], raw)
+    assert replayed.history[0].id == processed.history[0].id
+    for ch in range(2):
+        np.testing.assert_array_equal(
+            replayed._metadata["troughs"][ch], processed._metadata["troughs"][ch]
+        )
+
+
+def test_small_arrays_are_inlined():
+    op = Operation("op", {"small": np.arange(4), "large": np.arange(1000)})
+    assert op.params["small"] == (0, 1, 2, 3)
+    assert isinstance(op.params["large"], ArrayRef)
+    np.testing.assert_array_equal(op.kwargs()["large"], np.arange(1000))
+
+    # Ids depend on parameters, including the content of large arrays
+    same = Operation("op", {"small": [0, 1, 2, 3], "large": np.arange(1000)})
+    assert same.id == op.id
+    other = Operation("op", {"small": np.arange(4), "large": np.arange(1, 1001)})
+    assert other.id != op.id
+
+
+def test_replay_errors(raw, subtract):
+    with pytest.raises(ValueError, match="unknown_op cannot be replayed"):
+        replay([("unknown_op", {"value": 1})], raw)
+
+    with pytest.raises(ValueError, match="recorded with version 1"):
+        replay([("subtract_baseline", {"baseline": np.zeros(2000)})], raw)
+
+    # Values of large parameters are not kept in saved histories
+    processed = subtract(Physio(raw.data, fs=100), np.zeros(2000))
+    loaded = [Operation.from_dict(op.to_dict()) for op in processed.history]
+    assert loaded[0].id == processed.history[0].id
+    assert loaded[0].params["baseline"].value is None
+    with pytest.raises(ValueError, match="not saved"):
+        replay(loaded, raw)
@@ -0,0 +1,138 @@
+"""Tests for peakdet.io: round trips of Physio objects through .phys files."""
+
+import numpy as np
+import pytest
+
+from peakdet.detect import detect
+from peakdet.io import EXTENSION
+from peakdet.physio import Physio
+
+
+def _annotated(physio):
+    """Detect points and mark artefacts in `physio`."""
+    detect(physio, opposite=True)
+    physio.add_reject(0, 10, 50)
+    physio.add_reject(physio.nch - 1, 100, 120)
+    return physio
+
+
+def _assert_same(loaded, physio):
+    """Check that `loaded` has the content of `physio`."""
+    assert loaded.is_ragged == physio.is_ragged
+    np.testing.assert_array_equal(loaded.channel_nsamples, physio.channel_nsamples)
+    for ch in range(physio.nch):
+        np.testing.assert_array_equal(
+            loaded.channel(ch, raw=True), physio.channel(ch, raw=True)
+        )
+        assert loaded.channel(ch, raw=True).dtype == physio.channel(ch, raw=True).dtype
+        for k in ["peaks", "troughs"]:
+            np.testing.assert_array_equal(
+                loaded._metadata[k][ch], physio._metadata[k][ch]
+            )
+    np.testing.assert_array_equal(loaded.fs, physio.fs)
+    np.testing.assert_array_equal(loaded.scale, physio.scale)
+    np.testing.assert_array_equal(loaded.intercept, physio.intercept)
+    assert loaded._ch_names == physio._ch_names
+    assert loaded.rejected == physio.rejected
+    assert loaded._metadata["detection"] == physio._metadata["detection"]
+    assert [op.id for op in loaded.history] == [op.id for op in physio.history]
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(0)
+    return np.sin(np.linspace(0, 60, 2000))[:, None] * [1, 3] + rng.normal(
+        scale=0.1, size=(2000, 2)
+    )
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("order", ["C", "F"])
+def test_roundtrip(tmp_path, signal, order, mmap):
+    physio = _annotated(
+        Physio(np.asarray(signal, order=order), fs=100, ch_names=["ecg", "resp"])
+    )
+    path = tmp_path / f"rec{EXTENSION}"
+    physio.save(path)
+    loaded = Physio.load(path, mmap=mmap)
+
+    _assert_same(loaded, physio)
+    assert loaded.is_mmap == mmap
+    np.testing.assert_array_equal(loaded.data, physio.data)
+    np.testing.assert_array_equal(loaded.peaks[0], physio.peaks[0])
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_roundtrip_compact(tmp_path, signal, mmap):
+    physio = _annotated(Physio(signal, fs=100).compact(np.int16))
+    path = tmp_path / f"rec{EXTENSION}"
+    physio.save(path)
+    loaded = Physio.load(path, mmap=mmap)
+
+    _assert_same(loaded, physio)
+    assert loaded.raw.dtype == np.int16
+    assert loaded.is_scaled
+    np.testing.assert_allclose(loaded.data, physio.data)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_roundtrip_ragged(tmp_path, signal, mmap):
+    physio = _annotated(
+        Physio.from_channels([signal[:, 0], signal[::4, 1]], fs=[100, 25])
+    )
+    path = tmp_path / f"rec{EXTENSION}"
+    physio.save(path)
+    loaded = Physio.load(path, mmap=mmap)
+
+    _assert_same(loaded, physio)
+    assert loaded.is_mmap == mmap
+
+
+def test_mmap_load_is_copy_on_write(tmp_path, signal):
+    path = tmp_path / f"rec{EXTENSION}"
+    Physio(signal, fs=100).save(path)
+    loaded = Physio.load(path)
+    loaded[0, 0] = 99
+
+    assert loaded[0, 0] == 99
+    np.testing.assert_array_equal(Physio.load(path).data, signal)
+
+
+def test_load_other_file(tmp_path):
+    path = tmp_path / "rec.txt"
+    path.write_bytes(b"not a peakdet file")
+    with pytest.raises(ValueError):
+        Physio.load(path)
+
+
+@pytest.mark.parametrize("ragged", [False, True])
+def test_save_to_loaded_path(tmp_path, ragged):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(50000, 2))
+    if ragged:
+        physio = Physio.from_channels([data[:, 0], data[::4, 1]], fs=[100, 25])
+    else:
+        physio = Physio(data, fs=100)
+    path = tmp_path / f"rec{EXTENSION}"
+    physio.save(path)
+
+    # The loaded object is memory-mapped from the file it is saved to
+    loaded = _annotated(Physio.load(path))
+    assert loaded.is_mmap
+    loaded.save(path)
+
+    _assert_same(Physio.load(path, mmap=False), loaded)
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_failed_save_keeps_file(tmp_path, signal):
+    path = tmp_path / f"rec{EXTENSION}"
+    physio = Physio(signal, fs=100)
+    physio.save(path)
+    content = path.read_bytes()
+
+    physio._metadata["unserializable"] = object()
+    with pytest.raises(TypeError):
+        physio.save(path)
+    assert path.read_bytes() == content
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
@@ -0,0 +1,458 @@
+"""Tests for peakdet.physio."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from peakdet.physio import Physio
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    path = tmp_path / "rec.bin"
+    np.arange(200, dtype=np.float32).reshape(100, 2).tofile(path)
+    return path
+
+
+def _read(path):
+    return np.fromfile(path, dtype=np.float32).reshape(100, 2)
+
+
+def test_open_mmap_read_only_copies_on_write(raw_file):
+    physio = Physio.open_mmap(raw_file, np.float32, 2, fs=10)
+    assert physio.is_mmap
+    physio[0, 0] = 99
+
+    assert physio[0, 0] == 99
+    assert not physio.is_mmap
+    assert _read(raw_file)[0, 0] == 0
+
+
+def test_open_mmap_writes_through(raw_file):
+    physio = Physio.open_mmap(raw_file, np.float32, 2, fs=10, mode="r+")
+    physio[0, 0] = 99
+
+    assert physio.is_mmap
+    assert physio[0, 0] == 99
+    physio._data.flush()
+    assert _read(raw_file)[0, 0] == 99
+
+
+def test_open_mmap_copy_on_write_pages(raw_file):
+    physio = Physio.open_mmap(raw_file, np.float32, 2, fs=10, mode="c")
+    physio[0, 0] = 99
+
+    assert physio.is_mmap
+    assert physio[0, 0] == 99
+    assert _read(raw_file)[0, 0] == 0
+
+
+def test_wrap_does_not_copy():
+    data = np.arange(200, dtype=float).reshape(100, 2)
+    physio = Physio.wrap(data, fs=10)
+
+    assert np.shares_memory(physio._data, data)
+    assert not physio._owns_data
+    # The caller's buffer cannot be written through the object's arrays
+    assert not physio.data.flags.writeable
+    assert not physio.channel(0).flags.writeable
+    assert data.flags.writeable
+    # Changes of the caller's buffer are reflected in the object
+    data[0, 0] = -1
+    assert physio[0, 0] == -1
+
+    ragged = Physio.from_channels([np.zeros(100), np.ones(40)], fs=[10, 4])
+    wrapped = Physio.wrap(ragged._data, fs=[10, 4])
+    assert np.shares_memory(wrapped._data.buffer, ragged._data.buffer)
+
+
+def test_copy_on_first_write():
+    data = np.arange(200, dtype=float).reshape(100, 2)
+    original = data.copy()
+    physio = Physio.wrap(data, fs=10)
+
+    physio[0, 0] = 99
+    assert physio._owns_data
+    assert not np.shares_memory(physio._data, data)
+    assert physio[0, 0] == 99
+    np.testing.assert_array_equal(physio.data[1:], original[1:])
+    np.testing.assert_array_equal(data, original)
+
+    # Only the first write copies the buffer
+    buffer = physio._data
+    physio[1, 1] = 99
+    assert physio._data is buffer
+    np.testing.assert_array_equal(data, original)
+
+
+@pytest.mark.parametrize("copy, shared", [(None, False), (True, False), (False, True)])
+def test_copy_argument(copy, shared):
+    data = np.arange(200, dtype=np.int16).reshape(100, 2)
+    physio = Physio(data, fs=10, copy=copy)
+    assert np.shares_memory(physio._data, data) == shared
+    assert physio._owns_data != shared
+
+    physio[:, 1] = 0
+    np.testing.assert_array_equal(data[:, 1], np.arange(1, 200, 2))
+
+
+def test_wrap_scaled_writes_copy():
+    data = np.arange(200, dtype=np.int16).reshape(100, 2)
+    original = data.copy()
+    physio = Physio(data, fs=10, scale=0.5, copy=False)
+
+    physio[:10] = 1.0
+    np.testing.assert_array_equal(physio.raw[:10], 2)
+    np.testing.assert_array_equal(data, original)
+
+
+def test_shape_of_scaled_data_does_not_convert(tmp_path):
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(500_000, 2)), fs=100).compact()
+    path = tmp_path / "rec.phys"
+    physio.save(path)
+    loaded = Physio.load(path)
+
+    tracemalloc.start()
+    assert loaded.shape == (500_000, 2)
+    assert len(loaded) == 500_000
+    assert loaded.ndim == 2
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Converting to float64 would allocate 8 MB
+    assert peak < 2**20
+
+
+def test_shape_of_ragged_data():
+    physio = Physio.from_channels([np.zeros(100), np.zeros(40)], fs=[10, 4])
+
+    assert physio.ndim == 2
+    assert physio.shape == (100, 2)
+    assert len(physio) == 100
+    np.testing.assert_array_equal(physio.channel_nsamples, [100, 40])
+
+
+def test_extend_updates_envelopes():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(50000, 2))
+    physio = Physio(data[:1003], fs=100, copy=False)
+    physio.add_points("peaks", 0, [10, 500])
+    envelope = physio.envelope(1)
+
+    for nrows in [1003, 1024, 7777, 50000]:
+        physio._extend(data[:nrows])
+        expected = Physio(data[:nrows], copy=False).envelope(1)
+        assert physio.envelope(1) is envelope
+        assert envelope.sizes == expected.sizes
+        for (lo, hi), (exp_lo, exp_hi) in zip(envelope.levels, expected.levels):
+            np.testing.assert_array_equal(lo, exp_lo)
+            np.testing.assert_array_equal(hi, exp_hi)
+    assert physio.shape == (50000, 2)
+    np.testing.assert_array_equal(physio.peaks[0], [10, 500])
+
+    with pytest.raises(ValueError):
+        physio._extend(data[:100])
+
+
+@pytest.fixture
+def edited():
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(10000, 3)))
+    for ch in range(3):
+        physio.set_points("peaks", ch, rng.choice(10000, 300, replace=False))
+        physio.set_points("troughs", ch, rng.choice(10000, 300, replace=False))
+        for start in rng.choice(9900, 20, replace=False):
+            physio.add_reject(ch, start, start + rng.integers(1, 100))
+    return physio
+
+
+def _expected_mask(physio, k, ch):
+    points = physio._metadata[k][ch]
+    return np.array(
+        [any(s <= p < e for s, e in physio.rejected[ch]) for p in points], dtype=bool
+    )
+
+
+def test_masked_points(edited):
+    masked = edited._masked("peaks")
+    for ch in range(3):
+        np.testing.assert_array_equal(masked[ch].data, edited._metadata["peaks"][ch])
+        np.testing.assert_array_equal(
+            masked[ch].mask, _expected_mask(edited, "peaks", ch)
+        )
+
+    # After an edit, the channel is masked again on its own
+    edited.add_reject(1, 0, 5000)
+    masked = edited._masked("peaks")
+    for ch in range(3):
+        np.testing.assert_array_equal(
+            masked[ch].mask, _expected_mask(edited, "peaks", ch)
+        )
+
+
+def test_masked_points_are_read_only(edited):
+    masked = edited.peaks[0]
+    with pytest.raises(ValueError):
+        masked[0] = 1
+    with pytest.raises(ValueError):
+        masked[0] = np.ma.masked
+    # Even without rejected points, the cached mask is not replaced
+    edited.remove_reject(2, 0, 10000)
+    masked = edited.peaks[2]
+    assert not masked.mask.any()
+    with pytest.raises(ValueError):
+        masked[0] = np.ma.masked
+
+
+def test_cache_info(edited):
+    edited._cache_stats.update(hits=0, rebuilds=0)
+    edited._masked_cache.clear()
+
+    edited.peaks
+    assert edited.cache_info() == {"hits": 0, "rebuilds": 3, "size": 3}
+    edited.peaks
+    edited.troughs
+    assert edited.cache_info() == {"hits": 3, "rebuilds": 6, "size": 6}
+
+
+@pytest.mark.parametrize(
+    "edit, rebuilt",
+    [
+        (lambda p: p.add_points("peaks", 1, [5]), {("peaks", 1)}),
+        (
+            lambda p: p.remove_points("troughs", 2, p._metadata["troughs"][2][:3]),
+            {("troughs", 2)},
+        ),
+        (lambda p: p.add_reject(0, 10, 20), {("peaks", 0), ("troughs", 0)}),
+        (lambda p: p.remove_reject(1, 0, 10000), {("peaks", 1), ("troughs", 1)}),
+        (lambda p: p.__setitem__((0, 1), 5), set()),
+    ],
+)
+def test_edits_rebuild_one_channel(edited, edit, rebuilt):
+    cached = {
+        (k, ch): masked
+        for k in ["peaks", "troughs"]
+        for ch, masked in enumerate(edited._masked(k))
+    }
+    stats = edited.cache_info()
+
+    edit(edited)
+    for k in ["peaks", "troughs"]:
+        for ch, masked in enumerate(edited._masked(k)):
+            assert (masked is not cached[k, ch]) == ((k, ch) in rebuilt)
+    info = edited.cache_info()
+    assert info["rebuilds"] - stats["rebuilds"] == len(rebuilt)
+    assert info["hits"] - stats["hits"] == 6 - len(rebuilt)
+
+
+@pytest.mark.parametrize(
+    "slicer, rebuilt",
+    [
+        ((0, 1), {1}),
+        ((slice(10, 20), [0, 2]), {0, 2}),
+        ((slice(None), -1), {2}),
+        (slice(10, 20), {0, 1, 2}),
+    ],
+)
+def test_writes_rebuild_channel_envelopes(edited, slicer, rebuilt):
+    envelopes = [edited.envelope(ch) for ch in range(3)]
+
+    edited[slicer] = 0
+    for ch in range(3):
+        envelope = edited.envelope(ch)
+        assert (envelope is not envelopes[ch]) == (ch in rebuilt)
+        expected = Physio(edited.data, copy=False).envelope(ch)
+        for (lo, hi), (exp_lo, exp_hi) in zip(envelope.levels, expected.levels):
+            np.testing.assert_array_equal(lo, exp_lo)
+            np.testing.assert_array_equal(hi, exp_hi)
+
+
+def _check_window(window, physio, start, stop):
+    """Check that `window` has samples `start` to `stop` of `physio`."""
+    starts = np.broadcast_to(start, (physio.nch,))
+    stops = np.broadcast_to(stop, (physio.nch,))
+    for ch, lo, hi in zip(range(physio.nch), starts, stops):
+        samples = window.channel(ch, raw=True)
+        np.testing.assert_array_equal(samples, physio.channel(ch, raw=True)[lo:hi])
+        if samples.size:
+            assert np.shares_memory(samples, physio.channel(ch, raw=True))
+        for k in ["peaks", "troughs"]:
+            points = physio._metadata[k][ch]
+            np.testing.assert_array_equal(
+                window._metadata[k][ch], points[(points >= lo) & (points < hi)] - lo
+            )
+        assert window.rejected[ch] == [
+            (max(s, lo) - lo, min(e, hi) - lo)
+            for s, e in physio.rejected[ch]
+            if s < hi and e > lo
+        ]
+
+
+@pytest.fixture
+def recording():
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(3000, 2)), fs=100)
+    for ch in range(2):
+        physio.set_points("peaks", ch, rng.choice(3000, 100, replace=False))
+        physio.set_points("troughs", ch, rng.choice(3000, 100, replace=False))
+    physio.add_reject(0, 500, 700)
+    physio.add_reject(0, 1100, 1300)
+    physio.add_reject(1, 0, 50)
+    physio.add_reject(1, 2900, 3000)
+    return physio
+
+
+@pytest.mark.parametrize(
+    "samples, start, stop",
+    [
+        (slice(600, 1200), 600, 1200),
+        (slice(None, 40), 0, 40),
+        (slice(-150, None), 2850, 3000),
+        (slice(2000, 1000), 2000, 2000),
+        (slice(None), 0, 3000),
+    ],
+)
+def test_isel(recording, samples, start, stop):
+    window = recording.isel(samples)
+    assert window.offset == start
+    assert window.shape == (stop - start, 2)
+    _check_window(window, recording, start, stop)
+
+
+def test_isel_invalid(recording):
+    with pytest.raises(ValueError, match="step of 1"):
+        recording.isel(slice(0, 100, 2))
+    with pytest.raises(ValueError, match="must be a slice"):
+        recording.isel([1, 2, 3])
+
+
+def test_window(recording):
+    # Samples at times t0 <= t < t1 are selected
+    window = recording.window(6.005, 12)
+    assert window.offset == 601
+    _check_window(window, recording, 601, 1200)
+    assert recording.window(-5, 100).shape == (3000, 2)
+    assert recording.window(20, 10).shape == (0, 2)
+
+    with pytest.raises(ValueError, match="same, known sampling rate"):
+        Physio(np.zeros((10, 2)), fs=[10, 20]).window(0, 1)
+
+
+def test_nested_windows(recording):
+    outer = recording.window(5, 20)
+    inner = outer.isel(slice(50, 700))
+    innermost = inner.window(1, 2)
+
+    assert (outer.offset, inner.offset, innermost.offset) == (500, 550, 650)
+    _check_window(inner, recording, 550, 1200)
+    _check_window(innermost, recording, 650, 750)
+    _check_window(innermost, outer, 150, 250)
+
+    # Windows are views, so they see writes to the parent
+    recording[700, 0] = 1e6
+    assert innermost[50, 0] == 1e6
+
+
+def test_window_ragged():
+    rng = np.random.default_rng(0)
+    channels = [rng.normal(size=3000), rng.normal(size=750)]
+    physio = Physio.from_channels(channels, fs=[100, 25])
+    physio.set_points("peaks", 0, [10, 600, 1500])
+    physio.set_points("peaks", 1, [2, 150, 375, 700])
+    physio.add_reject(1, 100, 200)
+
+    window = physio.window(5, 20)
+    np.testing.assert_array_equal(window.offset, [500, 125])
+    np.testing.assert_array_equal(window.channel_nsamples, [1500, 375])
+    _check_window(window, physio, [500, 125], [2000, 500])
+
+    # Bounds of isel apply to the samples of each channel
+    window = physio.isel(slice(-500, None))
+    np.testing.assert_array_equal(window.channel_nsamples, [500, 500])
+    _check_window(window, physio, [2500, 250], [3000, 750])
+
+
+def test_fingerprint_does_not_depend_on_layout(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(1000, 3))
+    physio = Physio(data, fs=100)
+    digest = physio.fingerprint()
+
+    data.tofile(tmp_path / "rec.bin")
+    layouts = [
+        Physio(np.asfortranarray(data), fs=100),
+        Physio(data.astype(">f8"), fs=100),
+        Physio.from_channels(list(data.T), fs=100),
+        Physio.open_mmap(tmp_path / "rec.bin", data.dtype, 3, fs=100),
+    ]
+    for other in layouts:
+        assert other.fingerprint() == digest
+    assert physio.fingerprint(memoize=False, chunk_bytes=24) == digest
+
+    # Content other than samples is hashed as well
+    assert Physio(data, fs=50).fingerprint() != digest
+    assert Physio(data.astype(np.float32), fs=100).fingerprint() != digest
+    physio.add_reject(0, 10, 20)
+    assert physio.fingerprint() != digest
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda p: p.__setitem__((5, 1), 0),
+        lambda p: p.set_points("peaks", 0, [1, 2]),
+        lambda p: p.add_reject(2, 0, 10),
+        lambda p: p.remove_reject(0, 0, 100),
+    ],
+)
+def test_fingerprint_memoized_until_edited(edit):
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(1000, 3)), fs=100)
+    physio.add_reject(0, 10, 20)
+    digest = physio.fingerprint()
+    assert physio._fingerprint == digest
+
+    edit(physio)
+    assert physio._fingerprint is None
+    assert physio.fingerprint() != digest
+    assert physio.fingerprint() == physio.fingerprint(memoize=False)
+
+
+def test_fingerprint_of_shared_buffers():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(1000, 3))
+
+    # The caller can write to a wrapped buffer
+    wrapped = Physio.wrap(data, fs=100)
+    digest = wrapped.fingerprint()
+    assert wrapped._fingerprint is None
+    data[0, 0] = 1e6
+    assert wrapped.fingerprint() != digest
+
+    # Windows see writes to their parent
+    parent = Physio(data, fs=100)
+    window = parent.isel(slice(100, 200))
+    digest = window.fingerprint()
+    parent[150, 2] = 1e6
+    assert window.fingerprint() != digest
+    assert window.fingerprint() == Physio(parent.data[100:200], fs=100).fingerprint()
+
+    # Once written to, the object owns its copy and memoizes again
+    wrapped[0, 0] = 0
+    assert wrapped.fingerprint() == wrapped._fingerprint
+
+
+def test_stitch_chunks():
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(10000, 2)), fs=100)
+    peaks = [np.sort(rng.choice(10000, 200, replace=False)) for _ in range(2)]
+    for ch in range(2):
+        physio.set_points("peaks", ch, peaks[ch])
+    physio.add_reject(1, 2950, 3100)
+
+    physio.stitch(physio.iter_chunks(30, overlap_seconds=5), keys=("peaks", "reject"))
+
+    for ch in range(2):
+        np.testing.assert_array_equal(physio._metadata["peaks"][ch], peaks[ch])
+    assert physio.rejected == [[], [(2950, 3100)]]
@@ -0,0 +1,144 @@
+"""Tests for peakdet.store: chunked, compressed storage with random access."""
+
+import numpy as np
+import pytest
+
+from peakdet.physio import Physio
+from peakdet.store import ChunkedArray, write_chunked
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(1000, 3))
+
+
+@pytest.fixture
+def chunked(tmp_path, data):
+    path = str(tmp_path / "rec.pkc")
+    write_chunked(data, path, block_size=64, attrs={"fs": 100.0})
+    with ChunkedArray(path, cache_blocks=2) as arr:
+        yield arr
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma", "bz2"])
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_round_trip(tmp_path, data, codec, shuffle):
+    path = str(tmp_path / "rec.pkc")
+    attrs = {"fs": 100.0, "ch_names": ["a", "b", "c"]}
+    write_chunked(data, path, block_size=64, codec=codec, shuffle=shuffle, attrs=attrs)
+
+    with ChunkedArray(path) as arr:
+        assert arr.shape == data.shape
+        assert arr.dtype == data.dtype
+        assert arr.codec == codec
+        assert arr.attrs == attrs
+        assert arr.nblocks == 16
+        assert arr.nbytes == data.nbytes
+        np.testing.assert_array_equal(np.asarray(arr), data)
+        np.testing.assert_array_equal(np.concatenate(list(arr.iter_blocks())), data)
+
+
+def test_round_trip_1d(tmp_path, data):
+    path = str(tmp_path / "rec.pkc")
+    write_chunked(data[:, 0].astype(np.int16), path, block_size=100)
+    with ChunkedArray(path) as arr:
+        assert arr.shape == (1000, 1)
+        assert arr.dtype == np.int16
+        np.testing.assert_array_equal(arr[:, 0], data[:, 0].astype(np.int16))
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        slice(60, 70),
+        slice(0, 64),
+        slice(63, 129),
+        slice(-5, None),
+        slice(10, 900, 7),
+        slice(None, None, -1),
+        slice(None, None, -3),
+        slice(900, 10, -7),
+        slice(70, 60, -1),
+        slice(10, 20, -1),
+        slice(500, 500),
+        Ellipsis,
+    ],
+)
+def test_slices(chunked, data, key):
+    np.testing.assert_array_equal(chunked[key], data[key])
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        0,
+        63,
+        64,
+        -1,
+        np.int64(999),
+        [5, 900, 64, 5, -1, 63],
+        np.array([[1, 2], [640, 3]]),
+        np.arange(1000) % 3 == 0,
+        (slice(100, 300), 1),
+        (slice(None, None, -2), [2, 0]),
+        ([3, 700, 64], 2),
+    ],
+)
+def test_indexing(chunked, data, key):
+    np.testing.assert_array_equal(chunked[key], data[key])
+
+
+def test_index_errors(chunked):
+    with pytest.raises(IndexError):
+        chunked[1000]
+    with pytest.raises(IndexError):
+        chunked[-1001]
+    with pytest.raises(IndexError):
+        chunked[[5, 1000]]
+
+
+def test_blocks_are_cached(chunked, data):
+    chunked[100:300]
+    assert list(chunked._cache) == [3, 4]
+    # Cached blocks cannot be modified through the returned arrays
+    assert not chunked._block(3).flags.writeable
+    out = chunked[200:210]
+    out[:] = 0
+    np.testing.assert_array_equal(chunked[200:210], data[200:210])
+
+
+def test_invalid(tmp_path, data):
+    path = str(tmp_path / "rec.pkc")
+    with pytest.raises(ValueError, match="not supported"):
+        write_chunked(data, path, codec="zstd")
+    with pytest.raises(ValueError, match="must be positive"):
+        write_chunked(data, path, block_size=0)
+
+    with open(path, "wb") as f:
+        f.write(b"not a chunked file")
+    with pytest.raises(ValueError, match="not a peakdet chunked file"):
+        ChunkedArray(path)
+
+
+def test_physio_from_chunked(tmp_path, data):
+    path = str(tmp_path / "rec.pkc")
+    write_chunked(Physio(data, fs=100.0), path, block_size=64)
+
+    arr = ChunkedArray(path)
+    physio = Physio.wrap(arr, fs=100.0)
+    assert physio._data is arr
+    assert not physio._owns_data
+    assert physio.nch == 3
+    np.testing.assert_array_equal(physio.channel(1)[60:200], data[60:200, 1])
+    np.testing.assert_array_equal(physio.data, data)
+
+    # The backend is materialized on the first write, the file is left as is
+    physio[:10] = 0
+    assert isinstance(physio._data, np.ndarray) and physio._owns_data
+    np.testing.assert_array_equal(physio.data[:10], 0)
+    np.testing.assert_array_equal(arr[:10], data[:10])
+
+    # Lazy backends are not copied by default either
+    assert Physio(arr, fs=100.0)._data is arr
+    arr.close()
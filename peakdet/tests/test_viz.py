@@ -0,0 +1,68 @@
+"""Tests for peakdet.viz."""
+
+import matplotlib
+import numpy as np
+import pytest
+
+from peakdet.physio import Physio
+from peakdet.viz import plot_physiodata
+
+matplotlib.use("Agg")
+
+
+@pytest.fixture
+def physio():
+    return Physio(np.random.default_rng(0).normal(size=(1000, 2)), fs=100)
+
+
+def test_show_false_returns_pyplot_figure(physio):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plot_physiodata(physio, show=False, width=8, height=4)
+    assert plt.fignum_exists(fig.number)
+    assert len(axes) == 2
+    plt.close(fig)
+
+
+def test_non_interactive_figure_is_not_managed_by_pyplot(physio):
+    import matplotlib.pyplot as plt
+
+    before = plt.get_fignums()
+    fig, axes = plot_physiodata(physio, width=8, height=4, interactive=False)
+    assert plt.get_fignums() == before
+    assert fig.canvas.figure is fig and len(axes) == 2
+
+
+@pytest.mark.parametrize("lod", [True, False])
+def test_markers_in_physical_units(lod):
+    rng = np.random.default_rng(0)
+    physio = Physio(rng.normal(size=(1000, 3)), fs=100).compact()
+    physio.set_points("peaks", 2, [10, 500])
+    physio.set_points("troughs", 1, [20])
+
+    _, axes = plot_physiodata(
+        physio, startcol=1, lod=lod, width=8, height=4, interactive=False
+    )
+    assert len(axes) == 2
+    peaks = axes[1].lines[-2]
+    np.testing.assert_allclose(peaks.get_xdata(), [0.1, 5])
+    np.testing.assert_allclose(peaks.get_ydata(), physio.data[[10, 500], 2])
+    np.testing.assert_allclose(axes[0].lines[-1].get_ydata(), physio.data[[20], 1])
+    if not lod:
+        np.testing.assert_allclose(axes[0].lines[0].get_ydata(), physio.data[:, 1])
+
+
+def test_lod_does_not_convert_channels(physio, monkeypatch):
+    # Scaled channels would be converted to physical units as a whole
+    calls = []
+    channel = Physio.channel
+    monkeypatch.setattr(
+        Physio,
+        "channel",
+        lambda self, ch, raw=False: calls.append(raw) or channel(self, ch, raw),
+    )
+    plot_physiodata(
+        physio, startcol=1, markers=False, width=8, height=4, interactive=False
+    )
+    assert False not in calls
+    assert len(physio._envelope_cache) == 1
@@ -3,19 +3,82 @@
 Function to plot physiological data.
 """
 import os
-import tkinter as tk
+from functools import lru_cache
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.figure import Figure
 
+from .bids import read_physio_text
+from .envelope import Envelope
 
+# tkinter and matplotlib are imported when needed, so that importing peakdet
+# stays fast and works on nodes without a display
+
+# Screen size (pixels) used when there is no display
+HEADLESS_SCREEN_SIZE = (1920, 1080)
+
+
+@lru_cache(maxsize=None)
 def get_screen_size():
-    root = tk.Tk()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-    root.destroy()
-    return screen_width, screen_height
+    """
+    Return the width and height of the screen in pixels.
+
+    The size is computed once. Without a display or tkinter, e.g. on headless
+    cluster nodes, ``HEADLESS_SCREEN_SIZE`` is returned.
+
+    Returns
+    -------
+    tuple of int
+        Width and height of the screen
+    """
+    try:
+        import tkinter as tk
+    except ImportError:
+        return HEADLESS_SCREEN_SIZE
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return HEADLESS_SCREEN_SIZE
+    try:
+        root.withdraw()
+        return root.winfo_screenwidth(), root.winfo_screenheight()
+    finally:
+        root.destroy()
+
+
+class _EnvelopeLine:
+    """
+    Line drawn from a min/max envelope, at the pixel resolution of its axes.
+
+    Each pixel column shows the minimum and maximum of its samples, so that
+    spikes are never lost, and the number of vertices does not depend on the
+    length of the signal. Call :meth:`update` when the x limits change to
+    draw the visible range with finer data.
+    """
+
+    def __init__(self, ax, envelope, fs=None, **kwargs):
+        """Initialise _EnvelopeLine object."""
+        self.ax, self.envelope = ax, envelope
+        self.fs = 1 if fs is None else fs
+        self._range = None
+        (self.line,) = ax.plot(*self._vertices(0, envelope.nsamples), **kwargs)
+
+    def _vertices(self, start, stop):
+        """Return the vertices of samples `start` to `stop`, or None if drawn."""
+        npixels = max(int(self.ax.get_window_extent().width), 1)
+        if self._range == (start, stop, npixels):
+            return None
+        self._range = (start, stop, npixels)
+        x, y = self.envelope.line(start, stop, npixels)
+        return x / self.fs, y
+
+    def update(self, xmin, xmax):
+        """Draw the signal between times `xmin` and `xmax`."""
+        # One more sample on each side, so that the line reaches the edges
+        start = max(int(np.floor(xmin * self.fs)) - 1, 0)
+        stop = min(int(np.ceil(xmax * self.fs)) + 2, self.envelope.nsamples)
+        vertices = self._vertices(start, stop)
+        if vertices is not None:
+            self.line.set_data(*vertices)
 
 
 def plot_physiodata(
@@ -27,6 +90,9 @@ def plot_physiodata(
     width=None,
     transpose=False,
     show=True,
+    lod=True,
+    markers=True,
+    interactive=True,
 ):
     """
     Plot physiological signals in an array
@@ -49,6 +115,17 @@ def plot_physiodata(
         Transpose data. Default is false.
     show : bool, optional
         Plot the data. If False, returns figure and axes instead.
+    lod : bool, optional
+        Draw signals at the resolution of the screen (level of detail), from
+        their min/max envelopes, and draw finer data when zooming in. If
+        False, all samples are drawn. Default is True.
+    markers : bool, optional
+        Mark the peaks and troughs of Physio objects. Default is True.
+    interactive : bool, optional
+        Create the figure with pyplot, which manages its window. If False,
+        the figure is created without pyplot and returned, even if `show` is
+        True: it can be saved or embedded in a GUI, also on machines without
+        a display. Default is True.
 
     Raises
     ------
@@ -60,71 +137,116 @@ def plot_physiodata(
     # If data is a string and it's an existing path, read the data.
     if isinstance(data, str):
         if os.path.exists(data):
-            ext = os.path.splitext(data)[-1]
-
-            if ext == ".gz":
-                ext == os.path.splitext(os.path.splitext(data)[0])[-1]
-
-            if ext == ".tsv":
-                data = np.genfromtxt(data, delimiter="\t")
-            elif ext == ".csv":
-                data = np.genfromtxt(data, delimiter=",")
-            else:
-                data = np.genfromtxt(data)
+            # Delimiter is inferred from the extension, also for .gz files
+            data = read_physio_text(data)[0]
         else:
             raise IOError(f"Cannot find {data}")
 
     # If data is a physio object, do some stuff
+    points = None
+    physio = None
+    envelopes = None
     if hasattr(data, "history"):
         # If it has a frequency and fs is specified, warn and continue, else read it
-        if data.fs is not None:
+        if data.fs is not None and not np.isnan(data.fs).all():
             if fs is not None:
                 raise Warning(
                     f"Using sampling frequency {fs} instead of data's {data.fs}"
                 )
             else:
                 fs = data.fs
-        data = data.data
+        if not transpose:
+            # Channels can have different lengths (e.g. sampling rates). They
+            # are only converted to physical units if all samples are drawn
+            physio, selected = data, range(data.nch)[startcol:endcol]
+            if markers:
+                points = {
+                    k: data._metadata[k][startcol:endcol] for k in ["peaks", "troughs"]
+                }
+            if lod:
+                # Envelopes are cached in the object, for the next plots
+                envelopes = [data.envelope(i) for i in selected]
+        else:
+            data = data.data
 
-    # Compute time if fs is given
-    if fs is not None:
-        time = np.arange(data.shape[0]) / fs
+    if physio is None:
+        if data.ndim == 1:
+            data = data[..., np.newaxis]
+        elif data.ndim > 2:
+            raise Warning("Data has more axes than possible to plot. Using first two.")
+            data = data[(...,) + (slice(1),) * (data.ndim - 2)].squeeze()
+
+        data = data.T if transpose else data
 
-    if data.ndim == 1:
-        data = data[..., np.newaxis]
-    elif data.ndim > 2:
-        raise Warning("Data has more axes than possible to plot. Using first two.")
-        data = data[(...,) + (slice(1),) * (data.ndim - 2)].squeeze()
+        data = data[:, startcol:endcol]
+        channels = [data[:, i] for i in range(data.shape[1])]
+        selected = range(len(channels))
 
-    data = data.T if transpose else data
+    if lod and envelopes is None:
+        envelopes = [Envelope(np.asarray(channel)) for channel in channels]
 
-    data = data[:, startcol:endcol]
+    # Compute time if fs is given, with one sampling rate per channel
+    if fs is not None:
+        fs = np.asarray(fs, dtype=np.float64)
+        fs = fs[startcol:endcol] if fs.ndim else np.full(len(selected), fs)
 
-    # Create a figure with as many rows as the columns of the 2D array
+    # Create a figure with as many rows as channels
     if width is None:
         width = int(str(get_screen_size()[0])[:-2])
     if height is None:
-        height = data.shape[1] * (width / 16) * 0.9
+        height = len(selected) * (width / 16) * 0.9
 
-    fig, axes = plt.subplots(
-        nrows=data.shape[1], ncols=1, figsize=(width, height), sharex=True
-    )
+    if interactive:
+        import matplotlib.pyplot as plt
 
-    if data.shape[1] == 1:
+        fig, axes = plt.subplots(
+            nrows=len(selected), ncols=1, figsize=(width, height), sharex=True
+        )
+    else:
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(width, height))
+        axes = fig.subplots(nrows=len(selected), ncols=1, sharex=True)
+
+    if len(selected) == 1:
         axes = [axes]
 
-    # Plot each column in a separate row
-    for i in range(data.shape[1]):
-        if fs is None:
-            axes[i].plot(data[:, i])
+    # Plot each channel in a separate row
+    lines = []
+    for i, ch in enumerate(selected):
+        channel_fs = None if fs is None else fs[i]
+        if lod:
+            lines.append(_EnvelopeLine(axes[i], envelopes[i], channel_fs))
         else:
-            axes[i].plot(time, data[:, i])
+            channel = channels[i] if physio is None else physio.channel(ch)
+            time = np.arange(channel.shape[0]) / (channel_fs or 1)
+            axes[i].plot(time, channel)
+        # Mark detected points, if any
+        if points is not None:
+            # Only the samples of the points are converted to physical units
+            samples = physio.channel(ch, raw=True)
+            for k, marker in [("peaks", "r^"), ("troughs", "bv")]:
+                idx = np.asarray(points[k][i], dtype=int)
+                time = idx / (channel_fs or 1)
+                values = samples[idx] * physio.scale[ch] + physio.intercept[ch]
+                axes[i].plot(time, values, marker, linestyle="none")
         axes[i].set_title(f"Channel {i+1}")
 
+    if lod:
+        # Axes share x limits, but siblings may not be updated yet when the
+        # callback of one of them runs: use the limits of that one
+        def redraw(ax):
+            for line in lines:
+                line.update(*ax.get_xlim())
+
+        for ax in axes:
+            ax.callbacks.connect("xlim_changed", redraw)
+        fig.canvas.mpl_connect("resize_event", lambda event: redraw(axes[0]))
+
     # Adjust layout and show the plot
-    plt.tight_layout()
+    fig.tight_layout()
 
-    if show:
+    if show and interactive:
         plt.show()
     else:
         return fig, axes